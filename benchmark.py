@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пайплайна без Oracle и Postgres.
+
+Источник — SyntheticSourceConnector (строки по профилю TableConfig.synthetic
+или по mappings), приёмник — SyntheticSinkConnector через sink_loader
+(или настоящий Postgres с --target postgres). Для каждой таблицы отдельно
+меряются этапы fetch, transform, validate, load и весь process_table целиком:
+строки/с и пиковый RSS процесса на время этапа. Результат — JSON, который
+можно сравнить с прошлым прогоном через --compare.
+
+    python benchmark.py --rows 200000 --out bench/before.json
+    python benchmark.py --rows 200000 --out bench/after.json --compare bench/before.json
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logger import setup_logging
+from mappings.parser import load_config, Config, MappingRule, TableConfig, SyntheticSourceConfig
+from connectors.postgres_connector import PostgresConnector
+from connectors.synthetic_connector import SyntheticSinkConnector, SyntheticSourceConnector, infer_columns
+from core import get_plugin
+from core import ExecutionContext
+from core.batch import ColumnBatch, iter_batches
+from core.chain import batch_capable, finalize_batch
+from core.row_plan import compile_row_plan
+from pipeline import process_table
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+# Fetcher'ы, которым нужен настоящий Oracle (собственные соединения воркеров)
+_ORACLE_ONLY_FETCHERS = {"chunked_fetcher", "ChunkedFetcher"}
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # на macOS ru_maxrss в байтах, на Linux — в килобайтах
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _rss_bytes() -> int:
+    """Текущий RSS процесса (Linux — /proc, иначе пик ru_maxrss)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_bytes()
+
+
+class RssSampler:
+    """Фоновый замер RSS: пиковое значение за время блока with."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self) -> "RssSampler":
+        gc.collect()
+        self.start = self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def measure(stage: str, rows: int, fn: Callable[[], Any]) -> Tuple[Dict[str, Any], Any]:
+    """Выполняет fn, возвращает (замер этапа, результат fn)."""
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - started
+    stats = {
+        "stage": stage,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+        "peak_rss_mb": rss.peak / _MB,
+        "rss_delta_mb": (rss.peak - rss.start) / _MB,
+    }
+    logger.info("%-10s %9d строк за %8.3f с: %12.0f строк/с, пик RSS %.1f МБ",
+                stage, rows, seconds, stats["rows_per_sec"], stats["peak_rss_mb"])
+    return stats, result
+
+
+def _prepare_table(table_cfg: TableConfig, rows: Optional[int]) -> TableConfig:
+    """Копия конфига таблицы с профилем синтетики и mappings (если их нет — 1:1 по колонкам профиля)."""
+    table_cfg = table_cfg.model_copy(deep=True)
+    spec = table_cfg.synthetic or SyntheticSourceConfig()
+    if rows is not None:
+        spec = spec.model_copy(update={"rows": rows})
+    table_cfg.synthetic = spec
+    if not table_cfg.mappings:
+        if not spec.columns:
+            raise RuntimeError(
+                f"Для {table_cfg.source_table} нет ни mappings, ни synthetic.columns — не из чего строить строки"
+            )
+        table_cfg.mappings = [MappingRule(source=c.name, target=c.name.lower()) for c in spec.columns]
+    return table_cfg
+
+
+def _open_target(target: str, sink_mode: str, sink_path: Optional[str]):
+    if target == "postgres":
+        conn = PostgresConnector()
+    else:
+        conn = SyntheticSinkConnector(sink_mode, sink_path)
+    conn.connect()
+    return conn
+
+
+def benchmark_table(
+    cfg: Config,
+    table_cfg: TableConfig,
+    rows: Optional[int],
+    target: str = "sink",
+    sink_mode: str = "count",
+    sink_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    table_cfg = _prepare_table(table_cfg, rows)
+    batch_size = cfg.global_config.batch_size
+    total = table_cfg.synthetic.rows
+    logger.info("Бенчмарк %s → %s: %d строк, батч %d",
+                table_cfg.source_table, table_cfg.target_table, total, batch_size)
+
+    source = SyntheticSourceConnector(table_cfg)
+    source.connect()
+    sink = _open_target(target, sink_mode, sink_path)
+    try:
+        ctx = ExecutionContext(table_cfg, 0, source, sink)
+        compile_row_plan(table_cfg)
+
+        fetcher_name = table_cfg.fetcher_plugin or cfg.global_config.fetcher_plugin
+        if fetcher_name in _ORACLE_ONLY_FETCHERS:
+            logger.warning("%s требует Oracle, бенчмарк использует default_fetcher", fetcher_name)
+            fetcher_name = "default_fetcher"
+            table_cfg.fetcher_plugin = fetcher_name
+        fetcher = get_plugin(fetcher_name, 'fetcher')()
+
+        transformers = [get_plugin(n, 'transform')() for n in (table_cfg.transform_plugins or [])]
+        if not table_cfg.transform_override:
+            transformers = [get_plugin(n, 'transform')() for n in cfg.global_config.transform_plugins] + transformers
+        validators = [get_plugin(n, 'validation')() for n in cfg.global_config.validation_plugins]
+        columnar = batch_capable(transformers, validators)
+
+        if target == "sink":
+            table_cfg.loader_plugin = "sink_loader"
+        loader = get_plugin(table_cfg.loader_plugin or cfg.global_config.loader_plugin, 'loader')()
+
+        stages: Dict[str, Dict[str, Any]] = {}
+
+        # 1) fetch: все батчи в память, чтобы следующие этапы мерились отдельно
+        stages["fetch"], batches = measure(
+            "fetch", total, lambda: [list(b) for b in iter_batches(fetcher.fetch(ctx, batch_size), batch_size)]
+        )
+        fetched = sum(len(b) for b in batches)
+
+        # 2) transform
+        def run_transform() -> List[Any]:
+            out = []
+            for i, raw in enumerate(batches):
+                bctx = ctx.for_batch(i)
+                if columnar:
+                    batch = ColumnBatch.from_rows(raw)
+                    for tr in transformers:
+                        batch = tr.transform_batch(bctx, batch)
+                else:
+                    batch = []
+                    for row in raw:
+                        for tr in transformers:
+                            row = tr.transform(bctx, row)
+                        batch.append(row)
+                finalize_batch(bctx, transformers)
+                out.append(batch)
+            return out
+
+        stages["transform"], transformed = measure("transform", fetched, run_transform)
+        batches = None
+
+        # 3) validate
+        def run_validate() -> List[List[Dict[str, Any]]]:
+            out = []
+            for i, batch in enumerate(transformed):
+                bctx = ctx.for_batch(i)
+                if columnar:
+                    for v in validators:
+                        batch = v.validate_batch(bctx, batch)
+                    out.append(batch.to_rows())
+                    continue
+                kept = []
+                for row in batch:
+                    for v in validators:
+                        row = v.validate(bctx, row)
+                        if row.get('_skip'):
+                            break
+                    else:
+                        kept.append(row)
+                out.append(kept)
+            return out
+
+        stages["validate"], validated = measure("validate", fetched, run_validate)
+        transformed = None
+        loaded = sum(len(b) for b in validated)
+
+        # 4) load
+        def run_load() -> None:
+            loader.pre_load(ctx, 0)
+            for i, rows_ in enumerate(validated):
+                if rows_:
+                    loader.load_batch(ctx.for_batch(i), rows_)
+            loader.finalize_table(ctx)
+
+        stages["load"], _ = measure("load", loaded, run_load)
+        validated = None
+
+        # 5) весь process_table: fetch → transform → validate → load
+        run_cfg = cfg.model_copy(deep=True)
+        run_cfg.global_config.checkpoints = False
+        run_cfg.global_config.metrics = None
+        auto_mapper = get_plugin(cfg.global_config.auto_mapping_plugin, 'auto_mapping')(sink)
+        stages["end_to_end"], _ = measure(
+            "end_to_end", total,
+            lambda: process_table(run_cfg, table_cfg, source, sink, auto_mapper, resume=False)
+        )
+
+        result = {
+            "table": f"{table_cfg.source_schema}.{table_cfg.source_table}->{table_cfg.target_table}",
+            "rows": total,
+            "rows_loaded": loaded,
+            "columns": [c.model_dump() for c in infer_columns(table_cfg, table_cfg.synthetic)],
+            "columnar": columnar,
+            "fetcher": fetcher_name,
+            "loader": table_cfg.loader_plugin or cfg.global_config.loader_plugin,
+            "stages": stages,
+        }
+        if isinstance(sink, SyntheticSinkConnector) and sink.mode == "serialize":
+            result["serialized_bytes"] = sink.bytes
+        return result
+    finally:
+        sink.close()
+        source.close()
+
+
+def run_benchmark(
+    cfg: Config,
+    rows: Optional[int] = None,
+    tables: Optional[List[str]] = None,
+    target: str = "sink",
+    sink_mode: str = "count",
+    sink_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    selected = [
+        t for t in cfg.tables
+        if not tables or t.source_table in tables or t.target_table in tables
+    ]
+    results = [benchmark_table(cfg, t, rows, target, sink_mode, sink_path) for t in selected]
+    return {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "batch_size": cfg.global_config.batch_size,
+        "target": target if target == "postgres" else f"sink:{sink_mode}",
+        "peak_rss_mb": _peak_rss_bytes() / _MB,
+        "tables": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Строки отчёта: изменение строк/с по этапам относительно прошлого прогона."""
+    before = {t["table"]: t for t in baseline.get("tables", [])}
+    lines = []
+    for table in current["tables"]:
+        old = before.get(table["table"])
+        if old is None:
+            lines.append(f"{table['table']}: нет в базовом прогоне")
+            continue
+        for stage, stats in table["stages"].items():
+            prev = old["stages"].get(stage)
+            if not prev or not prev["rows_per_sec"]:
+                continue
+            ratio = stats["rows_per_sec"] / prev["rows_per_sec"]
+            lines.append(
+                f"{table['table']:40s} {stage:10s} {prev['rows_per_sec']:12.0f} → "
+                f"{stats['rows_per_sec']:12.0f} строк/с (×{ratio:.2f}), "
+                f"пик RSS {prev['peak_rss_mb']:.1f} → {stats['peak_rss_mb']:.1f} МБ"
+            )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ETL Framework: benchmark on synthetic data")
+    parser.add_argument("--config", "-c", default="config/config.yaml",
+                        help="Путь до главного конфигурационного файла")
+    parser.add_argument("--rows", type=int, default=None,
+                        help="Строк на таблицу (по умолчанию из synthetic.rows таблицы)")
+    parser.add_argument("--table", action="append", dest="tables", default=None,
+                        help="Ограничить бенчмарк таблицей (source_table или target_table), можно несколько")
+    parser.add_argument("--target", choices=["sink", "postgres"], default="sink",
+                        help="Куда грузить: синтетический приёмник или настоящий Postgres из конфига")
+    parser.add_argument("--sink", choices=["count", "serialize"], default="count",
+                        help="Режим синтетического приёмника: только счёт или сериализация в COPY")
+    parser.add_argument("--sink-path", default=None,
+                        help="Файл для сериализованных строк (по умолчанию — в память)")
+    parser.add_argument("--out", "-o", default=None,
+                        help="Файл результата JSON (по умолчанию bench/benchmark_<время>.json)")
+    parser.add_argument("--compare", default=None,
+                        help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    os.environ["ETL_CONFIG_PATH"] = args.config
+    setup_logging()
+    cfg = load_config(args.config)
+
+    # базовый прогон читается до записи: --out может указывать на тот же файл
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+
+    result = run_benchmark(cfg, args.rows, args.tables, args.target, args.sink, args.sink_path)
+
+    out = Path(args.out or f"bench/benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    logger.info("Результат бенчмарка сохранён в %s", out)
+
+    if baseline is not None:
+        for line in compare(result, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,14 @@ import logging
 from logger import setup_logging
 from connectors.oracle_connector import OracleConnector
 from connectors.postgres_connector import PostgresConnector
-from mappings.parser import load_config
-from pipeline import run_pipeline
+from mappings.parser import load_config, ProfileConfig
+from pipeline import run_pipeline, run_plan_benchmark
 
 def check_oracle():
     try:
         with OracleConnector() as ora:
-            pass
+            # с настроенным пулом сессия после проверки остаётся в нём прогретой
+            ora.ping()
         logging.info("Соединение с Oracle установлено")
         return True
     except Exception as e:
@@ -41,6 +42,33 @@ def main():
         default="config/config.yaml",
         help="Path to ETL config file (default: config/config.yaml)"
     )
+    parser.add_argument(
+        "--benchmark-plan",
+        type=int,
+        metavar="ROWS",
+        default=None,
+        help="Benchmark compiled row plan vs interpreted transform/validation on ROWS sample rows per table (no load)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume an interrupted run from checkpoints: skip finished tables, continue partial ones"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile every plugin and connector call: wall/CPU time, allocations and peak memory per table"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=None,
+        help="Directory for per-table profile reports (default: global.profile.out_dir or ./profile)"
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="With --profile: also dump cProfile/pstats per table"
+    )
     args = parser.parse_args()
 
     # Устанавливаем путь к конфигу для всех модулей
@@ -59,6 +87,15 @@ def main():
         cfg.model_dump_json(indent=2, exclude_unset=True)
     )
 
+    # Режим профилирования поверх настроек global.profile
+    if args.profile:
+        profile = cfg.global_config.profile or ProfileConfig()
+        if args.profile_dir:
+            profile.out_dir = args.profile_dir
+        if args.cprofile:
+            profile.cprofile = True
+        cfg.global_config.profile = profile
+
     # Проверяем соединения
     ok_oracle = check_oracle()
     ok_postgres = check_postgres()
@@ -67,7 +104,12 @@ def main():
         logger.error("Ошибка соединения с Oracle или Postgres")
         sys.exit(1)
 
-    run_pipeline(cfg)
+    if args.benchmark_plan:
+        run_plan_benchmark(cfg, args.benchmark_plan)
+        logger.info("Бенчмарк плана завершён")
+        sys.exit(0)
+
+    run_pipeline(cfg, resume=args.resume)
     logger.info("Пайплайн завершён успешно")
     sys.exit(0)
 
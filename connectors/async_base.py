@@ -0,0 +1,44 @@
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Optional, Tuple
+
+
+class AsyncBaseConnector(ABC):
+    """
+    Абстрактный базовый класс асинхронных коннекторов (execution_mode: async).
+    Те же операции, что у BaseConnector, но корутины; соединение берётся
+    из общего пула процесса и возвращается в него в close().
+    """
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """Взять соединение из пула."""
+        ...
+
+    @abstractmethod
+    def fetch(self, query: str, batch_size: Optional[int] = None) -> AsyncIterator[dict]:
+        """
+        Асинхронный итератор словарей по SELECT-запросу.
+        :param query: полный SQL-запрос SELECT.
+        :param batch_size: размер порции выборки.
+        """
+        ...
+
+    @abstractmethod
+    async def execute(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> Any:
+        """
+        Выполнить произвольный запрос.
+        :return: строки для SELECT, иначе None.
+        """
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Вернуть соединение в пул."""
+        ...
+
+    async def __aenter__(self) -> "AsyncBaseConnector":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        await self.close()
@@ -0,0 +1,141 @@
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import oracledb
+
+from connectors.async_base import AsyncBaseConnector
+from connectors.oracle_connector import inline_lob_handler
+from mappings.parser import config_path, connector_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _oracle_settings() -> Dict[str, Any]:
+    """Секция global.connectors.oracle из config/config.yaml."""
+    path = config_path()
+    try:
+        return connector_settings('oracle')
+    except Exception as ex:
+        logger.error("Failed to load config %s: %s", path, ex)
+        raise RuntimeError(f"Не удалось загрузить конфиг {path}: {ex}")
+
+
+def create_pool(max_sessions: int):
+    """
+    Асинхронный пул сессий Oracle (oracledb.create_pool_async, только thin-режим).
+    min/increment/stmtcachesize берутся из connectors.oracle.pool, max — из max_sessions.
+    Создаётся внутри работающего event loop и живёт до его завершения.
+    """
+    oracle_cfg = _oracle_settings()
+    if oracle_cfg.get('client_lib_dir'):
+        logger.debug("Асинхронный пул Oracle работает в thin-режиме, client_lib_dir не используется")
+    pool_cfg = oracle_cfg.get('pool') or {}
+    dsn = f"{oracle_cfg.get('host')}:{oracle_cfg.get('port')}/{oracle_cfg.get('service_name')}"
+    logger.info("Создание асинхронного пула Oracle %s: max=%d", dsn, max_sessions)
+    return oracledb.create_pool_async(
+        user=oracle_cfg.get('user'),
+        password=oracle_cfg.get('password'),
+        dsn=dsn,
+        min=min(pool_cfg.get('min', 1), max_sessions),
+        max=max_sessions,
+        increment=pool_cfg.get('increment', 1),
+        stmtcachesize=pool_cfg.get('stmtcachesize', 50),
+        getmode=oracledb.POOL_GETMODE_WAIT,
+    )
+
+
+class AsyncOracleConnector(AsyncBaseConnector):
+    """
+    Асинхронный коннектор Oracle: сессия из общего AsyncConnectionPool,
+    пока таблица выбирает данные; остальные таблицы ждут свободную сессию в acquire().
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    async def connect(self) -> None:
+        self.conn = await self.pool.acquire()
+        logger.debug("Oracle async session acquired (busy %d/%d)", self.pool.busy, self.pool.opened)
+
+    def _cursor(self, arraysize: Optional[int] = None, prefetchrows: Optional[int] = None,
+                inline_lobs: bool = False):
+        if not self.conn:
+            raise RuntimeError("AsyncOracleConnector: соединение не установлено.")
+        cursor = self.conn.cursor()
+        if arraysize:
+            cursor.arraysize = arraysize
+        if prefetchrows is not None:
+            cursor.prefetchrows = prefetchrows
+        if inline_lobs:
+            cursor.outputtypehandler = inline_lob_handler
+        return cursor
+
+    async def fetch(
+        self,
+        query: str,
+        batch_size: Optional[int] = None,
+        params: Optional[dict] = None,
+        arraysize: Optional[int] = None,
+        prefetchrows: Optional[int] = None,
+        inline_lobs: bool = False,
+    ) -> AsyncIterator[dict]:
+        async for index, rows in self.fetch_tuples(query, batch_size or 1000, params, arraysize,
+                                                   prefetchrows, inline_lobs):
+            names = sorted(index, key=index.get)
+            for row in rows:
+                yield dict(zip(names, row))
+
+    async def fetch_tuples(
+        self,
+        query: str,
+        batch_size: Union[int, Callable[[], int]],
+        params: Optional[dict] = None,
+        arraysize: Optional[int] = None,
+        prefetchrows: Optional[int] = None,
+        inline_lobs: bool = False,
+    ) -> AsyncIterator[Tuple[Dict[str, int], List[tuple]]]:
+        """
+        Как OracleConnector.fetch_tuples: (общий индекс колонок, список кортежей) на каждый fetchmany.
+        Локаторы LOB асинхронно частями не читаются, поэтому с inline_lobs LOB приходят целиком.
+        """
+        size = batch_size if callable(batch_size) else (lambda: batch_size)
+        cursor = self._cursor(arraysize or size(), prefetchrows, inline_lobs)
+        logger.info("Запрос в Oracle (async): %s | params=%s", query, params)
+        try:
+            await cursor.execute(query, params or {})
+            index = {desc[0]: pos for pos, desc in enumerate(cursor.description)}
+            while True:
+                rows = await cursor.fetchmany(size())
+                if not rows:
+                    break
+                yield index, rows
+        finally:
+            cursor.close()
+            logger.debug("Cursor closed after fetch")
+
+    async def execute(
+        self,
+        query: str,
+        params: Optional[Tuple[Any, ...]] = None
+    ) -> Any:
+        cursor = self._cursor()
+        logger.info("Oracle statement (async): %s | params=%s", query, params)
+        try:
+            await cursor.execute(query, params or ())
+            if not query.strip().lower().startswith("select"):
+                await self.conn.commit()
+                return None
+            return await cursor.fetchall()
+        finally:
+            cursor.close()
+
+    async def close(self) -> None:
+        if self.conn:
+            try:
+                await self.pool.release(self.conn)
+                logger.debug("Oracle async session released to pool")
+            except Exception as ex:
+                logger.error("Error releasing Oracle async session: %s", ex)
+            finally:
+                self.conn = None
@@ -0,0 +1,109 @@
+import io
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from connectors.async_base import AsyncBaseConnector
+from mappings.parser import config_path, connector_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _postgres_settings() -> Dict[str, Any]:
+    """Секция global.connectors.postgres из config/config.yaml."""
+    path = config_path()
+    try:
+        return connector_settings('postgres')
+    except Exception as ex:
+        logger.error("Не удалось загрузить конфигурацию %s: %s", path, ex)
+        raise RuntimeError(f"Не удалось загрузить конфиг {path}: {ex}")
+
+
+async def create_pool(max_connections: int):
+    """
+    Асинхронный пул Postgres (asyncpg) на max_connections соединений.
+    asyncpg всегда открывает соединения с client_encoding UTF8 — в ней
+    async_default_loader кодирует данные COPY.
+    """
+    import asyncpg
+
+    pg_cfg = _postgres_settings()
+    logger.info("Создание асинхронного пула Postgres: host=%s database=%s max=%d",
+                pg_cfg.get('host'), pg_cfg.get('database'), max_connections)
+    return await asyncpg.create_pool(
+        user=pg_cfg.get('user'),
+        password=pg_cfg.get('password'),
+        host=pg_cfg.get('host'),
+        port=pg_cfg.get('port'),
+        database=pg_cfg.get('database'),
+        min_size=1,
+        max_size=max_connections,
+    )
+
+
+class AsyncPostgresConnector(AsyncBaseConnector):
+    """
+    Асинхронный коннектор Postgres (asyncpg): соединение из общего пула на время таблицы.
+    Запросы — с плейсхолдерами $1, $2, ...; загрузка — COPY через copy_text().
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    async def connect(self) -> None:
+        self.conn = await self.pool.acquire()
+        logger.debug("Соединение Postgres (async) взято из пула")
+
+    def _check(self) -> None:
+        if self.conn is None:
+            raise RuntimeError("AsyncPostgresConnector: соединение не установлено.")
+
+    async def fetch(self, query: str, batch_size: Optional[int] = None) -> AsyncIterator[dict]:
+        self._check()
+        async with self.conn.transaction():
+            async for record in self.conn.cursor(query, prefetch=batch_size or 1000):
+                yield dict(record)
+
+    async def execute(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> Any:
+        self._check()
+        logger.debug("Выполнение инструкции Postgres (async): %s | params=%s", query, params)
+        if query.strip().lower().startswith("select"):
+            return [tuple(r) for r in await self.conn.fetch(query, *(params or ()))]
+        await self.conn.execute(query, *(params or ()))
+        return None
+
+    def transaction(self):
+        """Транзакция asyncpg (async with / start / commit / rollback)."""
+        self._check()
+        return self.conn.transaction()
+
+    async def copy_text(self, schema: str, table: str, columns: Sequence[str], data: bytes) -> None:
+        """COPY ... FROM STDIN в текстовом формате (данные из core.copy_text)."""
+        self._check()
+        await self.conn.copy_to_table(
+            table, source=io.BytesIO(data), columns=list(columns),
+            schema_name=schema, format='text'
+        )
+
+    async def get_table_columns(self, schema: str, table: str) -> List[str]:
+        rows = await self.execute(
+            """
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = $1
+              AND table_name = $2
+            ORDER BY ordinal_position
+            """,
+            (schema, table)
+        )
+        return [row[0] for row in rows]
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            try:
+                await self.pool.release(self.conn)
+                logger.debug("Соединение Postgres (async) возвращено в пул")
+            except Exception as ex:
+                logger.error("Ошибка при возврате соединения Postgres в пул: %s", ex)
+            finally:
+                self.conn = None
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
 from typing import List, Optional, Any, Iterator, Tuple
 
 class BaseConnector(ABC):
@@ -36,6 +37,21 @@ class BaseConnector(ABC):
         """Закрыть соединение."""
         pass
 
+    def lookup_cursor(self) -> Any:
+        """
+        Курсор для справочных запросов (lookup, проверки по справочнику).
+        По умолчанию — курсор основного соединения; пул может выдать отдельное.
+        """
+        return self.conn.cursor()
+
+    def separate_lookups(self) -> Any:
+        """
+        Контекст, на время которого lookup_cursor() не пересекается с транзакцией
+        основного соединения (staged-режим: transform идёт параллельно загрузке).
+        По умолчанию ничего не меняет.
+        """
+        return nullcontext()
+
     def __enter__(self) -> "BaseConnector":
         self.connect()
         return self
@@ -1,8 +1,10 @@
+import atexit
 import os
-import yaml
+import threading
 import oracledb
-from typing import Iterator, Optional, Tuple, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 from connectors.base import BaseConnector
+from mappings.parser import OraclePoolConfig, config_path, connector_settings
 import logging
 
 from logger import setup_logging
@@ -12,24 +14,128 @@ setup_logging()
 
 logger = logging.getLogger(__name__)
 
-CONFIG_PATH = os.environ.get("ETL_CONFIG_PATH", "config/config.yaml")
+# Пулы сессий процесса: (user, dsn) → oracledb.ConnectionPool.
+# После fork (воркеры планировщика) дочерний процесс создаёт свои пулы.
+_POOLS: Dict[Tuple[str, str], Any] = {}
+_POOLS_LOCK = threading.Lock()
+# Пулы родителя в дочернем процессе: ссылки держатся до конца процесса, чтобы
+# сборщик мусора не закрыл через унаследованные сокеты сессии родителя
+_INHERITED: List[Any] = []
+_CLIENT_INIT = False
+
+
+def _reset_after_fork() -> None:
+    global _POOLS_LOCK
+    _INHERITED.extend(_POOLS.values())
+    _POOLS.clear()
+    _POOLS_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _init_client(lib_dir: Optional[str]) -> None:
+    """Инициализация клиента Oracle (thick mode), один раз на процесс."""
+    global _CLIENT_INIT
+    if _CLIENT_INIT:
+        return
+    init_fn = getattr(oracledb, "init_oracle_client", None)
+    if callable(init_fn) and lib_dir:
+        try:
+            init_fn(lib_dir=lib_dir)
+            logger.debug("Oracle instant client initialized from %s", lib_dir)
+        except getattr(oracledb, "ProgrammingError", Exception):
+            logger.debug("Oracle client init ignored")
+    _CLIENT_INIT = True
+
+
+def get_pool(user: str, password: str, dsn: str, pool_cfg: Dict[str, Any]):
+    """
+    Пул сессий процесса для (user, dsn); создаётся при первом обращении.
+    Значения по умолчанию — из OraclePoolConfig.
+    """
+    key = (user, dsn)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            settings = OraclePoolConfig.model_validate(pool_cfg)
+            kwargs: Dict[str, Any] = dict(
+                user=user,
+                password=password,
+                dsn=dsn,
+                min=settings.min,
+                max=settings.max,
+                increment=settings.increment,
+                stmtcachesize=settings.stmtcachesize,
+                timeout=settings.timeout,
+                ping_interval=settings.ping_interval,
+                getmode=oracledb.POOL_GETMODE_WAIT,
+            )
+            if settings.wait_timeout:
+                kwargs["getmode"] = oracledb.POOL_GETMODE_TIMEDWAIT
+                kwargs["wait_timeout"] = settings.wait_timeout
+            logger.info("Создание пула сессий Oracle %s: min=%s max=%s",
+                        dsn, kwargs["min"], kwargs["max"])
+            pool = oracledb.create_pool(**kwargs)
+            _POOLS[key] = pool
+    return pool
+
+
+def close_pools() -> None:
+    """Закрывает пулы процесса (в конце запуска)."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        try:
+            pool.close(force=True)
+        except Exception as ex:
+            logger.error("Ошибка при закрытии пула Oracle: %s", ex)
+
+
+atexit.register(close_pools)
+
+
+# Суффикс колонок-локаторов (core.lob): большие LOB приходят в них локаторами
+LOB_LOCATOR_SUFFIX = "__LOB"
+
+# LOB → тип, в котором oracledb отдаёт значение целиком вместе со строкой
+_LOB_INLINE_TYPES = {
+    oracledb.DB_TYPE_CLOB: oracledb.DB_TYPE_LONG,
+    oracledb.DB_TYPE_NCLOB: oracledb.DB_TYPE_LONG_NVARCHAR,
+    oracledb.DB_TYPE_BLOB: oracledb.DB_TYPE_LONG_RAW,
+}
+
+
+def inline_lob_handler(cursor: Any, metadata: Any) -> Any:
+    """
+    outputtypehandler: CLOB/NCLOB/BLOB приходят str/bytes в ответе на fetch,
+    без отдельного round-trip на каждый локатор. Колонки-локаторы core.lob
+    (суффикс __LOB) остаются локаторами.
+    """
+    target = _LOB_INLINE_TYPES.get(metadata.type_code)
+    if target is None or metadata.name.endswith(LOB_LOCATOR_SUFFIX):
+        return None
+    return cursor.var(target, arraysize=cursor.arraysize)
+
 
 class OracleConnector(BaseConnector):
     """
     Коннектор для Oracle. Параметры подключения из config/config.yaml.
+    Если задан connectors.oracle.pool, сессия берётся из общего пула процесса
+    и при close() возвращается в него, а не закрывается — воркеры ChunkedFetcher,
+    планировщик и проверка соединения в cli не платят за logon каждый раз.
     """
 
     def __init__(self):
+        path = config_path()
         try:
-            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-                full_cfg = yaml.safe_load(f)
-            oracle_cfg = full_cfg.get('global', {}) \
-                                 .get('connectors', {}) \
-                                 .get('oracle', {})
-            logger.info("Loaded Oracle connector config from %s", CONFIG_PATH)
+            oracle_cfg = connector_settings('oracle')
+            logger.info("Loaded Oracle connector config from %s", path)
         except Exception as ex:
-            logger.error("Failed to load config %s: %s", CONFIG_PATH, ex)
-            raise RuntimeError(f"Не удалось загрузить конфиг {CONFIG_PATH}: {ex}")
+            logger.error("Failed to load config %s: %s", path, ex)
+            raise RuntimeError(f"Не удалось загрузить конфиг {path}: {ex}")
 
         self.client_lib_dir = oracle_cfg.get('client_lib_dir')
         self.user = oracle_cfg.get('user')
@@ -37,54 +143,168 @@ class OracleConnector(BaseConnector):
         self.host = oracle_cfg.get('host')
         self.port = oracle_cfg.get('port')
         self.service_name = oracle_cfg.get('service_name')
+        self.stmtcachesize = oracle_cfg.get('stmtcachesize')
+        self.pool_cfg = oracle_cfg.get('pool')
         self.conn = None
+        self._pool = None
+
+    @property
+    def dsn(self) -> str:
+        return f"{self.host}:{self.port}/{self.service_name}"
 
     def connect(self) -> None:
         # Инициализация клиента Oracle, если доступно
-        init_fn = getattr(oracledb, "init_oracle_client", None)
-        if callable(init_fn) and self.client_lib_dir:
-            try:
-                init_fn(lib_dir=self.client_lib_dir)
-                logger.debug("Oracle instant client initialized from %s", self.client_lib_dir)
-            except getattr(oracledb, "ProgrammingError", Exception):
-                logger.debug("Oracle client init ignored")
-
-        dsn = f"{self.host}:{self.port}/{self.service_name}"
-        logger.info("Connecting to Oracle: %s", dsn)
-        self.conn = oracledb.connect(user=self.user, password=self.password, dsn=dsn)
+        _init_client(self.client_lib_dir)
+
+        if self.pool_cfg is not None:
+            self._pool = get_pool(self.user, self.password, self.dsn, self.pool_cfg or {})
+            self.conn = self._pool.acquire()
+            logger.debug("Oracle session acquired from pool (busy %d/%d)",
+                         self._pool.busy, self._pool.opened)
+            return
+
+        logger.info("Connecting to Oracle: %s", self.dsn)
+        self.conn = oracledb.connect(user=self.user, password=self.password, dsn=self.dsn)
+        if self.stmtcachesize is not None:
+            self.conn.stmtcachesize = self.stmtcachesize
         logger.info("Oracle connection established")
 
+    def ping(self) -> None:
+        """Проверка живости сессии (round-trip к серверу)."""
+        if not self.conn:
+            raise RuntimeError("OracleConnector: соединение не установлено.")
+        self.conn.ping()
+
+    def _cursor(self, arraysize: Optional[int] = None, prefetchrows: Optional[int] = None,
+                inline_lobs: bool = False):
+        """
+        Курсор с настройками выборки: arraysize — строк за один round-trip,
+        prefetchrows — строк, приходящих вместе с ответом на execute,
+        inline_lobs — LOB значениями, а не локаторами (inline_lob_handler).
+        Всё задаётся до execute; None — значения oracledb по умолчанию.
+        """
+        if not self.conn:
+            raise RuntimeError("OracleConnector: соединение не установлено.")
+        cursor = self.conn.cursor()
+        if arraysize:
+            cursor.arraysize = arraysize
+        if prefetchrows is not None:
+            cursor.prefetchrows = prefetchrows
+        if inline_lobs:
+            cursor.outputtypehandler = inline_lob_handler
+        return cursor
+
+    def lob_columns(self, schema: str, table: str) -> List[str]:
+        """CLOB/NCLOB/BLOB-колонки таблицы источника."""
+        rows = self.execute(
+            """
+            SELECT column_name
+            FROM all_tab_columns
+            WHERE owner = :1
+              AND table_name = :2
+              AND data_type IN ('CLOB', 'NCLOB', 'BLOB')
+            ORDER BY column_id
+            """,
+            (schema.upper(), table.upper())
+        )
+        return [row[0] for row in rows]
+
     def fetch(
         self,
         query: str,
-        batch_size: Optional[int] = None
+        batch_size: Optional[int] = None,
+        params: Optional[dict] = None,
+        arraysize: Optional[int] = None,
+        prefetchrows: Optional[int] = None,
+        inline_lobs: bool = False,
     ) -> Iterator[dict]:
         """
         Выполнить произвольный SELECT-запрос и вернуть словари.
         :param query: полный SQL SELECT запрос
         :param batch_size: размер выборки; если None - построчно
+        :param params: bind-переменные запроса (:name → значение)
+        :param arraysize: cursor.arraysize (по умолчанию batch_size)
+        :param prefetchrows: cursor.prefetchrows
+        :param inline_lobs: LOB значениями str/bytes вместо локаторов
         """
-        if not self.conn:
-            raise RuntimeError("OracleConnector: соединение не установлено.")
-        cursor = self.conn.cursor()
-        logger.info("Запрос в Oracle: %s", query)
-        cursor.execute(query)
-        col_names = [desc[0] for desc in cursor.description]
+        cursor = self._cursor(arraysize or batch_size, prefetchrows, inline_lobs)
+        logger.info("Запрос в Oracle: %s | params=%s", query, params)
+        try:
+            cursor.execute(query, params or {})
+            col_names = [desc[0] for desc in cursor.description]
+
+            if batch_size:
+                logger.debug("Fetching in batches of %s", batch_size)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(zip(col_names, row))
+            else:
+                for row in cursor:
+                    yield dict(zip(col_names, row))
+        finally:
+            cursor.close()
+            logger.debug("Cursor closed after fetch")
 
-        if batch_size:
-            logger.debug("Fetching in batches of %s", batch_size)
+    def fetch_tuples(
+        self,
+        query: str,
+        batch_size: Union[int, Callable[[], int]],
+        params: Optional[dict] = None,
+        arraysize: Optional[int] = None,
+        prefetchrows: Optional[int] = None,
+        inline_lobs: bool = False,
+    ) -> Iterator[Tuple[Dict[str, int], List[tuple]]]:
+        """
+        Выборка без словарей: отдаёт (index, rows) по каждому fetchmany, где
+        rows — список кортежей oracledb как есть, а index (имя колонки → позиция)
+        один общий объект на весь запрос.
+        :param batch_size: строк в порции; может быть функцией без аргументов,
+                           тогда размер запрашивается перед каждым fetchmany
+        """
+        size = batch_size if callable(batch_size) else (lambda: batch_size)
+        cursor = self._cursor(arraysize or size(), prefetchrows, inline_lobs)
+        logger.info("Запрос в Oracle: %s | params=%s", query, params)
+        try:
+            cursor.execute(query, params or {})
+            index = {desc[0]: pos for pos, desc in enumerate(cursor.description)}
             while True:
-                rows = cursor.fetchmany(batch_size)
+                rows = cursor.fetchmany(size())
                 if not rows:
                     break
-                for row in rows:
-                    yield dict(zip(col_names, row))
-        else:
-            for row in cursor:
-                yield dict(zip(col_names, row))
+                yield index, rows
+        finally:
+            cursor.close()
+            logger.debug("Cursor closed after fetch")
 
-        cursor.close()
-        logger.debug("Cursor closed after fetch")
+    def fetch_arrow(
+        self,
+        query: str,
+        batch_size: int,
+        params: Optional[dict] = None,
+    ) -> Iterator[Any]:
+        """
+        Выборка record batch'ами Arrow (oracledb Connection.fetch_df_batches):
+        значения не превращаются в объекты Python, отдаются pyarrow.Table по batch_size строк.
+        arraysize и prefetchrows oracledb выставляет равными batch_size сам.
+        """
+        if not self.conn:
+            raise RuntimeError("OracleConnector: соединение не установлено.")
+        fetch_df = getattr(self.conn, "fetch_df_batches", None)
+        if fetch_df is None:
+            raise RuntimeError("fetch_format=arrow требует oracledb >= 3.0 (Connection.fetch_df_batches)")
+        import pyarrow
+
+        logger.info("Запрос в Oracle (arrow): %s | params=%s", query, params)
+        for df in fetch_df(statement=query, parameters=params or {}, size=batch_size):
+            if hasattr(df, "__arrow_c_stream__"):
+                table = pyarrow.table(df)
+            else:
+                table = pyarrow.Table.from_arrays(df.column_arrays(), names=df.column_names())
+            if table.num_rows:
+                yield table
 
     def execute(
         self,
@@ -109,8 +329,12 @@ class OracleConnector(BaseConnector):
     def close(self) -> None:
         if self.conn:
             try:
-                self.conn.close()
-                logger.info("Oracle connection closed")
+                if self._pool is not None:
+                    self._pool.release(self.conn)
+                    logger.debug("Oracle session released to pool")
+                else:
+                    self.conn.close()
+                    logger.info("Oracle connection closed")
             except Exception as ex:
                 logger.error("Error closing Oracle connection: %s", ex)
             finally:
@@ -1,82 +1,388 @@
+import atexit
+import itertools
 import os
-import yaml
+import queue
+import threading
+import time
 import logging
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from typing import List, Iterator, Optional, Tuple, Any
+from contextlib import contextmanager
+from psycopg2 import sql
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 from connectors.base import BaseConnector
+from mappings.parser import config_path, connector_settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-CONFIG_PATH = os.environ.get("ETL_CONFIG_PATH", "config/config.yaml")
+# Пулы процесса: (lane, host, port, database, user) → ThreadedConnectionPool.
+# lane "load" — транзакции загрузки, "lookup" — справочные запросы.
+_POOLS: Dict[Tuple[Any, ...], ThreadedConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+# Пулы родителя в дочернем процессе: держим ссылки, иначе сборщик мусора закроет
+# унаследованные соединения и отправит серверу Terminate за родителя
+_INHERITED: List[ThreadedConnectionPool] = []
+
+
+# Имена серверных курсоров потокового чтения
+_CURSOR_IDS = itertools.count(1)
+# Конец потока COPY TO в очереди _CopyOutWriter
+_COPY_DONE = object()
+
+
+class _CopyOutWriter:
+    """
+    Файл для copy_expert(COPY ... TO STDOUT): режет поток на строки текстового
+    формата COPY и отдаёт их в очередь порциями по chunk_size. Строки декодируются
+    в кодировке клиента (client_encoding соединения). После отмены то, что
+    ещё успеет прийти до прерывания запроса, выбрасывается.
+    """
+
+    def __init__(
+        self,
+        out: "queue.Queue",
+        chunk_size: int,
+        decode: Callable[[str], List[Optional[str]]],
+        encoding: str = "utf-8",
+    ):
+        self.out = out
+        self.chunk_size = chunk_size
+        self.decode = decode
+        self.encoding = encoding
+        self.cancelled = False
+        self._tail = b""
+        self._rows: List[List[Optional[str]]] = []
+
+    def write(self, data: bytes) -> int:
+        if self.cancelled:
+            return len(data)
+        if isinstance(data, str):
+            data = data.encode(self.encoding)
+        lines = (self._tail + data).split(b"\n")
+        self._tail = lines.pop()
+        decode = self.decode
+        encoding = self.encoding
+        for line in lines:
+            self._rows.append(decode(line.decode(encoding)))
+            if len(self._rows) >= self.chunk_size:
+                self.out.put(self._rows)
+                self._rows = []
+        return len(data)
+
+    def flush(self) -> None:
+        if self._rows and not self.cancelled:
+            self.out.put(self._rows)
+        self._rows = []
+
+
+def _reset_after_fork() -> None:
+    # соединения родителя в дочернем процессе не используются и не закрываются
+    global _POOLS_LOCK
+    _INHERITED.extend(_POOLS.values())
+    _POOLS.clear()
+    _POOLS_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _KeepIdlePool(ThreadedConnectionPool):
+    """
+    Пул, который при возврате хранит соединения до maxconn, а не до minconn:
+    minconn открывается сразу, остальные — по требованию и больше не закрываются.
+    """
+
+    def _putconn(self, conn, key=None, close=False):
+        # putconn вызывает _putconn под блокировкой пула
+        minconn = self.minconn
+        self.minconn = self.maxconn
+        try:
+            super()._putconn(conn, key, close)
+        finally:
+            self.minconn = minconn
+
+
+def get_pool(
+    lane: str,
+    dsn: Dict[str, Any],
+    minconn: int,
+    maxconn: int,
+    keep_idle: bool = False,
+) -> ThreadedConnectionPool:
+    """
+    Пул полосы lane для параметров dsn; создаётся при первом обращении.
+    keep_idle — возвращённые соединения не закрываются сверх minconn, а остаются
+    в пуле (до maxconn): для полосы, где соединение берут на каждый запрос.
+    """
+    key = (lane, dsn.get("host"), dsn.get("port"), dsn.get("database"), dsn.get("user"))
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            logger.info("Создание пула Postgres (%s): min=%d max=%d", lane, minconn, maxconn)
+            pool_cls = _KeepIdlePool if keep_idle else ThreadedConnectionPool
+            pool = pool_cls(min(minconn, maxconn), maxconn, **dsn)
+            _POOLS[key] = pool
+    return pool
+
+
+def get_conn(pool: ThreadedConnectionPool, key: Any, timeout: float) -> Any:
+    """
+    Соединение из пула; если пул исчерпан, ждёт возврата соединения
+    не дольше timeout секунд (0 — без ограничения), затем RuntimeError.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            return pool.getconn(key=key)
+        except PoolError:
+            if pool.closed:
+                raise
+            if deadline is not None and time.monotonic() >= deadline:
+                raise RuntimeError(
+                    f"Пул Postgres исчерпан: нет свободного соединения за {timeout:g} с "
+                    f"(увеличьте connectors.postgres.pool)"
+                )
+            time.sleep(0.05)
+
+
+def close_pools() -> None:
+    """Закрывает все пулы процесса (в конце запуска)."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        try:
+            pool.closeall()
+        except Exception as ex:
+            logger.error("Ошибка при закрытии пула Postgres: %s", ex)
+
+
+atexit.register(close_pools)
+
 
 class PostgresConnector(BaseConnector):
     """
     Коннектор для PostgreSQL, реализующий BaseConnector.
     Параметры подключения берутся из config/config.yaml.
+    Если задан connectors.postgres.pool, соединения берутся из пулов процесса:
+      - conn (полоса load) — загрузчик, чекпоинты, водяные знаки;
+      - lookup_cursor() (полоса lookup) — соединение на время запроса,
+        по умолчанию в autocommit, так что справочные запросы этапа
+        transform/validate не ждут транзакцию загрузчика и не ломают её ошибкой.
+        Зато они не видят незакоммиченных строк текущей транзакции загрузки:
+        lookup по самому приёмнику — через self_lookup, а не через lookup_cursor.
+    Если пул исчерпан, соединение ждут до pool.wait_timeout секунд.
+    Все соединения открываются с client_encoding=UTF8 — в этой кодировке
+    loader'ы кодируют данные COPY.
     """
 
     def __init__(self):
+        path = config_path()
         try:
-            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-                full_cfg = yaml.safe_load(f)
-            pg_cfg = full_cfg.get('global', {})                              .get('connectors', {})                              .get('postgres', {})
+            pg_cfg = connector_settings('postgres')
         except Exception as ex:
-            logger.error("Не удалось загрузить конфигурацию %s: %s", CONFIG_PATH, ex)
-            raise RuntimeError(f"Не удалось загрузить конфиг {CONFIG_PATH}: {ex}")
+            logger.error("Не удалось загрузить конфигурацию %s: %s", path, ex)
+            raise RuntimeError(f"Не удалось загрузить конфиг {path}: {ex}")
 
         self.user = pg_cfg.get('user')
         self.password = pg_cfg.get('password')
         self.host = pg_cfg.get('host')
         self.port = pg_cfg.get('port')
         self.database = pg_cfg.get('database')
+        self.pool_cfg = pg_cfg.get('pool')
         self.conn = None
+        self._load_pool: Optional[ThreadedConnectionPool] = None
+        self._lookup_pool: Optional[ThreadedConnectionPool] = None
+        self._lookup_conn = None
+
+    def _dsn(self) -> Dict[str, Any]:
+        # потоки COPY FROM (copy_text, copy_binary, copy_arrow) собираются в UTF-8:
+        # кодировка клиента фиксируется, а не берётся из PGCLIENTENCODING или настроек роли
+        return dict(user=self.user, password=self.password, host=self.host,
+                    port=self.port, database=self.database, client_encoding="UTF8")
+
+    def new_connection(self) -> Any:
+        """Отдельное соединение psycopg2 вне пула (закрывает вызывающий)."""
+        return psycopg2.connect(**self._dsn())
+
+    def _wait_timeout(self) -> float:
+        return (self.pool_cfg or {}).get('wait_timeout', 30)
 
     def connect(self) -> None:
+        if self.pool_cfg is not None:
+            pool_cfg = self.pool_cfg or {}
+            dsn = self._dsn()
+            self._load_pool = get_pool("load", dsn, pool_cfg.get('min', 1), pool_cfg.get('max', 4))
+            self._lookup_pool = get_pool("lookup", dsn, pool_cfg.get('lookup_min', 2),
+                                         pool_cfg.get('lookup_max', 8), keep_idle=True)
+            self.conn = get_conn(self._load_pool, id(self), self._wait_timeout())
+            logger.debug("Соединение Postgres взято из пула (load)")
+            return
+
         logger.info("Подключение к Postgres: user=%s host=%s port=%s database=%s",
                     self.user, self.host, self.port, self.database)
         try:
-            self.conn = psycopg2.connect(
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port,
-                database=self.database
-            )
+            self.conn = psycopg2.connect(**self._dsn())
             logger.info("Установлено соединение с Postgres")
         except Exception as ex:
             logger.error("Не удалось подключиться к Postgres: %s", ex)
             raise
 
+    @contextmanager
+    def _reader(self) -> Iterator[Any]:
+        """
+        Отдельное соединение для потокового чтения, чтобы серверный курсор или COPY TO
+        не зависели от транзакций загрузчика: с пулом — из полосы lookup, иначе — новое.
+        Читается в транзакции только на чтение, в конце она откатывается.
+        """
+        if self._lookup_pool is not None:
+            key = ("reader", next(_CURSOR_IDS))
+            conn = get_conn(self._lookup_pool, key, self._wait_timeout())
+            autocommit = conn.autocommit
+            try:
+                conn.autocommit = False
+                yield conn
+            finally:
+                conn.rollback()
+                conn.autocommit = autocommit
+                self._lookup_pool.putconn(conn, key=key)
+            return
+        conn = self.new_connection()
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+            conn.close()
+
+    @staticmethod
+    def _select(
+        table: str,
+        columns: Optional[Sequence[str]],
+        schema: Optional[str],
+        where: Optional[str],
+    ) -> sql.Composed:
+        cols = sql.SQL(', ').join(sql.Identifier(c) for c in columns) if columns else sql.SQL('*')
+        ident = sql.Identifier(schema, table) if schema else sql.Identifier(table)
+        query = sql.SQL("SELECT {cols} FROM {tbl}").format(cols=cols, tbl=ident)
+        if where:
+            query = query + sql.SQL(" WHERE ") + sql.SQL(where)
+        return query
+
     def fetch(
         self,
         table: str,
         columns: List[str],
-        batch_size: Optional[int] = None
+        batch_size: Optional[int] = None,
+        schema: Optional[str] = None,
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
     ) -> Iterator[dict]:
+        """
+        Строки таблицы словарями; читаются потоком через серверный курсор
+        (fetch_chunks), в памяти не больше batch_size строк.
+        :param where: условие WHERE с плейсхолдерами %s, значения — в params
+        """
+        chunks = self.fetch_chunks(table, columns, batch_size or 2000, schema, where, params)
+        for chunk in chunks:
+            for row in chunk:
+                yield dict(zip(columns, row))
+
+    def fetch_chunks(
+        self,
+        table: str,
+        columns: Optional[Sequence[str]] = None,
+        chunk_size: int = 10000,
+        schema: Optional[str] = None,
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+    ) -> Iterator[List[tuple]]:
+        """
+        Потоковое чтение именованным (серверным) курсором: результат не
+        загружается в память клиента целиком, каждый fetchmany — chunk_size строк.
+        Значения — типы psycopg2 (как у execute).
+        """
         if self.conn is None:
-            raise RuntimeError("PostgresConnector: соединение не установено.")
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
-        cols_str = ", ".join([f'"{col}"' for col in columns])
-        query = f'SELECT {cols_str} FROM "{table}"'
-        logger.info("Postgres query: %s", query)
-        cursor.execute(query)
-
-        if batch_size:
-            logger.debug("Выборка партиями %s", batch_size)
-            while True:
-                rows = cursor.fetchmany(batch_size)
-                if not rows:
-                    break
-                for row in rows:
-                    yield dict(row)
-        else:
-            for row in cursor:
-                yield dict(row)
+            raise RuntimeError("PostgresConnector: соединение не установлено.")
+        with self._reader() as conn:
+            query = self._select(table, columns, schema, where)
+            logger.info("Postgres stream: %s | params=%s", query.as_string(conn), params)
+            with conn.cursor(name=f"etl_stream_{next(_CURSOR_IDS)}") as cur:
+                cur.itersize = chunk_size
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
 
-        cursor.close()
-        logger.debug("Cursor closed after fetch")
+    def copy_chunks(
+        self,
+        table: str,
+        columns: Optional[Sequence[str]] = None,
+        chunk_size: int = 10000,
+        schema: Optional[str] = None,
+        where: Optional[str] = None,
+        params: Optional[Sequence[Any]] = None,
+        query: Optional[sql.Composable] = None,
+    ) -> Iterator[List[List[Optional[str]]]]:
+        """
+        Потоковое чтение через COPY (SELECT ...) TO STDOUT: быстрее курсора на
+        больших таблицах, значения приходят строками текстового формата COPY
+        (NULL → None), без приведения типов. Поток разбирается в отдельном
+        потоке, в памяти — не больше двух порций по chunk_size строк.
+        :param query: готовый SELECT вместо table/columns/where (например, с CAST)
+        """
+        from core.copy_text import decode_row
+
+        if self.conn is None:
+            raise RuntimeError("PostgresConnector: соединение не установлено.")
+        with self._reader() as conn:
+            select = query if query is not None else self._select(table, columns, schema, where)
+            # ASCII-совместимые кодировки: разделители COPY (\t, \n) не встречаются внутри символов
+            encoding = psycopg2.extensions.encodings.get(conn.encoding, conn.encoding)
+            with conn.cursor() as cur:
+                select_sql = cur.mogrify(select, params).decode(encoding)
+            copy_sql = f"COPY ({select_sql}) TO STDOUT"
+            logger.info("Postgres copy out: %s", copy_sql)
+
+            out: "queue.Queue" = queue.Queue(maxsize=2)
+            writer = _CopyOutWriter(out, chunk_size, decode_row, encoding)
+
+            def run() -> None:
+                try:
+                    with conn.cursor() as cur:
+                        cur.copy_expert(copy_sql, writer, size=256 * 1024)
+                    writer.flush()
+                    out.put(_COPY_DONE)
+                except BaseException as ex:
+                    out.put(ex)
+
+            thread = threading.Thread(target=run, name="pg-copy-out", daemon=True)
+            thread.start()
+            try:
+                while True:
+                    item = out.get()
+                    if item is _COPY_DONE:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+            finally:
+                # потребитель мог бросить чтение: прерываем COPY на сервере, а не дочитываем
+                writer.cancelled = True
+                if thread.is_alive():
+                    try:
+                        conn.cancel()
+                    except psycopg2.Error as ex:
+                        logger.debug("Не удалось отменить COPY TO: %s", ex)
+                while thread.is_alive():
+                    try:
+                        out.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                thread.join()
 
     def execute(
         self,
@@ -84,7 +390,7 @@ class PostgresConnector(BaseConnector):
         params: Optional[Tuple[Any, ...]] = None
     ) -> Any:
         if self.conn is None:
-            raise RuntimeError("PostgresConnector: соединение не установено.")
+            raise RuntimeError("PostgresConnector: соединение не установлено.")
         cursor = self.conn.cursor()
         logger.debug("Выполнение инструкции Postgres: %s | params=%s", query, params)
         cursor.execute(query, params or ())
@@ -98,11 +404,66 @@ class PostgresConnector(BaseConnector):
         cursor.close()
         return result
 
+    @contextmanager
+    def _pooled_lookup_cursor(self) -> Iterator[Any]:
+        key = ("lookup", next(_CURSOR_IDS))
+        # исчерпанный пул ждём: соединение загрузки занято транзакцией другого потока
+        conn = get_conn(self._lookup_pool, key, self._wait_timeout())
+        try:
+            autocommit = (self.pool_cfg or {}).get('lookup_autocommit', True)
+            if conn.autocommit != autocommit:
+                conn.autocommit = autocommit
+            with conn.cursor() as cur:
+                yield cur
+        finally:
+            # незавершённую транзакцию (lookup_autocommit: false) пул откатит сам
+            self._lookup_pool.putconn(conn, key=key)
+
+    def lookup_cursor(self) -> Any:
+        """
+        Курсор для справочных запросов: с пулом — соединение полосы lookup
+        на время блока with (возвращается в пул при выходе); внутри
+        separate_lookups() — его соединение; иначе — основное соединение.
+        Отдельное соединение lookup не видит незакоммиченных строк загрузки.
+        """
+        if self.conn is None:
+            raise RuntimeError("PostgresConnector: соединение не установлено.")
+        if self._lookup_conn is not None:
+            return self._lookup_conn.cursor()
+        if self._lookup_pool is None:
+            return self.conn.cursor()
+        return self._pooled_lookup_cursor()
+
+    @contextmanager
+    def separate_lookups(self) -> Iterator[None]:
+        """
+        Без пула lookup_cursor() работает на основном соединении, то есть внутри
+        открытой транзакции загрузки. На время блока справочные запросы получают
+        отдельное соединение в autocommit (его использует один поток — transform).
+        С пулом ничего не меняет: lookup и так идёт через полосу lookup.
+        """
+        if self._lookup_pool is not None or self._lookup_conn is not None:
+            yield
+            return
+        conn = self.new_connection()
+        conn.autocommit = True
+        self._lookup_conn = conn
+        try:
+            yield
+        finally:
+            self._lookup_conn = None
+            conn.close()
+
     def close(self) -> None:
         if self.conn:
             try:
-                self.conn.close()
-                logger.info("Соединение с Postgres закрыто")
+                if self._load_pool is not None:
+                    # незавершённая транзакция откатывается пулом
+                    self._load_pool.putconn(self.conn, key=id(self))
+                    logger.debug("Соединение Postgres возвращено в пул")
+                else:
+                    self.conn.close()
+                    logger.info("Соединение с Postgres закрыто")
             except Exception as ex:
                 logger.error("Ошибка при закрытии соединения с Postgres: %s", ex)
             finally:
@@ -0,0 +1,385 @@
+import io
+import logging
+import random
+import re
+import string
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from connectors.base import BaseConnector
+from core.batch import ColumnBatch
+from core import lob
+from core.copy_text import iter_rows
+from mappings.parser import SyntheticColumnConfig, SyntheticSourceConfig, TableConfig
+
+logger = logging.getLogger(__name__)
+
+# Колонки в SELECT: "EXPR AS ALIAS" или просто "COL"
+_SELECT_RE = re.compile(r"^\s*SELECT\s+(.*?)\s+FROM\s", re.IGNORECASE | re.DOTALL)
+_ALIAS_RE = re.compile(r"\s+AS\s+(\S+)\s*$", re.IGNORECASE)
+
+_EPOCH = datetime(2020, 1, 1)
+
+# Сколько символов сериализованных строк копить перед записью в файл приёмника
+_FLUSH_CHARS = 1024 * 1024
+
+
+class SyntheticLob:
+    """Локатор LOB синтетического источника: read/size как у oracledb.LOB."""
+
+    def __init__(self, value: Union[str, bytes]):
+        self.value = value
+        self.type = _BLOB_TYPE if isinstance(value, bytes) else _CLOB_TYPE
+
+    def size(self) -> int:
+        return len(self.value)
+
+    def read(self, offset: int = 1, amount: Optional[int] = None) -> Union[str, bytes]:
+        start = offset - 1
+        return self.value[start:] if amount is None else self.value[start:start + amount]
+
+
+class _LobType:
+    def __init__(self, name: str):
+        self.name = name
+
+
+_CLOB_TYPE = _LobType("DB_TYPE_CLOB")
+_BLOB_TYPE = _LobType("DB_TYPE_BLOB")
+
+
+def infer_columns(table_cfg: TableConfig, spec: SyntheticSourceConfig) -> List[SyntheticColumnConfig]:
+    """
+    Колонки синтетического источника: из spec.columns или по mappings таблицы.
+    Тип угадывается по правилам: ключ чекпоинта/инкремента — seq, range — float,
+    regex из цифр — строка цифр, операции true/false — флаг 'Y'/'N', иначе строка.
+    """
+    if spec.columns:
+        return list(spec.columns)
+
+    seq_cols = {c.upper() for c in (table_cfg.checkpoint_column,) if c}
+    inc = table_cfg.incremental
+    if inc is not None and inc.column and inc.type == "id":
+        seq_cols.add(inc.column.upper())
+
+    columns: List[SyntheticColumnConfig] = []
+    for rule in table_cfg.mappings or []:
+        name = rule.source
+        col_type = "str"
+        kwargs: Dict[str, Any] = {}
+        ops = rule.transform or []
+        if name.upper() in seq_cols:
+            col_type = "seq"
+        elif inc is not None and inc.column and name.upper() == inc.column.upper() and inc.type == "timestamp":
+            col_type = "timestamp"
+        elif any("true" in op or "false" in op for op in ops):
+            col_type = "flag"
+        else:
+            for vr in rule.validation or []:
+                if vr.type == "range" and vr.pattern:
+                    col_type = "float"
+                    try:
+                        low, high = vr.pattern.split("-", 1)
+                        kwargs.update(min_value=float(low), max_value=float(high))
+                    except ValueError:
+                        pass
+                elif vr.type == "regex" and vr.pattern and re.fullmatch(r"\^?\[0-9\]\+\$?", vr.pattern):
+                    col_type = "int"
+        columns.append(SyntheticColumnConfig(name=name, type=col_type, **kwargs))
+    return columns
+
+
+class SyntheticSourceConnector(BaseConnector):
+    """
+    Синтетический источник вместо Oracle для бенчмарков.
+    Генерирует spec.rows строк по колонкам таблицы; заранее строится пул из
+    pool_size разных строк, дальше строки повторяются (seq-колонки уникальны),
+    так что время выборки — это стоимость выдачи словарей, а не генерации.
+    fetch() понимает список колонок SELECT (включая алиасы), остальное в запросе игнорируется.
+    """
+
+    def __init__(self, table_cfg: TableConfig, spec: Optional[SyntheticSourceConfig] = None):
+        self.table_cfg = table_cfg
+        self.spec = spec or table_cfg.synthetic or SyntheticSourceConfig()
+        self.columns = infer_columns(table_cfg, self.spec)
+        self._pool: List[Tuple[Any, ...]] = []
+        self.conn = None
+
+    # ------------------------------------------------------------ генерация
+
+    def _value(self, rnd: random.Random, col: SyntheticColumnConfig) -> Any:
+        spec = self.spec
+        null_ratio = spec.null_ratio if col.null_ratio is None else col.null_ratio
+        if null_ratio and rnd.random() < null_ratio:
+            return None
+        kind = col.type
+        if kind == "int":
+            return rnd.randint(int(col.min_value), int(col.max_value))
+        if kind == "float":
+            return rnd.uniform(col.min_value, col.max_value)
+        if kind == "decimal":
+            return Decimal(f"{rnd.uniform(col.min_value, col.max_value):.2f}")
+        if kind == "date":
+            return (_EPOCH + timedelta(days=rnd.randint(0, 3650))).date()
+        if kind == "timestamp":
+            return _EPOCH + timedelta(seconds=rnd.randint(0, 10 * 365 * 86400))
+        if kind == "flag":
+            return rnd.choice("YN")
+        if kind == "clob":
+            size = spec.lob_size if col.lob_size is None else col.lob_size
+            return "".join(rnd.choices(string.ascii_letters + " ", k=size))
+        if kind == "blob":
+            size = spec.lob_size if col.lob_size is None else col.lob_size
+            return rnd.randbytes(size)
+        length = spec.string_length if col.length is None else col.length
+        return "".join(rnd.choices(string.ascii_letters + string.digits + " ", k=length))
+
+    def connect(self) -> None:
+        rnd = random.Random(self.spec.seed)
+        self._pool = [
+            tuple(None if c.type == "seq" else self._value(rnd, c) for c in self.columns)
+            for _ in range(min(self.spec.pool_size, max(1, self.spec.rows)))
+        ]
+        logger.info("Синтетический источник %s: %d строк, %d колонок",
+                    self.table_cfg.source_table, self.spec.rows, len(self.columns))
+
+    def _select_columns(self, query: str, params: Optional[dict] = None) -> List[Tuple[str, Optional[int], Any]]:
+        """
+        (имя в выдаче, индекс колонки в пуле, преобразование значения или None)
+        для каждого выражения SELECT. Разделение LOB на значение и локатор
+        (core.lob.select_expressions) выполняется по порогу из params.
+        """
+        index = {c.name.upper(): i for i, c in enumerate(self.columns)}
+        m = _SELECT_RE.match(query)
+        if not m or m.group(1).strip() == "*":
+            return [(c.name.upper(), i, None) for i, c in enumerate(self.columns)]
+        limit = (params or {}).get(lob.INLINE_PARAM, 0)
+        out: List[Tuple[str, Optional[int], Any]] = []
+        for expr in m.group(1).split(","):
+            expr = expr.strip()
+            alias = _ALIAS_RE.search(expr)
+            if alias:
+                name = alias.group(1).strip('"').upper()
+                source = _ALIAS_RE.sub("", expr).strip().upper()
+            else:
+                name = source = expr.strip('"').upper()
+            conv = None
+            split = lob.SPLIT_RE.match(source)
+            if split:
+                source = split.group(1).upper()
+                if split.group(2) == "<=":
+                    conv = lambda v: v if v is not None and len(v) <= limit else None
+                else:
+                    conv = lambda v: SyntheticLob(v) if v is not None and len(v) > limit else None
+            elif name.endswith(lob.LOCATOR_SUFFIX):
+                conv = lambda v: SyntheticLob(v) if v is not None else None
+            out.append((name, index.get(source), conv))
+        return out
+
+    def lob_columns(self, schema: str, table: str) -> List[str]:
+        return [c.name.upper() for c in self.columns if c.type in ("clob", "blob")]
+
+    def fetch(
+        self,
+        query: str,
+        batch_size: Optional[int] = None,
+        params: Optional[dict] = None,
+        arraysize: Optional[int] = None,
+        prefetchrows: Optional[int] = None,
+        inline_lobs: bool = False,
+    ) -> Iterator[dict]:
+        names, tuples = self._tuples(query, params)
+        for row in tuples:
+            yield dict(zip(names, row))
+
+    def fetch_tuples(
+        self,
+        query: str,
+        batch_size: Union[int, Callable[[], int]],
+        params: Optional[dict] = None,
+        arraysize: Optional[int] = None,
+        prefetchrows: Optional[int] = None,
+        inline_lobs: bool = False,
+    ) -> Iterator[Tuple[Dict[str, int], List[tuple]]]:
+        """Как OracleConnector.fetch_tuples: (общий индекс колонок, список кортежей)."""
+        size = batch_size if callable(batch_size) else (lambda: batch_size)
+        names, tuples = self._tuples(query, params)
+        index = {name: pos for pos, name in enumerate(names)}
+        chunk: List[tuple] = []
+        limit = size()
+        for row in tuples:
+            chunk.append(row)
+            if len(chunk) >= limit:
+                yield index, chunk
+                chunk = []
+                limit = size()
+        if chunk:
+            yield index, chunk
+
+    def fetch_arrow(
+        self,
+        query: str,
+        batch_size: int,
+        params: Optional[dict] = None,
+    ) -> Iterator[Any]:
+        """Как OracleConnector.fetch_arrow: pyarrow.Table по batch_size строк."""
+        import pyarrow
+
+        for index, chunk in self.fetch_tuples(query, batch_size, params):
+            names = sorted(index, key=index.get)
+            yield pyarrow.table(dict(zip(names, (list(col) for col in zip(*chunk)))))
+
+    def _tuples(self, query: str, params: Optional[dict] = None) -> Tuple[List[str], Iterator[tuple]]:
+        """Имена колонок выдачи и генератор кортежей строк."""
+        if not self._pool and self.spec.rows:
+            raise RuntimeError("SyntheticSourceConnector: соединение не установлено.")
+        selected = self._select_columns(query, params)
+        names = [name for name, _, _ in selected]
+        seq_pos = [pos for pos, (_, idx, _) in enumerate(selected)
+                   if idx is not None and self.columns[idx].type == "seq"]
+        picks = [(idx, conv) for _, idx, conv in selected]
+        pool = [
+            tuple((conv(row[i]) if conv else row[i]) if i is not None else None for i, conv in picks)
+            for row in self._pool
+        ]
+
+        def rows() -> Iterator[tuple]:
+            size = len(pool)
+            for n in range(self.spec.rows):
+                row = pool[n % size]
+                if seq_pos:
+                    row = list(row)
+                    for pos in seq_pos:
+                        row[pos] = n + 1
+                    row = tuple(row)
+                yield row
+
+        return names, rows()
+
+    def execute(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> Any:
+        # служебные запросы fetcher'ов (метаданные, SCN) — пустой результат
+        return []
+
+    def close(self) -> None:
+        self._pool = []
+
+
+class _NullCursor:
+    """Курсор-заглушка приёмника: запросы не выполняются, результат пустой."""
+    rowcount = 0
+    description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, query, params=None):
+        return None
+
+    def executemany(self, query, seq):
+        return None
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class _NullConnection:
+    """DB-API-подобное соединение: lookup-запросы плагинов не находят строк."""
+    autocommit = False
+
+    def cursor(self, *args, **kwargs):
+        return _NullCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SyntheticSinkConnector(BaseConnector):
+    """
+    Приёмник вместо Postgres для бенчмарков (загрузка — через sink_loader):
+      - mode="count": только считает строки;
+      - mode="serialize": сериализует строки в текстовый формат COPY
+        (в память с отбрасыванием или в файл path) и считает байты.
+    Атрибут conn — соединение-заглушка, чтобы lookup-плагины работали без базы.
+    """
+
+    def __init__(self, mode: str = "count", path: Optional[str] = None):
+        if mode not in ("count", "serialize"):
+            raise ValueError(f"Неизвестный режим приёмника: {mode}")
+        self.mode = mode
+        self.path = path
+        self.rows = 0
+        self.bytes = 0
+        self.conn = None
+        self._out = None
+
+    def connect(self) -> None:
+        self.conn = _NullConnection()
+        if self.mode == "serialize" and self.path:
+            self._out = open(self.path, "w", encoding="utf-8")
+
+    def write_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        self.rows += len(rows)
+        if self.mode == "count" or not rows:
+            return
+        columns = list(rows[0].keys())
+        # iter_rows: LobStream сериализуются частями, как при COPY в DefaultLoader
+        buf = io.StringIO()
+        for part in iter_rows([row.get(c) for c in columns] for row in rows):
+            buf.write(part)
+            if self._out is not None and buf.tell() >= _FLUSH_CHARS:
+                self._flush(buf)
+                buf = io.StringIO()
+        self._flush(buf)
+
+    def _flush(self, buf: io.StringIO) -> None:
+        data = buf.getvalue()
+        self.bytes += len(data.encode("utf-8"))
+        if self._out is not None:
+            self._out.write(data)
+
+    def write_batch(self, table: str, batch: ColumnBatch) -> None:
+        """Колоночный батч: колонки Arrow сериализуются в csv (как для COPY) без строк-словарей."""
+        if self.mode == "count" or not batch.has_arrow():
+            if self.mode == "count":
+                self.rows += len(batch)
+            else:
+                self.write_rows(table, batch.to_rows())
+            return
+        from core.copy_arrow import format_csv
+
+        self.rows += len(batch)
+        data = format_csv(batch, list(batch.columns))
+        self.bytes += len(data)
+        if self._out is not None:
+            self._out.write(data.decode("utf-8"))
+
+    def fetch(self, query: str, batch_size: Optional[int] = None) -> Iterator[dict]:
+        return iter(())
+
+    def execute(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> Any:
+        return []
+
+    def get_table_columns(self, schema: str, table: str) -> List[str]:
+        return []
+
+    def close(self) -> None:
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        self.conn = None
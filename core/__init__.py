@@ -1,2 +1,3 @@
 from .plugin_registry import register_auto_mapping, register_fetcher, register_transform, get_plugin, register_validation, register_loader
+from .plugin_registry import register_async_fetcher, register_async_loader
 from .context import ExecutionContext
@@ -0,0 +1,351 @@
+# core/async_engine.py
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from connectors.async_oracle_connector import AsyncOracleConnector, create_pool as create_oracle_pool
+from connectors.async_postgres_connector import AsyncPostgresConnector, create_pool as create_postgres_pool
+from connectors.postgres_connector import PostgresConnector
+from core.batch_sizer import AdaptiveBatchSizer
+from core.chain import batch_capable, process_columns, process_rows
+from core.checkpoint import attach_checkpoints, batch_source_key, table_key
+from core.context import ExecutionContext
+from core.plugin_registry import get_plugin
+from core.row_plan import compile_row_plan
+from core.scheduler import DependencyQueue, TableScheduler
+from mappings.parser import AsyncEngineConfig, Config, TableConfig
+
+logger = logging.getLogger(__name__)
+
+# Маркер конца выборки в очереди таблицы
+_DONE = object()
+
+
+class _OracleBridge:
+    """
+    Синхронный execute поверх AsyncOracleConnector для кода, который ждёт
+    BaseConnector (TableScheduler.segment_sizes). Вызывается только из рабочего потока.
+    """
+
+    def __init__(self, conn: AsyncOracleConnector, loop: asyncio.AbstractEventLoop):
+        self.conn = conn
+        self.loop = loop
+
+    def execute(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> Any:
+        return asyncio.run_coroutine_threadsafe(self.conn.execute(query, params), self.loop).result()
+
+
+class AsyncEngine:
+    """
+    Асинхронный движок (execution_mode: async): все таблицы в одном event loop.
+      - выборка — AsyncFetcherPlugin на сессиях асинхронного пула Oracle
+        (не больше oracle_sessions одновременно);
+      - загрузка — AsyncLoaderPlugin на соединениях пула asyncpg
+        (не больше postgres_connections);
+      - transform/validate — синхронные плагины цепочки в пуле chain_threads потоков,
+        их lookup-запросы идут через синхронный PostgresConnector таблицы
+        (с connectors.postgres.pool — через полосу lookup);
+      - порядок таблиц — тот же DAG зависимостей, что у TableScheduler,
+        одновременно не больше max_tables.
+    Внутри таблицы выборка следующих батчей идёт параллельно с обработкой
+    и загрузкой текущего через очередь на queue_size батчей.
+
+    fetcher_plugin/loader_plugin таблицы заменяются асинхронным вариантом
+    (async_<имя>); таблица, у плагинов которой его нет, не запускается —
+    запуск прерывается до начала загрузки. Без своих плагинов таблица идёт
+    через async_engine.fetcher_plugin/loader_plugin.
+    Асинхронный loader не поддерживает бюджет памяти adaptive_batch, потоковые
+    LOB, defer_indexes и боковую таблицу self_lookup (self-lookup — через
+    tmp-колонки): для таких таблиц в лог пишется предупреждение.
+    """
+
+    def __init__(self, cfg: Config, resume: bool = False):
+        self.cfg = cfg
+        self.resume = resume
+        self.settings: AsyncEngineConfig = cfg.global_config.async_engine or AsyncEngineConfig()
+        self.tables = cfg.tables
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._ora_pool = None
+        self._pg_pool = None
+        self._plugins: Dict[int, Tuple[str, str]] = {}
+
+    async def _call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Синхронный вызов (плагины, psycopg2) в пуле потоков движка."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads, partial(fn, *args, **kwargs))
+
+    # ------------------------------------------------------------ запуск
+
+    def _async_plugin(self, name: Optional[str], category: str, default: str) -> str:
+        """Имя асинхронного варианта плагина таблицы (name — синхронный fetcher/loader или None)."""
+        if name is None:
+            return default
+        for candidate in (name, f"async_{name}", f"Async{name}"):
+            try:
+                get_plugin(candidate, f"async_{category}")
+                return candidate
+            except ImportError:
+                continue
+        raise LookupError(name)
+
+    def _resolve_plugins(self) -> Dict[int, Tuple[str, str]]:
+        """
+        Асинхронные fetcher и loader каждой таблицы. Таблицы без асинхронных
+        вариантов своих плагинов прерывают запуск до начала загрузки.
+        """
+        plugins: Dict[int, Tuple[str, str]] = {}
+        unsupported = []
+        for idx, table_cfg in enumerate(self.tables):
+            try:
+                fetcher = self._async_plugin(table_cfg.fetcher_plugin, "fetcher", self.settings.fetcher_plugin)
+                loader = self._async_plugin(table_cfg.loader_plugin, "loader", self.settings.loader_plugin)
+            except LookupError as e:
+                unsupported.append(f"{table_cfg.source_table} ({e.args[0]})")
+                continue
+            plugins[idx] = (fetcher, loader)
+            ignored = [
+                option for option, value in (
+                    ("lob", table_cfg.lob),
+                    ("defer_indexes", table_cfg.defer_indexes),
+                    ("self_lookup", table_cfg.self_lookup),
+                    ("chunking", table_cfg.chunking),
+                ) if value is not None
+            ]
+            if ignored:
+                logger.warning("Таблица %s: в execution_mode: async не поддерживается %s — настройки пропущены",
+                               table_cfg.source_table, ", ".join(ignored))
+        if unsupported:
+            raise RuntimeError(
+                "Нет асинхронного варианта плагинов для таблиц: " + "; ".join(unsupported) +
+                " — обработайте их в execution_mode: serial или staged"
+            )
+        return plugins
+
+    async def run(self) -> None:
+        if self.cfg.global_config.profile is not None:
+            logger.warning("Профилирование в execution_mode: async не поддерживается и будет пропущено")
+        if self.cfg.global_config.adaptive_batch is not None:
+            logger.warning("Бюджет памяти adaptive_batch в execution_mode: async не применяется")
+        self._plugins = self._resolve_plugins()
+        self._threads = ThreadPoolExecutor(self.settings.chain_threads, thread_name_prefix="etl-chain")
+        self._ora_pool = create_oracle_pool(self.settings.oracle_sessions)
+        try:
+            self._pg_pool = await create_postgres_pool(self.settings.postgres_connections)
+            deps, sizes = await self._plan()
+            queue = DependencyQueue(self.tables, deps, sizes)
+            logger.info(
+                "Async-движок: %d таблиц, до %d одновременно, сессий Oracle %d, соединений Postgres %d",
+                len(self.tables), self.settings.max_tables,
+                self.settings.oracle_sessions, self.settings.postgres_connections
+            )
+            failed = await self._execute(queue)
+        finally:
+            if self._pg_pool is not None:
+                await self._pg_pool.close()
+            await self._ora_pool.close(force=True)
+            self._threads.shutdown(wait=True)
+        if failed is not None:
+            raise RuntimeError(f"Асинхронная обработка таблиц прервана: {failed}") from failed
+
+    async def _plan(self) -> Tuple[Dict[int, Set[int]], Dict[int, int]]:
+        """DAG зависимостей и размеры таблиц (как TableScheduler.plan, но на пуле Oracle движка)."""
+        scheduler = TableScheduler(self.cfg, self.settings.max_tables, self.resume)
+        try:
+            deps = await self._call(self._build_graph, scheduler)
+        except Exception as e:
+            logger.warning("Postgres недоступен для построения DAG, только lookup-зависимости: %s", e)
+            deps = scheduler.build_graph(None)
+        try:
+            async with AsyncOracleConnector(self._ora_pool) as ora:
+                bridge = _OracleBridge(ora, asyncio.get_running_loop())
+                sizes = await self._call(scheduler.segment_sizes, bridge)
+        except Exception as e:
+            logger.warning("Oracle недоступен для оценки размеров, порядок из конфига: %s", e)
+            sizes = scheduler.segment_sizes(None)
+        return deps, sizes
+
+    @staticmethod
+    def _build_graph(scheduler: TableScheduler) -> Dict[int, Set[int]]:
+        with PostgresConnector() as pg_conn:
+            return scheduler.build_graph(pg_conn)
+
+    async def _execute(self, queue: DependencyQueue) -> Optional[BaseException]:
+        """Запускает готовые таблицы задачами event loop. Возвращает первую ошибку или None."""
+        failed: Optional[BaseException] = None
+        running: Dict[asyncio.Task, int] = {}
+        while queue.pending() or running:
+            while failed is None and queue.ready and len(running) < self.settings.max_tables:
+                idx = queue.pop()
+                table_cfg = self.tables[idx]
+                logger.info("Запуск таблицы %s → %s (%d байт)",
+                            table_cfg.source_table, table_cfg.target_table, queue.sizes.get(idx, 0))
+                task = asyncio.create_task(self._table(table_cfg, *self._plugins[idx]),
+                                           name=f"table-{table_cfg.source_table}")
+                running[task] = idx
+
+            if not running:
+                if failed is not None:
+                    break
+                queue.break_cycle()
+                continue
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                idx = running.pop(task)
+                exc = task.exception()
+                if exc is not None:
+                    logger.error("Ошибка обработки таблицы %s: %s", self.tables[idx].source_table, exc)
+                    failed = failed or exc
+                    continue
+                queue.complete(idx)
+
+            if failed is not None:
+                # новые таблицы не запускаем, дожидаемся уже запущенных
+                queue.cancel()
+        return failed
+
+    # ------------------------------------------------------------ таблица
+
+    async def _table(self, table_cfg: TableConfig, fetcher_name: str, loader_name: str) -> None:
+        # сессия Oracle берётся раньше соединения Postgres — у всех таблиц в одном порядке
+        async with AsyncOracleConnector(self._ora_pool) as ora, \
+                AsyncPostgresConnector(self._pg_pool) as pg_async:
+            pg_conn = PostgresConnector()
+            await self._call(pg_conn.connect)
+            try:
+                await self._process_table(table_cfg, ora, pg_conn, pg_async, fetcher_name, loader_name)
+            finally:
+                await self._call(pg_conn.close)
+
+    async def _process_table(
+        self,
+        table_cfg: TableConfig,
+        ora: AsyncOracleConnector,
+        pg_conn: PostgresConnector,
+        pg_async: AsyncPostgresConnector,
+        fetcher_name: str,
+        loader_name: str,
+    ) -> None:
+        """Асинхронный аналог pipeline.process_table."""
+        g = self.cfg.global_config
+        table_start = datetime.now()
+        batch_size = g.batch_size
+
+        ctx = ExecutionContext(table_cfg, 0, ora, pg_conn)
+        ctx.pg_async = pg_async
+        ctx.header(table_cfg.target_table, table_cfg.source_table)
+        logger.info("Начало обработки %s", table_start)
+
+        # 1.0) Чекпоинты и продолжение прерванной загрузки
+        checkpoints = None
+        cp_key = table_key(table_cfg)
+        if g.checkpoints or self.resume:
+            ctx = await self._call(attach_checkpoints, ctx, pg_conn, self.resume)
+            if ctx is None:
+                return
+            ctx.pg_async = pg_async
+            checkpoints = ctx.checkpoint
+        batch_id = ctx.batch_id
+
+        # 1.0.1) Метрики по этапам
+        if g.metrics is not None:
+            from core.metrics import get_metrics
+            ctx.metrics = get_metrics().table(cp_key)
+
+        # 1.1) Auto-mapping и план transform/validation
+        auto_mapper = get_plugin(g.auto_mapping_plugin, 'auto_mapping')(pg_conn)
+        await self._call(auto_mapper.apply, ctx, table_cfg)
+        await self._call(compile_row_plan, table_cfg)
+
+        # 2) Плагины таблицы
+        fetcher = get_plugin(fetcher_name, 'async_fetcher')()
+        transformers = [get_plugin(n, 'transform')() for n in (table_cfg.transform_plugins or [])]
+        if not table_cfg.transform_override:
+            transformers = [get_plugin(n, 'transform')() for n in g.transform_plugins] + transformers
+        validators = [get_plugin(n, 'validation')() for n in g.validation_plugins]
+        loader = get_plugin(loader_name, 'async_loader')()
+        columnar = batch_capable(transformers, validators)
+
+        await loader.pre_load(ctx, batch_id)
+
+        # 3) fetch → (transform/validate в потоке) → load
+        sizer = AdaptiveBatchSizer(g.adaptive_batch, batch_size)
+        batches: asyncio.Queue = asyncio.Queue(maxsize=g.queue_size)
+        producer = asyncio.create_task(self._fetch(ctx, fetcher, sizer, batches))
+        try:
+            while True:
+                raw = await batches.get()
+                if raw is _DONE:
+                    break
+                if batch_id > ctx.batch_id:
+                    ctx = ctx.for_batch(batch_id)
+                ctx.last_source_key = batch_source_key(table_cfg, raw)
+                if columnar:
+                    rows = await self._call(process_columns, ctx, raw, transformers, validators)
+                else:
+                    rows = await self._call(process_rows, ctx, raw.to_rows(), transformers, validators)
+                if not rows:
+                    if ctx.metrics is not None:
+                        ctx.metrics.batch_done(raw, rows)
+                    continue
+                load_started = time.perf_counter()
+                await loader.load_batch(ctx, rows)
+                load_sec = time.perf_counter() - load_started
+                sizer.observe(raw, load_sec)
+                if ctx.metrics is not None:
+                    ctx.metrics.batch_done(raw, rows, load_sec, ctx.commit_sec)
+                ctx.info("Батч #%d загружен (%d строк)", batch_id, len(rows))
+                batch_id += 1
+            # ошибка выборки пробрасывается здесь
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+        # 4) Финализация таблицы
+        await loader.finalize_table(ctx)
+        # fetcher может зафиксировать своё состояние (например, watermark) после загрузки
+        fetcher_fin = getattr(fetcher, "finalize_table", None)
+        if callable(fetcher_fin):
+            result = fetcher_fin(ctx)
+            if asyncio.iscoroutine(result):
+                await result
+        if checkpoints is not None:
+            await self._call(checkpoints.finish, cp_key)
+        if ctx.metrics is not None:
+            ctx.metrics.finish()
+        table_end = datetime.now()
+        ctx.info("Таблица %s обработана", table_cfg.source_table)
+        logger.info("Обработка таблицы %s закончена в %s, за %s",
+                    table_cfg.source_table, table_end, table_end - table_start)
+
+    async def _fetch(self, ctx: ExecutionContext, fetcher, sizer: AdaptiveBatchSizer,
+                     batches: asyncio.Queue) -> None:
+        """Выборка таблицы в очередь; время каждого батча — в batch.fetch_sec."""
+        try:
+            it = fetcher.fetch_batches(ctx, sizer.current_size).__aiter__()
+            while True:
+                started = time.perf_counter()
+                try:
+                    batch = await it.__anext__()
+                except StopAsyncIteration:
+                    break
+                batch.fetch_sec = time.perf_counter() - started
+                batch.nbytes = 0
+                await batches.put(batch)
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            await batches.put(_DONE)
+            raise
+        await batches.put(_DONE)
+
+
+async def run_pipeline_async(cfg: Config, resume: bool = False) -> None:
+    """Точка входа execution_mode: async для уже работающего event loop."""
+    await AsyncEngine(cfg, resume).run()
@@ -0,0 +1,155 @@
+# core/batch.py
+from itertools import compress
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+def is_arrow(values: Any) -> bool:
+    """True для колонок pyarrow (Array / ChunkedArray)."""
+    return hasattr(values, "to_pylist")
+
+
+class ColumnBatch:
+    """
+    Колоночное представление батча для transform_batch / validate_batch:
+      - columns: имя колонки → значения (list, np.ndarray или массив pyarrow одинаковой длины);
+      - skip:    булева маска строк, помеченных на пропуск (аналог row['_skip']).
+    Колонки pyarrow (from_arrow) превращаются в объекты Python только при обращении
+    через column(); raw() отдаёт колонку как есть, без преобразования.
+    """
+
+    def __init__(
+        self,
+        columns: Optional[Dict[str, Any]] = None,
+        length: int = 0,
+        skip: Optional[np.ndarray] = None,
+    ):
+        self.columns: Dict[str, Any] = columns if columns is not None else {}
+        self.length = length
+        self.skip = skip if skip is not None else np.zeros(length, dtype=bool)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Dict[str, Any]]) -> "ColumnBatch":
+        """Строит батч из списка словарей; отсутствующие в строке поля → None."""
+        names: Dict[str, None] = {}
+        for row in rows:
+            for key in row:
+                names.setdefault(key, None)
+        names.pop('_skip', None)
+        columns = {name: [row.get(name) for row in rows] for name in names}
+        batch = cls(columns, len(rows))
+        skipped = [bool(row.get('_skip')) for row in rows]
+        if any(skipped):
+            batch.skip = np.array(skipped, dtype=bool)
+        return batch
+
+    @classmethod
+    def from_tuples(cls, index: Dict[str, int], rows: Sequence[tuple]) -> "ColumnBatch":
+        """Строит батч из кортежей курсора и общего индекса колонок, минуя словари."""
+        names = sorted(index, key=index.get)
+        if not rows:
+            return cls({name: [] for name in names}, 0)
+        columns = dict(zip(names, (list(col) for col in zip(*rows))))
+        return cls(columns, len(rows))
+
+    @classmethod
+    def from_arrow(cls, data: Any) -> "ColumnBatch":
+        """Строит батч из pyarrow.Table / RecordBatch, колонки остаются массивами Arrow."""
+        columns: Dict[str, Any] = {}
+        for name, col in zip(data.schema.names, data.columns):
+            if hasattr(col, "combine_chunks"):
+                col = col.combine_chunks()
+            columns[name] = col
+        return cls(columns, data.num_rows)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def column(self, name: str) -> Any:
+        """Значения колонки; если колонки нет — столбец из None."""
+        col = self.columns.get(name)
+        if col is None:
+            return [None] * self.length
+        if is_arrow(col):
+            # колонку трогает плагин — один раз переводим в объекты Python
+            col = self.columns[name] = col.to_pylist()
+        return col
+
+    def raw(self, name: str) -> Any:
+        """Значения колонки без преобразования (массив Arrow остаётся массивом Arrow)."""
+        col = self.columns.get(name)
+        if col is None:
+            return [None] * self.length
+        return col
+
+    def value(self, name: str, index: int) -> Any:
+        """Одно значение колонки, не материализуя колонку Arrow целиком."""
+        col = self.columns[name]
+        if is_arrow(col):
+            return col[index].as_py()
+        return col[index]
+
+    def has_arrow(self) -> bool:
+        """True, если хотя бы одна колонка всё ещё в формате Arrow."""
+        return any(is_arrow(col) for col in self.columns.values())
+
+    def set_column(self, name: str, values: Any) -> None:
+        if len(values) != self.length:
+            raise ValueError(
+                f"Длина колонки {name} ({len(values)}) не совпадает с длиной батча ({self.length})"
+            )
+        self.columns[name] = values
+
+    def mark_skip(self, mask: np.ndarray) -> None:
+        self.skip = self.skip | mask
+
+    @property
+    def active(self) -> np.ndarray:
+        """Маска строк, которые ещё не пропущены."""
+        return ~self.skip
+
+    @staticmethod
+    def as_list(values: Any) -> List[Any]:
+        if isinstance(values, np.ndarray):
+            return values.tolist()
+        if is_arrow(values):
+            return values.to_pylist()
+        return values if isinstance(values, list) else list(values)
+
+    def compact(self) -> "ColumnBatch":
+        """Батч без пропущенных строк (для колоночной загрузки)."""
+        if not self.skip.any():
+            return self
+        keep = ~self.skip
+        columns: Dict[str, Any] = {}
+        for name, values in self.columns.items():
+            if is_arrow(values) or isinstance(values, np.ndarray):
+                columns[name] = values.filter(keep) if is_arrow(values) else values[keep]
+            else:
+                columns[name] = list(compress(values, keep))
+        return ColumnBatch(columns, int(keep.sum()))
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """Возвращает строки-словари для loader'а, без пропущенных."""
+        names = list(self.columns)
+        cols = [self.as_list(self.columns[name]) for name in names]
+        rows = [dict(zip(names, values)) for values in zip(*cols)] if names else [{} for _ in range(self.length)]
+        if self.skip.any():
+            rows = [row for row, skipped in zip(rows, self.skip) if not skipped]
+        return rows
+
+
+def iter_batches(rows: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Группирует поток строк в списки по batch_size."""
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
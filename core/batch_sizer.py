@@ -0,0 +1,273 @@
+# core/batch_sizer.py
+import logging
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from core.batch import is_arrow
+from core.lob import LobStream
+from mappings.parser import AdaptiveBatchConfig
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+class MemoryBudget:
+    """
+    Общий на процесс бюджет памяти под буферы батчей.
+    Батч резервирует оценку своего размера до заполнения и освобождает после загрузки;
+    если бюджет исчерпан, выборка следующего батча ждёт.
+    Батч больше всего бюджета пропускается, только когда других резервов нет.
+    """
+
+    def __init__(self, limit_bytes: int = 0):
+        self.limit = limit_bytes
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def configure(self, limit_bytes: int) -> None:
+        with self._cond:
+            self.limit = limit_bytes
+            self._cond.notify_all()
+
+    def wake(self) -> None:
+        """Будит ожидающих acquire, чтобы они проверили свой признак отмены."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def acquire(self, nbytes: int, timeout: Optional[float] = None,
+                cancel: Optional[threading.Event] = None) -> int:
+        """
+        Резервирует nbytes, дожидаясь освобождения бюджета. После cancel
+        возвращает 0 без резерва (конвейер уже останавливается); если за timeout
+        секунд бюджет не освободился — RuntimeError (держатель резервов, скорее
+        всего, завис или погиб).
+        """
+        if self.limit <= 0 or nbytes <= 0:
+            return 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.used and self.used + nbytes > self.limit:
+                if cancel is not None and cancel.is_set():
+                    return 0
+                wait = 0.5
+                if deadline is not None:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        raise RuntimeError(
+                            f"Бюджет памяти батчей не освободился за {timeout:.0f} с "
+                            f"(занято {self.used // _MB} из {self.limit // _MB} МБ)"
+                        )
+                    wait = min(wait, left)
+                self._cond.wait(wait)
+            self.used += nbytes
+        return nbytes
+
+    def try_acquire(self, nbytes: int) -> int:
+        """Резервирует без ожидания; возвращает фактически зарезервированное."""
+        if self.limit <= 0 or nbytes <= 0:
+            return 0
+        with self._cond:
+            granted = max(0, min(nbytes, self.limit - self.used))
+            self.used += granted
+        return granted
+
+    def release(self, nbytes: int) -> None:
+        if nbytes <= 0:
+            return
+        with self._cond:
+            self.used = max(0, self.used - nbytes)
+            self._cond.notify_all()
+
+
+# Бюджет процесса: воркеры планировщика — отдельные процессы, каждому
+# достаётся memory_budget_mb / parallel_tables (budget_bytes)
+_BUDGET = MemoryBudget()
+
+
+def get_memory_budget() -> MemoryBudget:
+    return _BUDGET
+
+
+def budget_bytes(cfg: AdaptiveBatchConfig, processes: int = 1) -> int:
+    """Доля memory_budget_mb на один процесс из processes воркеров."""
+    return int(cfg.memory_budget_mb * _MB / max(1, processes))
+
+
+def value_bytes(value: Any) -> int:
+    """
+    Память значения: sys.getsizeof, кроме LOB — LobStream держит при загрузке
+    буфер chunk_size, а непрочитанный LOB Oracle займёт весь свой размер.
+    """
+    if isinstance(value, LobStream):
+        return value.chunk_size
+    if not isinstance(value, (str, bytes)) and callable(getattr(value, "read", None)) \
+            and callable(getattr(value, "size", None)):
+        try:
+            return value.size()
+        except Exception:
+            pass
+    return sys.getsizeof(value)
+
+
+def estimate_row_bytes(rows: List[Dict[str, Any]], sample: int = 20) -> float:
+    """Средний размер строки в памяти по выборке первых sample строк."""
+    if not rows:
+        return 0.0
+    step = max(1, len(rows) // sample)
+    picked = rows[::step][:sample]
+    total = 0
+    for row in picked:
+        total += sys.getsizeof(row)
+        for value in row.values():
+            total += value_bytes(value)
+    return total / len(picked)
+
+
+def estimate_batch_bytes(batch, sample: int = 20) -> int:
+    """Оценка объёма колоночного батча (ColumnBatch) по выборке строк."""
+    n = len(batch)
+    if not n:
+        return 0
+    step = max(1, n // sample)
+    picked = range(0, n, step)[:sample]
+    per_row = 0
+    for values in batch.columns.values():
+        if is_arrow(values):
+            # колонка Arrow: точный размер буферов
+            per_row += values.nbytes / n
+            continue
+        per_row += sum(value_bytes(values[i]) for i in picked) / len(picked)
+        per_row += 8  # ссылка в списке колонки
+    return int(per_row * n)
+
+
+class SizedBatch(list):
+    """Список строк батча с зарезервированным под него объёмом бюджета."""
+    reserved: int = 0
+    nbytes: int = 0
+    fetch_sec: float = 0.0
+
+
+class AdaptiveBatchSizer:
+    """
+    Подбирает размер батча таблицы на ходу:
+      - по задержке: fetch + load батча стремится к target_batch_seconds;
+      - по памяти: батч не больше max_batch_mb при измеренных байтах на строку;
+      - в пределах [min_size, max_size], рост не быстрее чем ×2 за шаг.
+    Без конфигурации (adaptive_batch не задан) размер фиксирован = batch_size.
+    """
+
+    def __init__(self, cfg: Optional[AdaptiveBatchConfig], batch_size: int,
+                 budget: Optional[MemoryBudget] = None):
+        self.cfg = cfg
+        self.budget = budget or get_memory_budget()
+        self.size = batch_size
+        self.row_bytes: Optional[float] = None
+        self.row_latency: Optional[float] = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        if cfg is not None:
+            self.size = max(cfg.min_size, min(cfg.max_size, batch_size))
+
+    @property
+    def enabled(self) -> bool:
+        return self.cfg is not None
+
+    def _reserve_estimate(self) -> int:
+        if not self.enabled or self.row_bytes is None:
+            return 0
+        return int(self.size * self.row_bytes)
+
+    def _acquire(self) -> int:
+        if not self.enabled:
+            return 0
+        return self.budget.acquire(self._reserve_estimate(), self.cfg.wait_timeout_sec, self._closed)
+
+    def close(self) -> None:
+        """Остановка таблицы: выборка больше не ждёт бюджет (вызывается при ошибке этапа)."""
+        self._closed.set()
+        self.budget.wake()
+
+    def batches(self, rows: Iterable[Dict[str, Any]]) -> Iterator[SizedBatch]:
+        """
+        Группирует поток строк в батчи текущего размера, резервируя под каждый
+        бюджет памяти и замеряя время выборки. Резерв освобождает release().
+        """
+        it = iter(rows)
+        while True:
+            reserved = self._acquire()
+            target = self.size
+            batch = SizedBatch()
+            started = time.perf_counter()
+            for row in it:
+                batch.append(row)
+                if len(batch) >= target:
+                    break
+            batch.fetch_sec = time.perf_counter() - started
+            if not batch:
+                self.budget.release(reserved)
+                return
+            if self.enabled:
+                batch.nbytes = int(estimate_row_bytes(batch) * len(batch))
+                # батч оказался больше резерва — добираем без ожидания
+                if batch.nbytes > reserved:
+                    reserved += self.budget.try_acquire(batch.nbytes - reserved)
+            batch.reserved = reserved
+            yield batch
+
+    def column_batches(self, batches: Iterable[Any]) -> Iterator[Any]:
+        """
+        То же, что batches(), для уже собранных колоночных батчей (fetch_batches):
+        размер порции fetcher берёт из current_size, здесь — резерв и замер выборки.
+        """
+        it = iter(batches)
+        while True:
+            reserved = self._acquire()
+            started = time.perf_counter()
+            batch = next(it, None)
+            if batch is None:
+                self.budget.release(reserved)
+                return
+            batch.fetch_sec = time.perf_counter() - started
+            batch.nbytes = 0
+            if self.enabled:
+                batch.nbytes = estimate_batch_bytes(batch)
+                if batch.nbytes > reserved:
+                    reserved += self.budget.try_acquire(batch.nbytes - reserved)
+            batch.reserved = reserved
+            yield batch
+
+    def current_size(self) -> int:
+        return self.size
+
+    def release(self, batch: List[Dict[str, Any]]) -> None:
+        reserved = getattr(batch, "reserved", 0)
+        if reserved:
+            self.budget.release(reserved)
+            batch.reserved = 0
+
+    def observe(self, batch: List[Dict[str, Any]], load_sec: float) -> None:
+        """Учитывает замеры загруженного батча и пересчитывает размер."""
+        if not self.enabled or not batch:
+            return
+        cfg = self.cfg
+        n = len(batch)
+        nbytes = getattr(batch, "nbytes", 0) or estimate_row_bytes(batch) * n
+        latency = (getattr(batch, "fetch_sec", 0.0) + load_sec) / n
+        with self._lock:
+            alpha = 0.5
+            per_row = nbytes / n
+            self.row_bytes = per_row if self.row_bytes is None else alpha * per_row + (1 - alpha) * self.row_bytes
+            self.row_latency = latency if self.row_latency is None else alpha * latency + (1 - alpha) * self.row_latency
+
+            by_time = cfg.target_batch_seconds / self.row_latency if self.row_latency > 0 else cfg.max_size
+            by_memory = (cfg.max_batch_mb * _MB) / self.row_bytes if self.row_bytes > 0 else cfg.max_size
+            wanted = int(min(by_time, by_memory, self.size * 2))
+            new_size = max(cfg.min_size, min(cfg.max_size, wanted))
+            if new_size != self.size:
+                logger.debug("Размер батча %d → %d (%.0f байт/строка, %.3f мс/строка)",
+                             self.size, new_size, self.row_bytes, self.row_latency * 1000)
+                self.size = new_size
@@ -0,0 +1,149 @@
+# core/chain.py
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from core.batch import ColumnBatch
+from core.context import ExecutionContext
+from plugin_interfaces.transform_interface import TransformPlugin
+from plugin_interfaces.validation_interface import ValidationPlugin
+
+
+def apply_chain(
+    ctx: ExecutionContext,
+    row: Dict[str, Any],
+    transformers: Sequence[TransformPlugin],
+    validators: Sequence[ValidationPlugin],
+) -> Optional[Dict[str, Any]]:
+    """
+    Прогоняет одну строку через трансформеры и валидаторы.
+    Возвращает готовую к загрузке строку или None, если валидация пометила её _skip.
+    """
+    rec = row
+    for tr in transformers:
+        rec = tr.transform(ctx, rec)
+    ctx.debug(f"Строка преобразована {rec}")
+    for v in validators:
+        rec = v.validate(ctx, rec)
+        if rec.get('_skip'):
+            ctx.info("Строка пропущена по валидации")
+            return None
+    return rec
+
+
+def finalize_batch(ctx: ExecutionContext, transformers: Sequence[TransformPlugin]) -> None:
+    """Вызывает finalize_batch у трансформеров, которые его реализуют."""
+    for tr in transformers:
+        fin = getattr(tr, "finalize_batch", None)
+        if callable(fin):
+            fin(ctx)
+
+
+def process_rows(
+    ctx: ExecutionContext,
+    rows: List[Dict[str, Any]],
+    transformers: Sequence[TransformPlugin],
+    validators: Sequence[ValidationPlugin],
+) -> List[Dict[str, Any]]:
+    """
+    Обрабатывает порцию сырых строк: transform → validate → finalize_batch.
+    """
+    if ctx.metrics is not None:
+        return _process_rows_timed(ctx, rows, transformers, validators)
+    out: List[Dict[str, Any]] = []
+    for raw in rows:
+        rec = apply_chain(ctx, raw, transformers, validators)
+        if rec is not None:
+            out.append(rec)
+    finalize_batch(ctx, transformers)
+    return out
+
+
+def _process_rows_timed(
+    ctx: ExecutionContext,
+    rows: List[Dict[str, Any]],
+    transformers: Sequence[TransformPlugin],
+    validators: Sequence[ValidationPlugin],
+) -> List[Dict[str, Any]]:
+    """process_rows с раздельным замером времени transform и validate (включены метрики)."""
+    clock = time.perf_counter
+    t_transform = t_validate = 0.0
+    out: List[Dict[str, Any]] = []
+    for raw in rows:
+        started = clock()
+        rec = raw
+        for tr in transformers:
+            rec = tr.transform(ctx, rec)
+        ctx.debug(f"Строка преобразована {rec}")
+        mid = clock()
+        t_transform += mid - started
+        skipped = False
+        for v in validators:
+            rec = v.validate(ctx, rec)
+            if rec.get('_skip'):
+                ctx.info("Строка пропущена по валидации")
+                skipped = True
+                break
+        t_validate += clock() - mid
+        if not skipped:
+            out.append(rec)
+    started = clock()
+    finalize_batch(ctx, transformers)
+    t_transform += clock() - started
+    ctx.metrics.observe("transform", t_transform)
+    ctx.metrics.observe("validate", t_validate)
+    return out
+
+
+def batch_capable(
+    transformers: Sequence[TransformPlugin],
+    validators: Sequence[ValidationPlugin],
+) -> bool:
+    """True, если каждый плагин цепочки поддерживает колоночный режим."""
+    return all(getattr(p, "supports_batch", False) for p in list(transformers) + list(validators))
+
+
+def process_batch(
+    ctx: ExecutionContext,
+    rows: List[Dict[str, Any]],
+    transformers: Sequence[TransformPlugin],
+    validators: Sequence[ValidationPlugin],
+) -> List[Dict[str, Any]]:
+    """
+    Колоночный вариант process_rows: батч один раз раскладывается по колонкам,
+    проходит transform_batch / validate_batch и собирается обратно в строки.
+    """
+    started = time.perf_counter()
+    return process_columns(ctx, ColumnBatch.from_rows(rows), transformers, validators, started)
+
+
+def process_columns(
+    ctx: ExecutionContext,
+    batch: ColumnBatch,
+    transformers: Sequence[TransformPlugin],
+    validators: Sequence[ValidationPlugin],
+    started: Optional[float] = None,
+    as_batch: bool = False,
+) -> Union[List[Dict[str, Any]], ColumnBatch]:
+    """
+    Цепочка над уже колоночным батчем (например, из fetch_batches):
+    transform_batch → validate_batch → строки для loader'а.
+    as_batch=True — вместо строк отдаётся батч без пропущенных строк (loader.load_columns).
+    """
+    if started is None:
+        started = time.perf_counter()
+    for tr in transformers:
+        batch = tr.transform_batch(ctx, batch)
+    transformed = time.perf_counter()
+    for v in validators:
+        batch = v.validate_batch(ctx, batch)
+    skipped = int(batch.skip.sum())
+    if skipped:
+        ctx.info("Пропущено по валидации строк: %d", skipped)
+    validated = time.perf_counter()
+    finalize_batch(ctx, transformers)
+    out = batch.compact() if as_batch else batch.to_rows()
+    if ctx.metrics is not None:
+        # сборка строк и finalize_batch относятся к transform
+        ctx.metrics.observe("transform", (transformed - started) + (time.perf_counter() - validated))
+        ctx.metrics.observe("validate", validated - transformed)
+    return out
@@ -0,0 +1,252 @@
+# core/checkpoint.py
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from psycopg2 import sql
+
+from core.batch import ColumnBatch
+from mappings.parser import TableConfig
+
+logger = logging.getLogger(__name__)
+
+
+def table_key(table_cfg: TableConfig) -> str:
+    """Идентификатор таблицы в контрольных таблицах: источник → приёмник."""
+    return (f"{table_cfg.source_schema}.{table_cfg.source_table}"
+            f"->{table_cfg.target_schema or 'public'}.{table_cfg.target_table}")
+
+
+def encode_key(value: Any) -> Optional[str]:
+    """Сериализует ключ источника в JSON с типом, чтобы при resume вернуть тот же тип."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return json.dumps({"t": "bool", "v": value})
+    if isinstance(value, int):
+        return json.dumps({"t": "int", "v": str(value)})
+    if isinstance(value, Decimal):
+        return json.dumps({"t": "decimal", "v": str(value)})
+    if isinstance(value, float):
+        return json.dumps({"t": "float", "v": repr(value)})
+    if isinstance(value, datetime):
+        return json.dumps({"t": "datetime", "v": value.isoformat()})
+    if isinstance(value, date):
+        return json.dumps({"t": "date", "v": value.isoformat()})
+    return json.dumps({"t": "str", "v": str(value)})
+
+
+def decode_key(raw: Optional[str]) -> Any:
+    if raw is None:
+        return None
+    data = json.loads(raw)
+    kind, value = data["t"], data["v"]
+    if kind == "int":
+        return int(value)
+    if kind == "decimal":
+        return Decimal(value)
+    if kind == "float":
+        return float(value)
+    if kind == "datetime":
+        return datetime.fromisoformat(value)
+    if kind == "date":
+        return date.fromisoformat(value)
+    return value
+
+
+class Checkpoint:
+    """Состояние таблицы в etl_checkpoint."""
+    def __init__(self, status: str, batch_id: int, last_key: Any, rows_loaded: int):
+        self.status = status
+        self.batch_id = batch_id
+        self.last_key = last_key
+        self.rows_loaded = rows_loaded
+
+    @property
+    def done(self) -> bool:
+        return self.status == CheckpointStore.DONE
+
+
+class CheckpointStore:
+    """
+    Контрольная таблица чекпоинтов в Postgres.
+    На каждую таблицу хранится последний закоммиченный батч и ключ источника.
+    Запись батча выполняется на курсоре loader'а до его commit — то есть
+    в одной транзакции с данными, поэтому resume не теряет и не дублирует батчи.
+    """
+    RUNNING = "running"
+    DONE = "done"
+
+    def __init__(self, pg_conn, schema: str = "public", table: str = "etl_checkpoint"):
+        self.pg = pg_conn
+        self.ident = sql.Identifier(schema, table)
+        self.quoted = ".".join('"' + part.replace('"', '""') + '"' for part in (schema, table))
+
+    def ensure(self) -> None:
+        with self.pg.conn.cursor() as cur:
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {t} (
+                    table_key   text PRIMARY KEY,
+                    status      text        NOT NULL,
+                    batch_id    integer     NOT NULL DEFAULT -1,
+                    last_key    text,
+                    rows_loaded bigint      NOT NULL DEFAULT 0,
+                    updated_at  timestamptz NOT NULL DEFAULT now()
+                )
+            """).format(t=self.ident))
+        self.pg.conn.commit()
+
+    def get(self, key: str) -> Optional[Checkpoint]:
+        with self.pg.conn.cursor() as cur:
+            cur.execute(
+                sql.SQL("SELECT status, batch_id, last_key, rows_loaded FROM {t} WHERE table_key = %s")
+                .format(t=self.ident),
+                (key,)
+            )
+            row = cur.fetchone()
+        self.pg.conn.commit()
+        if not row:
+            return None
+        return Checkpoint(row[0], row[1], decode_key(row[2]), row[3])
+
+    def start(self, key: str) -> None:
+        """Начало таблицы с нуля: сбрасывает прогресс."""
+        with self.pg.conn.cursor() as cur:
+            cur.execute(
+                sql.SQL("""
+                    INSERT INTO {t} (table_key, status, batch_id, last_key, rows_loaded, updated_at)
+                    VALUES (%s, %s, -1, NULL, 0, now())
+                    ON CONFLICT (table_key) DO UPDATE
+                       SET status = EXCLUDED.status, batch_id = -1, last_key = NULL,
+                           rows_loaded = 0, updated_at = now()
+                """).format(t=self.ident),
+                (key, self.RUNNING)
+            )
+        self.pg.conn.commit()
+
+    def save_batch(self, cur, key: str, batch_id: int, last_key: Any, rows: int) -> None:
+        """Фиксирует батч на курсоре loader'а; commit делает сам loader."""
+        cur.execute(
+            sql.SQL("""
+                UPDATE {t}
+                   SET batch_id = %s, last_key = %s,
+                       rows_loaded = rows_loaded + %s, updated_at = now()
+                 WHERE table_key = %s
+            """).format(t=self.ident),
+            (batch_id, encode_key(last_key), rows, key)
+        )
+
+    async def save_batch_async(self, conn, key: str, batch_id: int, last_key: Any, rows: int) -> None:
+        """save_batch для асинхронного loader'а: conn — соединение asyncpg в его транзакции."""
+        await conn.execute(
+            f"""
+            UPDATE {self.quoted}
+               SET batch_id = $1, last_key = $2,
+                   rows_loaded = rows_loaded + $3, updated_at = now()
+             WHERE table_key = $4
+            """,
+            batch_id, encode_key(last_key), rows, key
+        )
+
+    def finish(self, key: str) -> None:
+        with self.pg.conn.cursor() as cur:
+            cur.execute(
+                sql.SQL("UPDATE {t} SET status = %s, updated_at = now() WHERE table_key = %s")
+                .format(t=self.ident),
+                (self.DONE, key)
+            )
+        self.pg.conn.commit()
+
+
+def attach_checkpoints(ctx, pg_conn, resume: bool = False):
+    """
+    Включает чекпоинты для таблицы контекста. При resume завершённая таблица
+    пропускается (возвращается None), частично загруженная продолжается
+    с батча после последнего закоммиченного ключа; иначе прогресс сбрасывается.
+    Возвращает контекст первого батча с заполненным checkpoint.
+    """
+    table_cfg = ctx.table_cfg
+    cp_key = table_key(table_cfg)
+    checkpoints = CheckpointStore(pg_conn)
+    checkpoints.ensure()
+    cp = checkpoints.get(cp_key) if resume else None
+    if cp is not None and cp.done:
+        ctx.info("Таблица %s уже загружена по чекпоинту, пропускаю", table_cfg.source_table)
+        return None
+    if cp is not None and cp.batch_id >= 0 and table_cfg.checkpoint_column and cp.last_key is not None:
+        batch_id = cp.batch_id + 1
+        ctx = ctx.for_batch(batch_id)
+        ctx.resume_key = cp.last_key
+        ctx.info("Продолжаю загрузку с батча #%d после %s=%r (уже загружено %d строк)",
+                 batch_id, table_cfg.checkpoint_column, cp.last_key, cp.rows_loaded)
+    else:
+        if cp is not None and cp.batch_id >= 0:
+            ctx.warning("Для таблицы не задан checkpoint_column — загрузка начинается заново")
+        checkpoints.start(cp_key)
+    ctx.checkpoint = checkpoints
+    return ctx
+
+
+def record_batch(ctx, cur, rows: int) -> None:
+    """
+    Вызывается loader'ом перед commit батча: пишет чекпоинт и watermark,
+    продвигаемый с каждым батчем (ctx.watermark), в ту же транзакцию.
+    Без них ничего не делает.
+    """
+    if ctx.watermark is not None and ctx.last_source_key is not None:
+        ctx.watermark.set(table_key(ctx.table_cfg), ctx.last_source_key, cur)
+    if ctx.checkpoint is None:
+        return
+    ctx.checkpoint.save_batch(cur, table_key(ctx.table_cfg), ctx.batch_id, ctx.last_source_key, rows)
+
+
+async def record_batch_async(ctx, conn, rows: int) -> None:
+    """record_batch для асинхронного loader'а (conn — соединение asyncpg)."""
+    if ctx.checkpoint is None:
+        return
+    await ctx.checkpoint.save_batch_async(conn, table_key(ctx.table_cfg), ctx.batch_id,
+                                          ctx.last_source_key, rows)
+
+
+def watermark_column(table_cfg: TableConfig) -> Optional[str]:
+    """
+    Колонка watermark, которая продвигается с каждым батчем: incremental.type id
+    (уникальный монотонный ключ, выборка упорядочена по нему). Если задан
+    другой checkpoint_column — None, watermark сохраняется только в конце таблицы.
+    """
+    inc = table_cfg.incremental
+    if inc is None or inc.type != "id" or not inc.column:
+        return None
+    if table_cfg.checkpoint_column and table_cfg.checkpoint_column.upper() != inc.column.upper():
+        return None
+    return inc.column
+
+
+def key_column(table_cfg: TableConfig) -> Optional[str]:
+    """Ключ источника батча: checkpoint_column, без него — колонка watermark_column."""
+    return table_cfg.checkpoint_column or watermark_column(table_cfg)
+
+
+def batch_source_key(table_cfg: TableConfig, batch: Any) -> Any:
+    """Ключ источника последней строки батча: списка строк или ColumnBatch."""
+    col = key_column(table_cfg)
+    if not col or not len(batch):
+        return None
+    if isinstance(batch, ColumnBatch):
+        name = col if col in batch else col.upper()
+        if name not in batch:
+            return None
+        return batch.value(name, -1)
+    return source_key(table_cfg, batch[-1])
+
+
+def source_key(table_cfg: TableConfig, row: Dict[str, Any]) -> Any:
+    """Значение key_column в сырой строке Oracle (имена колонок в верхнем регистре)."""
+    col = key_column(table_cfg)
+    if not col:
+        return None
+    if col in row:
+        return row[col]
+    return row.get(col.upper())
@@ -3,6 +3,7 @@ import logging
 
 from connectors import OracleConnector
 from connectors import PostgresConnector
+from core.lookup_cache import LookupCache
 from mappings.parser import TableConfig
 
 
@@ -12,6 +13,14 @@ class ExecutionContext:
       - table_cfg: текущая таблица
       - batch_id: порядковый номер батча (int)
       - logger: логгер с автоматическим добавлением названия таблицы и batсh_id
+      - checkpoint: хранилище чекпоинтов (CheckpointStore) или None
+      - resume_key: ключ источника, после которого продолжается выборка при --resume
+      - last_source_key: ключ источника последней строки текущего батча
+      - metrics: метрики таблицы (core.metrics.TableMetrics) или None
+      - pg_async: AsyncPostgresConnector загрузки в execution_mode: async, иначе None
+      - lookup_cache: справочники lookup.preload (core.lookup_cache.LookupCache)
+      - watermark: WatermarkStore, если watermark пишется в транзакции каждого батча, иначе None
+      - commit_sec: время commit батча (core.metrics.commit_batch), пока метрики включены
     """
 
     def __init__(
@@ -26,6 +35,25 @@ class ExecutionContext:
         self.ora_conn = ora_conn
         self.pg_conn = pg_conn
         self.logger = logging.getLogger(f"{__name__}.{table_cfg.source_table}")
+        self.checkpoint = None
+        self.resume_key = None
+        self.last_source_key = None
+        self.metrics = None
+        self.pg_async = None
+        self.lookup_cache = LookupCache()
+        self.watermark = None
+        self.commit_sec = None
+
+    def for_batch(self, batch_id: int) -> "ExecutionContext":
+        """Контекст следующего батча той же таблицы (соединения и чекпоинт общие)."""
+        ctx = ExecutionContext(self.table_cfg, batch_id, self.ora_conn, self.pg_conn)
+        ctx.checkpoint = self.checkpoint
+        ctx.resume_key = self.resume_key
+        ctx.metrics = self.metrics
+        ctx.pg_async = self.pg_async
+        ctx.lookup_cache = self.lookup_cache
+        ctx.watermark = self.watermark
+        return ctx
 
     def debug(self, msg, *args):   self.logger.debug(f"[batch {self.batch_id}] " + msg, *args)
     def info(self, msg, *args):   self.logger.info(f"[batch {self.batch_id}] " + msg, *args)
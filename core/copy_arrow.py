@@ -0,0 +1,57 @@
+# core/copy_arrow.py
+import io
+from datetime import date, datetime, time
+from typing import Any, List, Sequence
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from core.batch import ColumnBatch, is_arrow
+
+# COPY ... (FORMAT csv): NULL — пустое поле без кавычек, пустая строка — "".
+# Именно так пишет pyarrow.csv, поэтому колонки Arrow сериализуются без объектов Python.
+_WRITE_OPTIONS = pa_csv.WriteOptions(include_header=False)
+
+
+def _text(value: Any) -> Any:
+    """Значение смешанной колонки → текст, который примет COPY (csv)."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _is_binary(arr: Any) -> bool:
+    t = arr.type
+    return pa.types.is_binary(t) or pa.types.is_large_binary(t) or pa.types.is_fixed_size_binary(t)
+
+
+def to_arrow(values: Any) -> Any:
+    """Колонка батча → массив Arrow, пригодный для записи в csv."""
+    if is_arrow(values):
+        arr = values
+    else:
+        values = ColumnBatch.as_list(values)
+        try:
+            arr = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            # смешанные типы (например, 'Y' и True после операций) — как текст
+            return pa.array([_text(v) for v in values], type=pa.string())
+    if _is_binary(arr):
+        # bytea в hex-формате; в csv обратный слэш не экранируется
+        return pa.array([_text(v) for v in arr.to_pylist()], type=pa.string())
+    return arr
+
+
+def format_csv(batch: ColumnBatch, columns: Sequence[str]) -> bytes:
+    """Батч (без пропущенных строк) → данные для COPY ... FROM STDIN WITH (FORMAT csv)."""
+    arrays: List[Any] = [to_arrow(batch.raw(name)) for name in columns]
+    table = pa.Table.from_arrays(arrays, names=list(columns))
+    buf = io.BytesIO()
+    pa_csv.write_csv(table, buf, _WRITE_OPTIONS)
+    return buf.getvalue()
@@ -0,0 +1,254 @@
+# core/copy_binary.py
+import json
+import struct
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from core.lob import LobStream
+
+# Бинарный формат COPY: сигнатура, флаги, длина расширения заголовка; в конце — -1 вместо числа полей
+HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+TRAILER = struct.pack("!h", -1)
+
+_NULL = struct.pack("!i", -1)
+_INT2 = struct.Struct("!h")
+_INT4 = struct.Struct("!i")
+_INT8 = struct.Struct("!q")
+_FLOAT4 = struct.Struct("!f")
+_FLOAT8 = struct.Struct("!d")
+_TRUE = b"\x01"
+_FALSE = b"\x00"
+
+# Эпоха дат и времени Postgres
+_PG_DATE_EPOCH = date(2000, 1, 1).toordinal()
+_PG_EPOCH = datetime(2000, 1, 1)
+_PG_EPOCH_TZ = datetime(2000, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+_NUMERIC_POS = 0x0000
+_NUMERIC_NEG = 0x4000
+_NUMERIC_NAN = 0xC000
+
+
+def _integral(value: Any) -> int:
+    """Целое без потери дробной части — иначе ValueError (как у text COPY)."""
+    if type(value) is int:
+        return value
+    if isinstance(value, (bool, str, bytes)):
+        raise TypeError(f"не целое: {value!r}")
+    n = int(value)
+    if n != value:
+        raise ValueError(f"дробное значение для целой колонки: {value!r}")
+    return n
+
+
+def _int2(value: Any) -> bytes:
+    return _INT2.pack(_integral(value))
+
+
+def _int4(value: Any) -> bytes:
+    return _INT4.pack(_integral(value))
+
+
+def _int8(value: Any) -> bytes:
+    return _INT8.pack(_integral(value))
+
+
+def _float4(value: Any) -> bytes:
+    if isinstance(value, (str, bytes)):
+        raise TypeError(f"не число: {value!r}")
+    return _FLOAT4.pack(float(value))
+
+
+def _float8(value: Any) -> bytes:
+    if isinstance(value, (str, bytes)):
+        raise TypeError(f"не число: {value!r}")
+    return _FLOAT8.pack(float(value))
+
+
+def _numeric(value: Any) -> bytes:
+    """
+    numeric: ndigits, weight, sign, dscale и цифры по основанию 10000,
+    выровненные по десятичной точке.
+    """
+    if type(value) is not Decimal:
+        if isinstance(value, (bool, bytes)):
+            raise TypeError(f"не число: {value!r}")
+        value = Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+    if value.is_nan():
+        return struct.pack("!hhHh", 0, 0, _NUMERIC_NAN, 0)
+    if value.is_infinite():
+        raise ValueError("numeric Infinity не поддерживается бинарным кодировщиком")
+    sign, digits, exp = value.as_tuple()
+    text = "".join(map(str, digits))
+    if exp >= 0:
+        int_part, frac_part = text + "0" * exp, ""
+    elif len(text) > -exp:
+        int_part, frac_part = text[:exp], text[exp:]
+    else:
+        int_part, frac_part = "", "0" * (-exp - len(text)) + text
+    dscale = max(0, -exp)
+
+    int_part = "0" * (-len(int_part) % 4) + int_part
+    frac_part = frac_part + "0" * (-len(frac_part) % 4)
+    groups = [int(int_part[i:i + 4]) for i in range(0, len(int_part), 4)]
+    weight = len(groups) - 1
+    groups += [int(frac_part[i:i + 4]) for i in range(0, len(frac_part), 4)]
+
+    start = 0
+    while start < len(groups) and groups[start] == 0:
+        start += 1
+        weight -= 1
+    end = len(groups)
+    while end > start and groups[end - 1] == 0:
+        end -= 1
+    groups = groups[start:end]
+    if not groups:
+        return struct.pack("!hhHh", 0, 0, _NUMERIC_POS, dscale)
+    return struct.pack(
+        f"!hhHh{len(groups)}H", len(groups), weight,
+        _NUMERIC_NEG if sign else _NUMERIC_POS, dscale, *groups
+    )
+
+
+def _text(value: Any) -> bytes:
+    if type(value) is str:
+        return value.encode("utf-8")
+    if isinstance(value, bool):
+        return b"t" if value else b"f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat().encode("utf-8")
+    if type(value) is LobStream:
+        return _text(value.read())
+    if isinstance(value, (bytes, bytearray, memoryview, list, tuple, dict)):
+        raise TypeError(f"не текст: {type(value).__name__}")
+    return str(value).encode("utf-8")
+
+
+def _bytea(value: Any) -> bytes:
+    if type(value) is LobStream:
+        value = value.read()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    raise TypeError(f"не bytes: {type(value).__name__}")
+
+
+def _date(value: Any) -> bytes:
+    if isinstance(value, datetime):
+        value = value.date()
+    elif not isinstance(value, date):
+        raise TypeError(f"не дата: {value!r}")
+    return _INT4.pack(value.toordinal() - _PG_DATE_EPOCH)
+
+
+def _timestamp(value: Any) -> bytes:
+    if not isinstance(value, datetime):
+        if not isinstance(value, date):
+            raise TypeError(f"не дата/время: {value!r}")
+        value = datetime(value.year, value.month, value.day)
+    elif value.tzinfo is not None:
+        # timestamp without time zone отбрасывает смещение, как и текстовый ввод
+        value = value.replace(tzinfo=None)
+    return _INT8.pack((value - _PG_EPOCH) // _MICROSECOND)
+
+
+def _timestamptz(value: Any) -> bytes:
+    if not isinstance(value, datetime) or value.tzinfo is None:
+        # без смещения значение зависит от TimeZone сессии — оставляем text COPY
+        raise TypeError(f"нет часового пояса: {value!r}")
+    return _INT8.pack((value - _PG_EPOCH_TZ) // _MICROSECOND)
+
+
+def _bool(value: Any) -> bytes:
+    if value is True or value is False:
+        return _TRUE if value else _FALSE
+    if type(value) is int and value in (0, 1):
+        return _TRUE if value else _FALSE
+    raise TypeError(f"не boolean: {value!r}")
+
+
+def _uuid(value: Any) -> bytes:
+    if isinstance(value, uuid.UUID):
+        return value.bytes
+    if isinstance(value, str):
+        return uuid.UUID(value).bytes
+    raise TypeError(f"не uuid: {value!r}")
+
+
+def _json(value: Any) -> bytes:
+    if isinstance(value, str):
+        # строка считается готовым JSON, как и в text COPY
+        return value.encode("utf-8")
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+    raise TypeError(f"не json: {type(value).__name__}")
+
+
+def _jsonb(value: Any) -> bytes:
+    # версия формата jsonb (1) + текст
+    return b"\x01" + _json(value)
+
+
+# udt_name из information_schema.columns → кодировщик значения
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {
+    "int2": _int2,
+    "int4": _int4,
+    "int8": _int8,
+    "float4": _float4,
+    "float8": _float8,
+    "numeric": _numeric,
+    "text": _text,
+    "varchar": _text,
+    "bpchar": _text,
+    "name": _text,
+    "bytea": _bytea,
+    "date": _date,
+    "timestamp": _timestamp,
+    "timestamptz": _timestamptz,
+    "bool": _bool,
+    "uuid": _uuid,
+    "json": _json,
+    "jsonb": _jsonb,
+}
+
+
+def encoders_for(columns: Sequence[str], types: Dict[str, str]) -> Optional[List[Callable[[Any], bytes]]]:
+    """Кодировщики колонок по их udt_name; None, если хотя бы для одной его нет."""
+    result = []
+    for col in columns:
+        encoder = ENCODERS.get(types.get(col, ""))
+        if encoder is None:
+            return None
+        result.append(encoder)
+    return result
+
+
+def unsupported(columns: Sequence[str], types: Dict[str, str]) -> List[str]:
+    """Колонки, которые бинарный формат не кодирует (для журнала)."""
+    return [f"{c}:{types.get(c, '?')}" for c in columns if types.get(c, "") not in ENCODERS]
+
+
+def format_binary(rows: Iterable[Sequence[Any]], encoders: Sequence[Callable[[Any], bytes]]) -> bytes:
+    """
+    Поток COPY ... FROM STDIN WITH (FORMAT binary) целиком.
+    Значение неподходящего типа — TypeError/ValueError, целое вне диапазона
+    колонки — struct.error (вызывающий переходит на text COPY).
+    """
+    out = bytearray(HEADER)
+    count = _INT2.pack(len(encoders))
+    pack_len = _INT4.pack
+    pairs = list(enumerate(encoders))
+    for values in rows:
+        out += count
+        for i, encode in pairs:
+            value = values[i]
+            if value is None:
+                out += _NULL
+                continue
+            data = encode(value)
+            out += pack_len(len(data))
+            out += data
+    out += TRAILER
+    return bytes(out)
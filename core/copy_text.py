@@ -0,0 +1,157 @@
+# core/copy_text.py
+import io
+import json
+import re
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+from core.lob import LobStream
+
+# Текстовый формат COPY: разделитель — TAB, NULL — \N, спецсимволы экранируются обратным слэшем
+NULL = "\\N"
+
+_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+    "\b": "\\b",
+    "\f": "\\f",
+    "\v": "\\v",
+})
+
+# Обратное преобразование для COPY TO; неизвестные \x дают сам символ, как в Postgres
+_UNESCAPES = {
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+    "\\": "\\",
+}
+_UNESCAPE_RE = re.compile(r"\\(.)")
+
+
+def _unescape(match: "re.Match") -> str:
+    ch = match.group(1)
+    return _UNESCAPES.get(ch, ch)
+
+
+def encode_value(value: Any) -> str:
+    """Значение Python → поле COPY в текстовом формате."""
+    if value is None:
+        return NULL
+    if isinstance(value, str):
+        return value.translate(_ESCAPES)
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea в hex-формате; обратный слэш префикса экранируется
+        return "\\\\x" + bytes(value).hex()
+    if type(value) is LobStream:
+        # вне CopyStream LOB приходится читать целиком
+        return encode_value(value.read())
+    if isinstance(value, (list, tuple)):
+        return _array_literal(value).translate(_ESCAPES)
+    if isinstance(value, dict):
+        # json/jsonb, как Json-адаптер psycopg2
+        return json.dumps(value, ensure_ascii=False, default=str).translate(_ESCAPES)
+    return str(value).translate(_ESCAPES)
+
+
+def _array_literal(values: Sequence[Any]) -> str:
+    """Литерал массива Postgres: {"a","b",NULL}, вложенные списки — многомерный массив."""
+    items = []
+    for v in values:
+        if v is None:
+            items.append("NULL")
+        elif isinstance(v, (list, tuple)):
+            items.append(_array_literal(v))
+        else:
+            if isinstance(v, bool):
+                text = "t" if v else "f"
+            elif isinstance(v, (datetime, date, time)):
+                text = v.isoformat()
+            else:
+                text = str(v)
+            items.append('"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"')
+    return "{" + ",".join(items) + "}"
+
+
+def format_row(values: Sequence[Any]) -> str:
+    """Строка COPY с переводом строки в конце."""
+    return "\t".join([encode_value(v) for v in values]) + "\n"
+
+
+def format_rows(rows: Iterable[Sequence[Any]]) -> str:
+    return "".join([format_row(values) for values in rows])
+
+
+def decode_row(line: str) -> List[Optional[str]]:
+    """Строка COPY TO (без перевода строки) → значения-строки, \\N → None."""
+    return [
+        None if field == NULL else (_UNESCAPE_RE.sub(_unescape, field) if "\\" in field else field)
+        for field in line.split("\t")
+    ]
+
+
+def _encode_lob(value: LobStream) -> Iterator[str]:
+    if value.binary:
+        yield "\\\\x"
+        for part in value.chunks():
+            yield part.hex()
+    else:
+        for part in value.chunks():
+            yield part.translate(_ESCAPES)
+
+
+def iter_rows(rows: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """
+    Текст COPY по частям: обычная строка — одной частью,
+    LobStream — по частям его chunk_size, без сборки значения целиком.
+    """
+    for values in rows:
+        if not any(type(v) is LobStream for v in values):
+            yield format_row(values)
+            continue
+        last = len(values) - 1
+        for pos, value in enumerate(values):
+            if type(value) is LobStream:
+                yield from _encode_lob(value)
+            else:
+                yield encode_value(value)
+            yield "\n" if pos == last else "\t"
+
+
+class CopyStream(io.RawIOBase):
+    """
+    Файл для cursor.copy_expert: строки кодируются в текстовый формат COPY
+    по мере того, как psycopg2 читает поток, — в памяти не больше одной части.
+    """
+
+    def __init__(self, rows: Iterable[Sequence[Any]], encoding: str = "utf-8"):
+        self._parts = iter_rows(rows)
+        self._buf = bytearray()
+        self._encoding = encoding
+        self.bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while len(self._buf) < len(b):
+            part = next(self._parts, None)
+            if part is None:
+                break
+            self._buf += part.encode(self._encoding)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        del self._buf[:n]
+        self.bytes += n
+        return n
@@ -0,0 +1,206 @@
+# core/index_deferral.py
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from psycopg2 import sql
+
+from mappings.parser import DeferIndexesConfig
+
+logger = logging.getLogger(__name__)
+
+INDEX = "index"
+FOREIGN_KEY = "fk"
+
+_CREATE_INDEX_RE = re.compile(r"^CREATE (UNIQUE )?INDEX ", re.IGNORECASE)
+_NOT_VALID_RE = re.compile(r"\s+NOT VALID$", re.IGNORECASE)
+
+
+class DeferredDdlStore:
+    """
+    Контрольная таблица etl_deferred_ddl: DDL снятых индексов и FK приёмника.
+    Запись фиксируется до DROP и удаляется в одной транзакции с восстановлением
+    объекта, поэтому при сбое на любом шаге DDL остаётся в таблице и
+    восстанавливается abort_table loader'а (при прерывании Ctrl-C — следующим запуском).
+    """
+
+    def __init__(self, schema: str = "public", table: str = "etl_deferred_ddl"):
+        self.ident = sql.Identifier(schema, table)
+
+    def ensure(self, cur) -> None:
+        cur.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {t} (
+                table_name  text        NOT NULL,
+                kind        text        NOT NULL,
+                name        text        NOT NULL,
+                ddl         text        NOT NULL,
+                validated   boolean     NOT NULL DEFAULT true,
+                created_at  timestamptz NOT NULL DEFAULT now(),
+                PRIMARY KEY (table_name, kind, name)
+            )
+        """).format(t=self.ident))
+
+    def pending(self, cur, table: str) -> List[Tuple[str, str, str, bool]]:
+        """(kind, name, ddl, validated) ещё не восстановленных объектов таблицы."""
+        cur.execute(
+            sql.SQL("SELECT kind, name, ddl, validated FROM {t} WHERE table_name = %s ORDER BY created_at, name")
+            .format(t=self.ident),
+            (table,)
+        )
+        return cur.fetchall()
+
+    def add(self, cur, table: str, kind: str, name: str, ddl: str, validated: bool = True) -> None:
+        # запись от прерванного запуска не перезаписывается — объект уже снят
+        cur.execute(
+            sql.SQL("""
+                INSERT INTO {t} (table_name, kind, name, ddl, validated)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (table_name, kind, name) DO NOTHING
+            """).format(t=self.ident),
+            (table, kind, name, ddl, validated)
+        )
+
+    def remove(self, cur, table: str, kind: str, name: str) -> None:
+        cur.execute(
+            sql.SQL("DELETE FROM {t} WHERE table_name = %s AND kind = %s AND name = %s").format(t=self.ident),
+            (table, kind, name)
+        )
+
+    def clear(self, cur, table: str) -> None:
+        """Забывает все записи таблицы (сама таблица удалена вместе с объектами)."""
+        cur.execute(sql.SQL("DELETE FROM {t} WHERE table_name = %s").format(t=self.ident), (table,))
+
+
+def defer_indexes(ctx, table: str, cfg: DeferIndexesConfig) -> None:
+    """
+    Снимает вторичные индексы (не PK, не уникальные, не под ограничениями)
+    и, если cfg.foreign_keys, внешние ключи таблицы. DDL сохраняется до DROP.
+    """
+    store = DeferredDdlStore()
+    conn = ctx.pg_conn.conn
+    regclass = f'public."{table}"'
+    with conn.cursor() as cur:
+        store.ensure(cur)
+        cur.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(%s)
+              AND NOT x.indisprimary AND NOT x.indisunique
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+            """,
+            (regclass,)
+        )
+        indexes = cur.fetchall()
+        fks = []
+        if cfg.foreign_keys:
+            cur.execute(
+                """
+                SELECT conname, pg_get_constraintdef(oid), convalidated
+                FROM pg_constraint
+                WHERE conrelid = to_regclass(%s) AND contype = 'f'
+                """,
+                (regclass,)
+            )
+            fks = cur.fetchall()
+        for name, ddl in indexes:
+            store.add(cur, table, INDEX, name, ddl)
+        for name, ddl, validated in fks:
+            store.add(cur, table, FOREIGN_KEY, name, _NOT_VALID_RE.sub("", ddl), validated)
+    conn.commit()
+
+    with conn.cursor() as cur:
+        for name, _, _ in fks:
+            cur.execute(
+                sql.SQL("ALTER TABLE {t} DROP CONSTRAINT IF EXISTS {c}").format(
+                    t=sql.Identifier('public', table), c=sql.Identifier(name)
+                )
+            )
+        for name, _ in indexes:
+            cur.execute(sql.SQL("DROP INDEX IF EXISTS {i}").format(i=sql.Identifier('public', name)))
+    conn.commit()
+    if indexes or fks:
+        ctx.info("Сняты до конца загрузки %s: индексов %d, FK %d", table, len(indexes), len(fks))
+
+
+def restore_indexes(ctx, table: str, cfg: DeferIndexesConfig, analyze: bool = False) -> None:
+    """
+    Восстанавливает всё, что для таблицы осталось в etl_deferred_ddl:
+    индексы — параллельно, по отдельному соединению на индекс (cfg.workers,
+    cfg.maintenance_work_mem); FK — ADD ... NOT VALID и затем VALIDATE.
+    Транзакция ctx.pg_conn.conn к вызову должна быть завершена.
+    """
+    store = DeferredDdlStore()
+    conn = ctx.pg_conn.conn
+    with conn.cursor() as cur:
+        store.ensure(cur)
+        pending = store.pending(cur, table)
+    conn.commit()
+    indexes = [(name, ddl) for kind, name, ddl, _ in pending if kind == INDEX]
+    fks = [(name, ddl, validated) for kind, name, ddl, validated in pending if kind == FOREIGN_KEY]
+
+    if indexes:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(min(cfg.workers, len(indexes)), thread_name_prefix="etl-index") as pool:
+            futures = [
+                pool.submit(_build_index, ctx.pg_conn, store, table, name, ddl, cfg.maintenance_work_mem)
+                for name, ddl in indexes
+            ]
+            errors = [f.exception() for f in futures]
+        failed: Optional[BaseException] = next((e for e in errors if e is not None), None)
+        if failed is not None:
+            ctx.error("Не восстановлено индексов %s: %d из %d (DDL остался в etl_deferred_ddl)",
+                      table, sum(e is not None for e in errors), len(indexes))
+            raise failed
+        ctx.info("Индексы %s восстановлены: %d за %.1f с", table, len(indexes), time.perf_counter() - started)
+
+    if fks:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, true)", (cfg.maintenance_work_mem,))
+            for name, ddl, _ in fks:
+                cur.execute(
+                    "SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(%s) AND conname = %s",
+                    (f'public."{table}"', name)
+                )
+                if cur.fetchone() is None:
+                    cur.execute(
+                        sql.SQL("ALTER TABLE {t} ADD CONSTRAINT {c} {d} NOT VALID").format(
+                            t=sql.Identifier('public', table), c=sql.Identifier(name), d=sql.SQL(ddl)
+                        )
+                    )
+                store.remove(cur, table, FOREIGN_KEY, name)
+        conn.commit()
+        # VALIDATE берёт SHARE UPDATE EXCLUSIVE и не блокирует чтение и запись
+        for name, _, validated in fks:
+            if not validated:
+                continue
+            with conn.cursor() as cur:
+                cur.execute(
+                    sql.SQL("ALTER TABLE {t} VALIDATE CONSTRAINT {c}").format(
+                        t=sql.Identifier('public', table), c=sql.Identifier(name)
+                    )
+                )
+            conn.commit()
+        ctx.info("FK %s восстановлены: %d", table, len(fks))
+
+    if analyze:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("ANALYZE {t}").format(t=sql.Identifier('public', table)))
+        conn.commit()
+
+
+def _build_index(pg_conn, store: DeferredDdlStore, table: str, name: str, ddl: str, work_mem: str) -> None:
+    """Один индекс на своём соединении; запись в etl_deferred_ddl удаляется в той же транзакции."""
+    conn = pg_conn.new_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, true)", (work_mem,))
+            cur.execute(_CREATE_INDEX_RE.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS ", ddl))
+            store.remove(cur, table, INDEX, name)
+        conn.commit()
+        logger.debug("Индекс %s восстановлен", name)
+    finally:
+        conn.close()
@@ -0,0 +1,113 @@
+# core/lob.py
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from connectors.oracle_connector import LOB_LOCATOR_SUFFIX as LOCATOR_SUFFIX
+from core.batch import ColumnBatch
+
+# bind-переменная порога в SELECT
+INLINE_PARAM = "lob_inline_max"
+
+# Разбор выражений SELECT, которые строит select_expressions (нужен синтетическому источнику)
+SPLIT_RE = re.compile(
+    r"^CASE WHEN DBMS_LOB\.GETLENGTH\((\w+)\) (<=|>) :" + INLINE_PARAM + r" THEN \w+ END$",
+    re.IGNORECASE
+)
+
+
+def select_expressions(col: str, inline_max: int) -> List[str]:
+    """
+    Выражения SELECT для LOB-колонки:
+      - col — значение, если LOB не длиннее inline_max (приходит строкой/байтами
+        через outputtypehandler, без отдельного round-trip на каждый LOB);
+      - col__LOB — локатор, если длиннее (читается по частям при загрузке).
+    Длина CLOB — в символах, BLOB — в байтах.
+    """
+    if inline_max <= 0:
+        return [f"NULL AS {col}", f"{col} AS {col}{LOCATOR_SUFFIX}"]
+    return [
+        f"CASE WHEN DBMS_LOB.GETLENGTH({col}) <= :{INLINE_PARAM} THEN {col} END AS {col}",
+        f"CASE WHEN DBMS_LOB.GETLENGTH({col}) > :{INLINE_PARAM} THEN {col} END AS {col}{LOCATOR_SUFFIX}",
+    ]
+
+
+class LobStream:
+    """
+    Большой LOB, который не материализуется в строке батча: при загрузке
+    читается из локатора по chunk_size символов/байт (core.copy_text.CopyStream),
+    так что память на строку ограничена chunk_size при любом размере LOB.
+    """
+
+    __slots__ = ("locator", "chunk_size", "binary")
+
+    def __init__(self, locator: Any, chunk_size: int):
+        self.locator = locator
+        self.chunk_size = chunk_size
+        self.binary = _is_binary(locator)
+
+    def size(self) -> int:
+        return self.locator.size()
+
+    def chunks(self) -> Iterator[Any]:
+        """Части LOB по порядку (str для CLOB, bytes для BLOB)."""
+        offset = 1
+        while True:
+            part = self.locator.read(offset, self.chunk_size)
+            if not part:
+                return
+            yield part
+            offset += len(part)
+
+    def read(self) -> Any:
+        """Весь LOB целиком — для плагинов, которым нужно значение (не ограничено по памяти)."""
+        parts = list(self.chunks())
+        if self.binary:
+            return b"".join(parts)
+        return "".join(parts)
+
+    def __repr__(self) -> str:
+        return f"LobStream({'BLOB' if self.binary else 'CLOB'})"
+
+
+def _is_binary(locator: Any) -> bool:
+    lob_type = getattr(locator, "type", None)
+    return getattr(lob_type, "name", "") in ("DB_TYPE_BLOB", "DB_TYPE_BFILE")
+
+
+def merge_values(inline: Iterable[Any], locators: Iterable[Any], chunk_size: int) -> List[Any]:
+    """Пары (значение, локатор) одной колонки → значение или LobStream."""
+    return [
+        LobStream(loc, chunk_size) if value is None and loc is not None else value
+        for value, loc in zip(inline, locators)
+    ]
+
+
+def merge_row(row: Dict[str, Any], lob_cols: Iterable[str], chunk_size: int) -> Dict[str, Any]:
+    """Словарь строки: колонки-локаторы сливаются с основными."""
+    for col in lob_cols:
+        loc = row.pop(col + LOCATOR_SUFFIX, None)
+        if loc is not None and row.get(col) is None:
+            row[col] = LobStream(loc, chunk_size)
+    return row
+
+
+def merge_batch(batch: ColumnBatch, lob_cols: Iterable[str], chunk_size: int) -> ColumnBatch:
+    """Колоночный батч: колонки-локаторы сливаются с основными и удаляются."""
+    for col in lob_cols:
+        loc_name = col + LOCATOR_SUFFIX
+        if loc_name not in batch:
+            continue
+        locators = batch.column(loc_name)
+        del batch.columns[loc_name]
+        if col in batch:
+            batch.set_column(col, merge_values(batch.column(col), locators, chunk_size))
+    return batch
+
+
+def has_streams(rows: Iterable[Dict[str, Any]], lob_cols: Optional[Iterable[str]] = None) -> bool:
+    """Есть ли в строках LobStream (проверяются lob_cols или все колонки)."""
+    for row in rows:
+        values = row.values() if lob_cols is None else (row.get(c) for c in lob_cols)
+        if any(type(v) is LobStream for v in values):
+            return True
+    return False
@@ -0,0 +1,63 @@
+# core/lookup_cache.py
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from psycopg2 import sql
+
+from mappings.parser import LookupConfig
+
+logger = logging.getLogger(__name__)
+
+# Порция строк COPY TO при чтении справочника
+CHUNK_ROWS = 50000
+
+
+class LookupCache:
+    """
+    Справочники lookup.preload: true, прочитанные целиком один раз на таблицу
+    потоком COPY TO (PostgresConnector.copy_chunks) вместо запроса на строку/батч.
+    Ключи и значения — CAST(... AS text), как в обычных lookup-запросах.
+    Общий для всех батчей таблицы (ExecutionContext.for_batch), потокобезопасен.
+    """
+
+    def __init__(self):
+        self._maps: Dict[Tuple[str, str, str], Dict[str, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def values(self, pg_conn, lookup: LookupConfig) -> Dict[str, Optional[str]]:
+        """Словарь key → value справочника lookup.table."""
+        return self._get(pg_conn, lookup.table, lookup.key_column, lookup.value_column or lookup.key_column)
+
+    def keys(self, pg_conn, lookup: LookupConfig) -> Dict[str, Optional[str]]:
+        """Ключи справочника (для проверки вхождения в validation)."""
+        return self._get(pg_conn, lookup.table, lookup.key_column, lookup.key_column)
+
+    def _get(self, pg_conn, table: str, key: str, value: str) -> Dict[str, Optional[str]]:
+        cache_key = (table, key, value)
+        found = self._maps.get(cache_key)
+        if found is not None:
+            return found
+        with self._lock:
+            found = self._maps.get(cache_key)
+            if found is None:
+                found = self._load(pg_conn, table, key, value)
+                self._maps[cache_key] = found
+        return found
+
+    @staticmethod
+    def _load(pg_conn, table: str, key: str, value: str) -> Dict[str, Optional[str]]:
+        query = sql.SQL(
+            'SELECT CAST({key} AS text), CAST({val} AS text)'
+            '  FROM {tbl}'
+            ' WHERE {key} IS NOT NULL'
+        ).format(
+            key=sql.Identifier(key),
+            val=sql.Identifier(value),
+            tbl=sql.Identifier(table),
+        )
+        found: Dict[str, Optional[str]] = {}
+        for chunk in pg_conn.copy_chunks(table, chunk_size=CHUNK_ROWS, query=query):
+            found.update(chunk)
+        logger.info("Справочник %s.%s загружен в память: %d ключей", table, key, len(found))
+        return found
@@ -0,0 +1,406 @@
+# core/metrics.py
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from core.batch import ColumnBatch
+from core.batch_sizer import estimate_batch_bytes, estimate_row_bytes
+from mappings.parser import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+# Этапы обработки батча, по которым копятся гистограммы времени
+STAGES = ("fetch", "transform", "validate", "load", "commit")
+
+# Границы бакетов гистограмм (сек)
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Как часто воркер-процесс отправляет снимок таблицы в родительский процесс (сек)
+_PUBLISH_INTERVAL = 1.0
+
+
+class Histogram:
+    """Гистограмма Prometheus: накопительные бакеты, сумма и количество."""
+
+    def __init__(self, buckets: Sequence[float] = _BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"buckets": list(self.buckets), "counts": list(self.counts),
+                "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        hist = cls(data["buckets"])
+        hist.counts = list(data["counts"])
+        hist.sum = data["sum"]
+        hist.count = data["count"]
+        return hist
+
+
+class TableMetrics:
+    """
+    Счётчики одной таблицы: строки, байты, батчи и время по этапам.
+    Пишется из потоков одной таблицы (staged), поэтому под своим локом.
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+        self.status = "running"
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.rows_fetched = 0
+        self.rows_loaded = 0
+        self.rows_skipped = 0
+        self.bytes_loaded = 0
+        self.batches = 0
+        self.stages: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+        self._lock = threading.Lock()
+        self._on_change = None
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    def batch_done(self, raw: List[Dict[str, Any]], rows: List[Dict[str, Any]],
+                   load_sec: Optional[float] = None, commit_sec: Optional[float] = None) -> None:
+        """
+        Итог батча: raw — сырые строки (SizedBatch несёт время выборки), rows — загруженные.
+        Батч, целиком отброшенный валидацией, приходит с пустым rows и без load_sec.
+        rows может быть колоночным батчем (loader.load_columns).
+        load_sec — весь вызов loader'а вместе с commit; commit_sec (ctx.commit_sec)
+        из него вычитается, чтобы этапы load и commit не пересекались.
+        """
+        fetched, loaded = len(raw), len(rows)
+        if isinstance(rows, ColumnBatch):
+            nbytes = estimate_batch_bytes(rows)
+        else:
+            nbytes = int(estimate_row_bytes(rows) * loaded)
+        fetch_sec = getattr(raw, "fetch_sec", None)
+        with self._lock:
+            self.rows_fetched += fetched
+            self.rows_loaded += loaded
+            self.rows_skipped += fetched - loaded
+            self.bytes_loaded += nbytes
+            if loaded:
+                self.batches += 1
+            if fetch_sec is not None:
+                self.stages["fetch"].observe(fetch_sec)
+            if load_sec is not None:
+                self.stages["load"].observe(max(0.0, load_sec - (commit_sec or 0.0)))
+            if commit_sec is not None:
+                self.stages["commit"].observe(commit_sec)
+        if self._on_change is not None:
+            self._on_change(self, False)
+
+    def finish(self, status: str = "done") -> None:
+        with self._lock:
+            self.status = status
+            self.finished = time.time()
+        if self._on_change is not None:
+            self._on_change(self, True)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = self.elapsed
+            return {
+                "table": self.table,
+                "status": self.status,
+                "started": self.started,
+                "finished": self.finished,
+                "elapsed_sec": elapsed,
+                "rows_fetched": self.rows_fetched,
+                "rows_loaded": self.rows_loaded,
+                "rows_skipped": self.rows_skipped,
+                "bytes_loaded": self.bytes_loaded,
+                "batches": self.batches,
+                "rows_per_sec": self.rows_loaded / elapsed if elapsed > 0 else 0.0,
+                "bytes_per_sec": self.bytes_loaded / elapsed if elapsed > 0 else 0.0,
+                "stages": {stage: hist.to_dict() for stage, hist in self.stages.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TableMetrics":
+        tm = cls(data["table"])
+        tm.status = data["status"]
+        tm.started = data["started"]
+        tm.finished = data["finished"]
+        for field in ("rows_fetched", "rows_loaded", "rows_skipped", "bytes_loaded", "batches"):
+            setattr(tm, field, data[field])
+        tm.stages = {stage: Histogram.from_dict(h) for stage, h in data["stages"].items()}
+        return tm
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Метрики всех таблиц процесса.
+    В параллельном режиме воркеры публикуют снимки своих таблиц в очередь,
+    а родительский процесс вливает их в свой реестр (consume) — экспорт идёт оттуда.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, TableMetrics] = {}
+        self._lock = threading.Lock()
+        self._queue = None
+        self._last_publish: Dict[str, float] = {}
+
+    def table(self, key: str) -> TableMetrics:
+        """Новые метрики таблицы (повторный запуск таблицы начинает счёт заново)."""
+        tm = TableMetrics(key)
+        if self._queue is not None:
+            tm._on_change = self._publish
+        with self._lock:
+            self.tables[key] = tm
+        return tm
+
+    def snapshot(self) -> List[TableMetrics]:
+        with self._lock:
+            return list(self.tables.values())
+
+    def mark_failed(self) -> None:
+        """Помечает незавершённые таблицы как упавшие (запуск прерван ошибкой)."""
+        for tm in self.snapshot():
+            if tm.status == "running":
+                tm.finish("failed")
+
+    # ------------------------------------------------ межпроцессная передача
+
+    def publish_to(self, q) -> None:
+        """Включает отправку снимков таблиц в очередь родительского процесса."""
+        self._queue = q
+
+    def _publish(self, tm: TableMetrics, force: bool) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_publish.get(tm.table, 0.0) < _PUBLISH_INTERVAL:
+            return
+        self._last_publish[tm.table] = now
+        try:
+            self._queue.put(tm.to_dict())
+        except Exception as e:
+            logger.debug("Не удалось отправить метрики %s: %s", tm.table, e)
+
+    def merge(self, data: Dict[str, Any]) -> None:
+        tm = TableMetrics.from_dict(data)
+        with self._lock:
+            self.tables[tm.table] = tm
+
+    def consume(self, q) -> None:
+        """Вливает снимки из очереди воркеров до маркера None."""
+        while True:
+            data = q.get()
+            if data is None:
+                return
+            self.merge(data)
+
+    # ------------------------------------------------------------ форматы
+
+    def render_prometheus(self) -> str:
+        tables = [tm.to_dict() for tm in self.snapshot()]
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        counters = [
+            ("etl_rows_fetched_total", "rows_fetched", "Строк выбрано из источника"),
+            ("etl_rows_loaded_total", "rows_loaded", "Строк загружено в приёмник"),
+            ("etl_rows_skipped_total", "rows_skipped", "Строк отброшено валидацией"),
+            ("etl_bytes_loaded_total", "bytes_loaded", "Оценка объёма загруженных строк (байт)"),
+            ("etl_batches_total", "batches", "Загруженных батчей"),
+        ]
+        for name, field, help_text in counters:
+            family(name, "counter", help_text)
+            for t in tables:
+                lines.append(f'{name}{{table="{_escape_label(t["table"])}"}} {t[field]}')
+
+        gauges = [
+            ("etl_rows_per_second", "rows_per_sec", "Средняя скорость загрузки (строк/с)"),
+            ("etl_bytes_per_second", "bytes_per_sec", "Средняя скорость загрузки (байт/с)"),
+            ("etl_table_elapsed_seconds", "elapsed_sec", "Время обработки таблицы"),
+        ]
+        for name, field, help_text in gauges:
+            family(name, "gauge", help_text)
+            for t in tables:
+                lines.append(f'{name}{{table="{_escape_label(t["table"])}"}} {_fmt(t[field])}')
+
+        family("etl_table_done", "gauge", "1 — таблица загружена, 0 — в работе, -1 — ошибка")
+        for t in tables:
+            value = {"done": 1, "failed": -1}.get(t["status"], 0)
+            lines.append(f'etl_table_done{{table="{_escape_label(t["table"])}"}} {value}')
+
+        family("etl_stage_seconds", "histogram", "Время этапа обработки батча")
+        for t in tables:
+            label = _escape_label(t["table"])
+            for stage, hist in t["stages"].items():
+                base = f'table="{label}",stage="{stage}"'
+                for bound, count in zip(hist["buckets"], hist["counts"]):
+                    lines.append(f'etl_stage_seconds_bucket{{{base},le="{_fmt(bound)}"}} {count}')
+                lines.append(f'etl_stage_seconds_bucket{{{base},le="+Inf"}} {hist["count"]}')
+                lines.append(f'etl_stage_seconds_sum{{{base}}} {_fmt(hist["sum"])}')
+                lines.append(f'etl_stage_seconds_count{{{base}}} {hist["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-сводка: по таблицам суммарное время этапов вместо бакетов."""
+        tables = []
+        for t in (tm.to_dict() for tm in self.snapshot()):
+            stages = t.pop("stages")
+            t["stage_seconds"] = {stage: h["sum"] for stage, h in stages.items()}
+            t["commit_count"] = stages["commit"]["count"]
+            busiest = max(stages.items(), key=lambda kv: kv[1]["sum"])
+            t["bottleneck"] = busiest[0] if busiest[1]["sum"] > 0 else None
+            tables.append(t)
+        return {
+            "generated": time.time(),
+            "rows_loaded": sum(t["rows_loaded"] for t in tables),
+            "rows_skipped": sum(t["rows_skipped"] for t in tables),
+            "tables": tables,
+        }
+
+
+_REGISTRY = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return _REGISTRY
+
+
+def commit_batch(ctx, conn) -> None:
+    """
+    Commit батча loader'ом с замером задержки commit (если метрики включены).
+    Время остаётся в ctx.commit_sec и учитывается в batch_done вместе с батчем.
+    """
+    if ctx.metrics is None:
+        conn.commit()
+        return
+    started = time.perf_counter()
+    conn.commit()
+    ctx.commit_sec = time.perf_counter() - started
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = _REGISTRY
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = self.registry.render_prometheus().encode("utf-8")
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        elif path in ("/status", "/"):
+            body = json.dumps(self.registry.summary(), ensure_ascii=False, default=str).encode("utf-8")
+            ctype = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        logger.debug("metrics http: " + fmt, *args)
+
+
+class MetricsExporter:
+    """
+    Экспорт метрик на время запуска:
+      - textfile: файл Prometheus, перезаписывается каждые interval_sec (атомарно через rename);
+      - http_port: /metrics и /status на локальном HTTP-сервере;
+      - summary_path: JSON-сводка в конце запуска.
+    """
+
+    def __init__(self, cfg: MetricsConfig, registry: Optional[MetricsRegistry] = None):
+        self.cfg = cfg
+        self.registry = registry or get_metrics()
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _write_textfile(self) -> None:
+        path = Path(self.cfg.textfile)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(self.registry.render_prometheus(), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _writer_loop(self) -> None:
+        while not self._stop.wait(self.cfg.interval_sec):
+            try:
+                self._write_textfile()
+            except Exception as e:
+                logger.warning("Не удалось записать метрики в %s: %s", self.cfg.textfile, e)
+
+    def start(self) -> "MetricsExporter":
+        if self.cfg.textfile:
+            self._writer = threading.Thread(target=self._writer_loop, name="metrics-textfile", daemon=True)
+            self._writer.start()
+        if self.cfg.http_port is not None:
+            handler = type("MetricsHandler", (_Handler,), {"registry": self.registry})
+            self._server = ThreadingHTTPServer((self.cfg.http_host, self.cfg.http_port), handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info("Метрики: http://%s:%d/metrics, статус: /status",
+                        self.cfg.http_host, self._server.server_address[1])
+        return self
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        """Останавливает экспорт, пишет финальный textfile и JSON-сводку. Возвращает сводку."""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self.cfg.textfile:
+            try:
+                self._write_textfile()
+            except Exception as e:
+                logger.warning("Не удалось записать метрики в %s: %s", self.cfg.textfile, e)
+
+        summary = self.registry.summary()
+        if self.cfg.summary_path:
+            try:
+                path = Path(self.cfg.summary_path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(json.dumps(summary, ensure_ascii=False, indent=2, default=str),
+                                encoding="utf-8")
+            except Exception as e:
+                logger.warning("Не удалось записать сводку метрик в %s: %s", self.cfg.summary_path, e)
+        for t in summary["tables"]:
+            logger.info(
+                "Метрики %s: %d строк за %.1f с (%.0f строк/с), пропущено %d, узкое место: %s",
+                t["table"], t["rows_loaded"], t["elapsed_sec"], t["rows_per_sec"],
+                t["rows_skipped"], t["bottleneck"]
+            )
+        return summary
@@ -7,6 +7,8 @@ from plugin_interfaces.fetcher_interface import FetcherPlugin
 from plugin_interfaces.transform_interface import TransformPlugin
 from plugin_interfaces.validation_interface import ValidationPlugin
 from plugin_interfaces.loader_interface import LoaderPlugin
+from plugin_interfaces.async_fetcher_interface import AsyncFetcherPlugin
+from plugin_interfaces.async_loader_interface import AsyncLoaderPlugin
 
 # Словари: ключ — идентификатор плагина (class_name или module), значение — класс
 _AUTO_MAPPING_PLUGINS: Dict[str, Type[AutoMappingPlugin]] = {}
@@ -14,6 +16,8 @@ _FETCHER_PLUGINS:     Dict[str, Type[FetcherPlugin]]     = {}
 _TRANSFORM_PLUGINS:   Dict[str, Type[TransformPlugin]]   = {}
 _VALIDATION_PLUGINS:  Dict[str, Type[ValidationPlugin]]  = {}
 _LOADER_PLUGINS:      Dict[str, Type[LoaderPlugin]]      = {}
+_ASYNC_FETCHER_PLUGINS: Dict[str, Type[AsyncFetcherPlugin]] = {}
+_ASYNC_LOADER_PLUGINS:  Dict[str, Type[AsyncLoaderPlugin]]  = {}
 
 # Соответствие категорий интерфейсам
 _CATEGORY_TO_INTERFACE = {
@@ -22,6 +26,8 @@ _CATEGORY_TO_INTERFACE = {
     'transform':    TransformPlugin,
     'validation':   ValidationPlugin,
     'loader':       LoaderPlugin,
+    'async_fetcher': AsyncFetcherPlugin,
+    'async_loader':  AsyncLoaderPlugin,
 }
 
 
@@ -49,6 +55,16 @@ def register_loader(cls: Type[LoaderPlugin]):
     return cls
 
 
+def register_async_fetcher(cls: Type[AsyncFetcherPlugin]):
+    _ASYNC_FETCHER_PLUGINS[cls.__name__] = cls
+    return cls
+
+
+def register_async_loader(cls: Type[AsyncLoaderPlugin]):
+    _ASYNC_LOADER_PLUGINS[cls.__name__] = cls
+    return cls
+
+
 def get_plugin(plugin_name: str, category: str):
     """
     Возвращает класс плагина по его имени (class name) или названию файла-модуля.
@@ -56,7 +72,7 @@ def get_plugin(plugin_name: str, category: str):
     и берём первый класс, реализующий нужный интерфейс.
 
     :param plugin_name: имя плагина (имя класса или имя модуля-файла без .py)
-    :param category: одна из ['auto_mapping','fetcher','transform','loader']
+    :param category: одна из ['auto_mapping','fetcher','transform','validation','loader','async_fetcher','async_loader']
     :return: класс плагина
     """
     # Словарь зарегистрированных плагинов для категории
@@ -66,6 +82,8 @@ def get_plugin(plugin_name: str, category: str):
         'transform':    _TRANSFORM_PLUGINS,
         'validation': _VALIDATION_PLUGINS,
         'loader':       _LOADER_PLUGINS,
+        'async_fetcher': _ASYNC_FETCHER_PLUGINS,
+        'async_loader':  _ASYNC_LOADER_PLUGINS,
     }.get(category)
     if mapping is None:
         raise ImportError(f"Неизвестная категория: {category}")
@@ -0,0 +1,267 @@
+# core/profiler.py
+import cProfile
+import json
+import logging
+import re
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from mappings.parser import ProfileConfig
+
+logger = logging.getLogger(__name__)
+
+_KB = 1024
+
+
+class CallStats:
+    """Накопленная статистика одного метода плагина/коннектора."""
+    __slots__ = ("name", "calls", "wall", "self_wall", "cpu", "self_cpu", "alloc", "peak")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.self_wall = 0.0
+        self.cpu = 0.0
+        self.self_cpu = 0.0
+        self.alloc = 0
+        self.peak = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "wall_sec": self.wall,
+            "self_wall_sec": self.self_wall,
+            "cpu_sec": self.cpu,
+            "self_cpu_sec": self.self_cpu,
+            "alloc_net_kb": self.alloc / _KB,
+            "peak_kb": self.peak / _KB,
+        }
+
+
+class _Frame:
+    """Активный вызов на стеке потока: дочерние вызовы вычитаются из self-времени."""
+    __slots__ = ("wall0", "cpu0", "mem0", "child_wall", "child_cpu", "peak_seen")
+
+    def __init__(self, wall0: float, cpu0: float, mem0: int):
+        self.wall0 = wall0
+        self.cpu0 = cpu0
+        self.mem0 = mem0
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+        self.peak_seen = 0
+
+
+class _ProfiledIterator:
+    """Итератор-обёртка: время каждого next() относится к вызову, вернувшему генератор."""
+    __slots__ = ("_it", "_profiler", "_name")
+
+    def __init__(self, it: Iterator, profiler: "Profiler", name: str):
+        self._it = it
+        self._profiler = profiler
+        self._name = name
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._profiler._timed(self._name, self._it.__next__, (), {}, count=False)
+
+    def close(self):
+        close = getattr(self._it, "close", None)
+        if callable(close):
+            close()
+
+
+class _Proxy:
+    """
+    Прокси плагина или коннектора: вызовы методов идут через Profiler,
+    атрибуты-данные (supports_batch, conn и т.п.) отдаются как есть.
+    Вызовы изнутри самого объекта (self.method) не перехватываются.
+    """
+
+    def __init__(self, target: Any, label: str, profiler: "Profiler"):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_label", label)
+        object.__setattr__(self, "_profiler", profiler)
+        object.__setattr__(self, "_methods", {})
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name.startswith("__") or isinstance(attr, type) or not callable(attr):
+            return attr
+        wrapped = self._methods.get(name)
+        if wrapped is None:
+            wrapped = self._profiler.wrap_callable(f"{self._label}.{name}", attr)
+            self._methods[name] = wrapped
+        return wrapped
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._target, name, value)
+        self._methods.pop(name, None)
+
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._target.__exit__(*exc)
+
+    def __repr__(self) -> str:
+        return f"<profiled {self._label}>"
+
+
+class Profiler:
+    """
+    Профилирование одной таблицы (режим --profile):
+      - wrap(obj, category) — прокси над плагином/коннектором, каждый вызов метода
+        меряется: wall (perf_counter), CPU потока (thread_time), чистые аллокации
+        и пик памяти по tracemalloc (если memory=True);
+      - self-время — без вложенных профилируемых вызовов (например, DefaultLoader.load_batch
+        без PostgresConnector.execute), генераторы учитываются по каждому next();
+      - cprofile=True — дамп cProfile/pstats таблицы (только поток, вызвавший start).
+    В режиме staged потоки общие для tracemalloc, поэтому память между этапами
+    делится приблизительно; время и CPU считаются по потокам точно.
+    """
+
+    def __init__(self, cfg: ProfileConfig, table: str):
+        self.cfg = cfg
+        self.table = table
+        self.stats: Dict[str, CallStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._own_tracemalloc = False
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._wall0 = 0.0
+        self._cpu0 = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0
+
+    # -------------------------------------------------------------- обёртки
+
+    def wrap(self, obj: Any, category: str) -> Any:
+        if obj is None or isinstance(obj, _Proxy):
+            return obj
+        return _Proxy(obj, f"{category}:{type(obj).__name__}", self)
+
+    def wrap_callable(self, name: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            result = self._timed(name, fn, args, kwargs)
+            if isinstance(result, Iterator):
+                return _ProfiledIterator(result, self, name)
+            return result
+        wrapper.__name__ = getattr(fn, "__name__", name)
+        wrapper.__doc__ = getattr(fn, "__doc__", None)
+        return wrapper
+
+    def _stack(self) -> List[_Frame]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _timed(self, name: str, fn: Callable, args, kwargs, count: bool = True) -> Any:
+        stack = self._stack()
+        memory = self.cfg.memory and tracemalloc.is_tracing()
+        mem0 = 0
+        if memory:
+            mem0, peak_before = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, peak_before)
+            tracemalloc.reset_peak()
+        frame = _Frame(time.perf_counter(), time.thread_time(), mem0)
+        stack.append(frame)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - frame.wall0
+            cpu = time.thread_time() - frame.cpu0
+            alloc = peak = 0
+            if memory:
+                mem1, peak_after = tracemalloc.get_traced_memory()
+                alloc = mem1 - frame.mem0
+                peak = max(peak_after, frame.peak_seen) - frame.mem0
+            stack.pop()
+            if stack:
+                stack[-1].child_wall += wall
+                stack[-1].child_cpu += cpu
+            with self._lock:
+                st = self.stats.get(name)
+                if st is None:
+                    st = self.stats[name] = CallStats(name)
+                if count:
+                    st.calls += 1
+                st.wall += wall
+                st.self_wall += wall - frame.child_wall
+                st.cpu += cpu
+                st.self_cpu += cpu - frame.child_cpu
+                st.alloc += alloc
+                st.peak = max(st.peak, peak)
+
+    # ------------------------------------------------------------- таблица
+
+    def start(self) -> "Profiler":
+        if self.cfg.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        if self.cfg.memory:
+            tracemalloc.reset_peak()
+        if self.cfg.cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        """Останавливает замер и пишет отчёт таблицы. Возвращает отчёт."""
+        self.wall = time.perf_counter() - self._wall0
+        self.cpu = time.process_time() - self._cpu0
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if tracemalloc.is_tracing():
+            self.peak = tracemalloc.get_traced_memory()[1]
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+                self._own_tracemalloc = False
+        report = self.report()
+        self._write(report)
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = sorted((st.to_dict() for st in self.stats.values()),
+                           key=lambda d: d["self_wall_sec"], reverse=True)
+        return {
+            "table": self.table,
+            "wall_sec": self.wall,
+            "cpu_sec": self.cpu,
+            "peak_mb": self.peak / (_KB * _KB),
+            "memory_traced": self.cfg.memory,
+            "calls": calls,
+        }
+
+    def _write(self, report: Dict[str, Any]) -> None:
+        out_dir = Path(self.cfg.out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        base = re.sub(r"[^\w.\-]+", "_", self.table)
+        path = out_dir / f"{base}.json"
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(str(out_dir / f"{base}.pstats"))
+
+        lines = [f"Профиль {self.table}: wall {self.wall:.3f} с, CPU {self.cpu:.3f} с, "
+                 f"пик памяти {report['peak_mb']:.1f} МБ → {path}"]
+        lines.append(f"  {'вызов':60s} {'кол-во':>9s} {'wall':>9s} {'self':>9s} "
+                     f"{'cpu self':>9s} {'alloc KB':>10s} {'peak KB':>10s}")
+        for c in report["calls"][:self.cfg.top]:
+            lines.append(
+                f"  {c['name'][:60]:60s} {c['calls']:9d} {c['wall_sec']:9.3f} {c['self_wall_sec']:9.3f} "
+                f"{c['self_cpu_sec']:9.3f} {c['alloc_net_kb']:10.0f} {c['peak_kb']:10.0f}"
+            )
+        logger.info("\n".join(lines))
@@ -0,0 +1,300 @@
+# core/row_plan.py
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from mappings.parser import TableConfig, MappingRule, ValidationRule
+
+logger = logging.getLogger(__name__)
+
+# Скомпилированные планы: id(table_cfg) → RowPlan (план держит ссылку на table_cfg)
+_PLANS: Dict[int, "RowPlan"] = {}
+
+
+# ----------------------------------------------------------------------
+# Операции transform
+# ----------------------------------------------------------------------
+
+def _op_strip(v):
+    return v.strip() if isinstance(v, str) else v
+
+
+def _op_upper(v):
+    return v.upper() if isinstance(v, str) else v
+
+
+def _op_lower(v):
+    return v.lower() if isinstance(v, str) else v
+
+
+def _op_bool(v):
+    if v == "N" or v == 0:
+        return False
+    if v == "Y" or v == 1:
+        return True
+    return v
+
+
+def classify_op(op: str) -> Tuple[str, Any]:
+    """
+    Разбирает строку операции в том же порядке проверок, что DefaultTransform:
+    ('fn', callable) | ('insert', значение) | ('unknown', op).
+    """
+    if op == "strip":
+        return "fn", _op_strip
+    if op == "upper":
+        return "fn", _op_upper
+    if op == "lower":
+        return "fn", _op_lower
+    if "false" in op or "true" in op:
+        return "fn", _op_bool
+    if op.startswith("insert:"):
+        value = op.split(":", 1)[1]
+        return "insert", None if value == 'null' else value
+    return "unknown", op
+
+
+class ColumnPlan:
+    """
+    Скомпилированное правило маппинга:
+      - const:  значение-константа (insert:… и всё, что после него), колонка источника не читается;
+      - funcs:  цепочка функций над значением источника (пусто — перенос 1:1).
+    """
+    def __init__(self, rule: MappingRule):
+        self.source = rule.source
+        self.target = rule.target
+        self.is_const = False
+        self.const: Any = None
+        self.funcs: List[Callable[[Any], Any]] = []
+
+        for op in rule.transform or []:
+            kind, arg = classify_op(op)
+            if kind == "fn":
+                if self.is_const:
+                    self.const = arg(self.const)
+                else:
+                    self.funcs.append(arg)
+            elif kind == "insert":
+                # insert перетирает значение: всё, что было раньше, не нужно
+                self.is_const = True
+                self.const = arg
+                self.funcs = []
+            else:
+                logger.debug("Неизвестная операция '%s' для поля %s", op, rule.source)
+
+    def apply(self, value: Any) -> Any:
+        if self.is_const:
+            return self.const
+        for fn in self.funcs:
+            value = fn(value)
+        return value
+
+
+# ----------------------------------------------------------------------
+# Проверки validation
+# ----------------------------------------------------------------------
+
+class CheckPlan:
+    """Скомпилированное ValidationRule: regex уже скомпилирован, range разобран."""
+    def __init__(self, target: str, vr: ValidationRule):
+        self.target = target
+        self.type = vr.type
+        self.action = vr.on_fail
+        self.pattern = vr.pattern
+        self.regex: Optional["re.Pattern"] = None
+        self.low: Optional[float] = None
+        self.high: Optional[float] = None
+        self.range_error: Optional[Exception] = None
+        self.lookup = vr.lookup
+        self.lookup_sql: Optional[str] = None
+
+        if vr.type == "regex":
+            self.pattern = vr.pattern or ""
+            self.regex = re.compile(self.pattern)
+        elif vr.type == "range":
+            try:
+                low, high = vr.pattern.split("-", 1)
+                self.low, self.high = float(low), float(high)
+            except Exception as e:
+                self.range_error = e
+        elif vr.type == "lookup" and vr.lookup:
+            self.lookup_sql = (
+                f"SELECT 1 FROM \"{vr.lookup.table}\" WHERE \"{vr.lookup.key_column}\" = %s LIMIT 1"
+            )
+
+    def fail(self, row: Dict[str, Any]) -> bool:
+        """Применяет on_fail. True — строка помечена _skip."""
+        action = self.action
+        if action is None:
+            row[self.target] = None
+        elif action == "skip":
+            row["_skip"] = True
+            return True
+        elif action.startswith("default:"):
+            row[self.target] = action.split(":", 1)[1]
+        else:
+            raise RuntimeError(self.error_message(row.get(self.target)))
+        return False
+
+    def error_message(self, val: Any) -> str:
+        if self.type == "regex":
+            return f"Валидация regex прошла с ошибкой: {self.target}={val} !~ {self.pattern}"
+        if self.type == "range":
+            return f"Валидация range прошла с ошибкой: {self.target}={val} not in [{self.low},{self.high}]"
+        return (f"Валидация lookup прошла с ошибкой: "
+                f"{self.lookup.table}.{self.lookup.key_column}={val} not found")
+
+
+class RowPlan:
+    """
+    План обработки строк одной таблицы, компилируется один раз после auto-mapping:
+      - transform(row): специализированная функция (генерируется из mappings),
+        колонки 1:1 копируются без цикла по операциям, insert-константы вынесены;
+      - validate(ctx, row): обходит только колонки с правилами валидации,
+        с заранее скомпилированными regex и разобранными range.
+    """
+
+    def __init__(self, table_cfg: TableConfig):
+        self.table_cfg = table_cfg
+        self.columns: List[ColumnPlan] = [ColumnPlan(r) for r in table_cfg.mappings or []]
+        self.checks: List[Tuple[str, List[CheckPlan]]] = [
+            (rule.target, [CheckPlan(rule.target, vr) for vr in rule.validation])
+            for rule in table_cfg.mappings or []
+            if rule.validation
+        ]
+        for _, checks in self.checks:
+            for chk in checks:
+                if chk.range_error is not None:
+                    logger.error("Ошибка парсинга range для %s: %s", chk.target, chk.range_error)
+        self.transform = self._compile_transform()
+
+    def _compile_transform(self) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        ns: Dict[str, Any] = {}
+        items: List[str] = []
+        for i, col in enumerate(self.columns):
+            ns[f"_t{i}"] = col.target
+            if col.is_const:
+                ns[f"_c{i}"] = col.const
+                expr = f"_c{i}"
+            else:
+                ns[f"_s{i}"] = col.source
+                expr = f"get(_s{i})"
+                for j, fn in enumerate(col.funcs):
+                    ns[f"_f{i}_{j}"] = fn
+                    expr = f"_f{i}_{j}({expr})"
+            items.append(f"_t{i}: {expr}")
+        src = (
+            "def _transform(row):\n"
+            "    get = row.get\n"
+            "    return {" + ", ".join(items) + "}\n"
+        )
+        exec(compile(src, f"<row_plan {self.table_cfg.target_table}>", "exec"), ns)
+        return ns["_transform"]
+
+    def validate(self, ctx, row: Dict[str, Any]) -> Dict[str, Any]:
+        for target, checks in self.checks:
+            for chk in checks:
+                val = row.get(target)
+                if val is None:
+                    continue
+
+                if chk.regex is not None:
+                    if chk.regex.match(str(val)) is None:
+                        ctx.warning("Не прошёл regex для %s=%r (pattern=%r) → %s",
+                                    target, val, chk.pattern, chk.action)
+                        if chk.fail(row):
+                            return row
+
+                elif chk.type == "range":
+                    # как и в интерпретируемом пути, ошибки range только логируются
+                    try:
+                        if chk.range_error is not None:
+                            raise chk.range_error
+                        num = float(val)
+                        if not (chk.low <= num <= chk.high):
+                            ctx.warning("Не в диапазоне %s=%r (range=%s) → %s",
+                                        target, val, chk.pattern, chk.action)
+                            if chk.fail(row):
+                                return row
+                    except Exception as e:
+                        ctx.error("Ошибка парсинга range для %s: %s", target, e)
+
+                elif chk.lookup_sql is not None:
+                    exists = False
+                    try:
+                        if chk.lookup.preload:
+                            exists = str(val) in ctx.lookup_cache.keys(ctx.pg_conn, chk.lookup)
+                        else:
+                            with ctx.pg_conn.lookup_cursor() as cur:
+                                cur.execute(chk.lookup_sql, (str(val),))
+                                exists = cur.fetchone() is not None
+                    except Exception as e:
+                        ctx.error("Ошибка выполнения запроса %s.%s=%r: %s",
+                                  chk.lookup.table, chk.lookup.key_column, val, e)
+                    if not exists:
+                        ctx.warning("Ошибка выполнения запроса for %s=%r in %s.%s → %s",
+                                    target, val, chk.lookup.table, chk.lookup.key_column, chk.action)
+                        if chk.fail(row):
+                            return row
+        return row
+
+
+def compile_row_plan(table_cfg: TableConfig) -> RowPlan:
+    """Компилирует (или перекомпилирует) план таблицы и кладёт его в кэш."""
+    plan = RowPlan(table_cfg)
+    _PLANS[id(table_cfg)] = plan
+    return plan
+
+
+def get_row_plan(table_cfg: TableConfig) -> RowPlan:
+    """Возвращает скомпилированный план таблицы, компилируя его при первом обращении."""
+    plan = _PLANS.get(id(table_cfg))
+    if plan is None or plan.table_cfg is not table_cfg:
+        plan = compile_row_plan(table_cfg)
+    return plan
+
+
+def benchmark_row_plan(ctx, rows: Sequence[Dict[str, Any]], repeat: int = 3) -> Dict[str, float]:
+    """
+    Сравнивает интерпретируемый путь DefaultTransform/DefaultValidation
+    со скомпилированным планом на одних и тех же строках.
+    Возвращает лучшее время (сек) каждого пути и ускорение.
+    """
+    # импорт здесь: plugins зависят от core
+    from plugins.default_transform import DefaultTransform
+    from plugins.default_validation import DefaultValidation
+
+    transform = DefaultTransform()
+    validation = DefaultValidation()
+    plan = compile_row_plan(ctx.table_cfg)
+    # логирование каждой строки исказило бы замер
+    prev_disabled = ctx.logger.disabled
+    ctx.logger.disabled = True
+
+    def run(fn) -> float:
+        best = float("inf")
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            for row in rows:
+                fn(dict(row))
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    try:
+        interpreted = run(lambda r: validation.validate_interpreted(ctx, transform.transform_interpreted(ctx, r)))
+        compiled = run(lambda r: plan.validate(ctx, plan.transform(r)))
+    finally:
+        ctx.logger.disabled = prev_disabled
+
+    result = {
+        "rows": len(rows),
+        "interpreted_sec": interpreted,
+        "compiled_sec": compiled,
+        "speedup": interpreted / compiled if compiled else float("inf"),
+    }
+    logger.info(
+        "Бенчмарк плана %s: %d строк, интерпретация %.4f с, план %.4f с, ускорение ×%.2f",
+        ctx.table_cfg.target_table, len(rows), interpreted, compiled, result["speedup"]
+    )
+    return result
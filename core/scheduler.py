@@ -0,0 +1,343 @@
+# core/scheduler.py
+import heapq
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Set, Tuple
+
+from logger import setup_logging
+from connectors.oracle_connector import OracleConnector
+from connectors.postgres_connector import PostgresConnector
+from mappings.parser import Config, TableConfig
+
+logger = logging.getLogger(__name__)
+
+
+def _run_table_worker(cfg: Config, index: int, resume: bool = False, metrics_queue=None) -> int:
+    """
+    Точка входа воркера-процесса: открывает собственную пару соединений
+    и обрабатывает одну таблицу из cfg.tables.
+    Метрики таблицы уходят в metrics_queue родительского процесса.
+    """
+    setup_logging()
+    # импорт здесь, чтобы не было циклического импорта pipeline ↔ core
+    from pipeline import process_table
+
+    if cfg.global_config.adaptive_batch is not None:
+        from core.batch_sizer import budget_bytes, get_memory_budget
+        # бюджет делится между воркерами: вместе они не превышают memory_budget_mb
+        get_memory_budget().configure(
+            budget_bytes(cfg.global_config.adaptive_batch, cfg.global_config.parallel_tables)
+        )
+
+    metrics = None
+    if metrics_queue is not None:
+        from core.metrics import get_metrics
+        metrics = get_metrics()
+        metrics.publish_to(metrics_queue)
+
+    table_cfg = cfg.tables[index]
+    try:
+        with OracleConnector() as ora_conn, PostgresConnector() as pg_conn:
+            process_table(cfg, table_cfg, ora_conn, pg_conn, resume=resume)
+    except BaseException:
+        if metrics is not None:
+            metrics.mark_failed()
+        raise
+    return index
+
+
+class DependencyQueue:
+    """
+    Очередь запуска таблиц по DAG зависимостей: готовые таблицы отдаются
+    начиная с самых больших, при равенстве — в порядке конфига.
+    """
+
+    def __init__(self, tables: List[TableConfig], deps: Dict[int, Set[int]], sizes: Dict[int, int]):
+        self.tables = tables
+        self.sizes = sizes
+        self.remaining = {idx: set(d) for idx, d in deps.items()}
+        self.dependents: Dict[int, Set[int]] = {idx: set() for idx in self.remaining}
+        for idx, d in self.remaining.items():
+            for dep in d:
+                self.dependents[dep].add(idx)
+        self.ready: List[Tuple[int, int]] = []
+        for idx, d in self.remaining.items():
+            if not d:
+                heapq.heappush(self.ready, (-sizes.get(idx, 0), idx))
+        self.waiting = {idx for idx, d in self.remaining.items() if d}
+
+    @property
+    def dependency_count(self) -> int:
+        return sum(len(d) for d in self.remaining.values())
+
+    def pending(self) -> bool:
+        """Есть таблицы, которые ещё не запущены."""
+        return bool(self.ready or self.waiting)
+
+    def pop(self) -> Optional[int]:
+        """Следующая готовая таблица или None."""
+        if not self.ready:
+            return None
+        return heapq.heappop(self.ready)[1]
+
+    def complete(self, idx: int) -> None:
+        """Таблица загружена: зависящие от неё становятся готовыми."""
+        for dep_idx in self.dependents[idx]:
+            self.remaining[dep_idx].discard(idx)
+            if dep_idx in self.waiting and not self.remaining[dep_idx]:
+                self.waiting.discard(dep_idx)
+                heapq.heappush(self.ready, (-self.sizes.get(dep_idx, 0), dep_idx))
+
+    def break_cycle(self) -> None:
+        """Цикл в графе зависимостей: разрываем его на таблице, первой по конфигу."""
+        idx = min(self.waiting)
+        logger.warning(
+            "Циклическая зависимость, таблица %s запускается без ожидания: %s",
+            self.tables[idx].target_table,
+            sorted(self.tables[d].target_table for d in self.remaining[idx])
+        )
+        self.remaining[idx].clear()
+        self.waiting.discard(idx)
+        heapq.heappush(self.ready, (-self.sizes.get(idx, 0), idx))
+
+    def cancel(self) -> None:
+        """После ошибки новые таблицы не запускаются."""
+        self.ready.clear()
+        self.waiting.clear()
+
+
+class TableScheduler:
+    """
+    Параллельный планировщик таблиц:
+      1) строит DAG зависимостей — lookup-таблицы (MappingRule.lookup.table,
+         ValidationRule.lookup.table) и FK-родители в Postgres грузятся раньше,
+         чем ссылающиеся на них таблицы. Так TRUNCATE ... CASCADE в pre_load
+         родителя никогда не очистит таблицу, которую заполняет другой воркер;
+      2) среди готовых таблиц первыми запускает самые большие
+         (по размеру сегментов в Oracle);
+      3) выполняет таблицы в N воркерах-процессах.
+    """
+
+    def __init__(self, cfg: Config, workers: int, resume: bool = False):
+        self.cfg = cfg
+        self.workers = max(1, workers)
+        self.resume = resume
+        self.tables: List[TableConfig] = cfg.tables
+
+    # ------------------------------------------------------------------ DAG
+
+    def _target_key(self, table_cfg: TableConfig) -> Tuple[str, str]:
+        return (table_cfg.target_schema or 'public', table_cfg.target_table)
+
+    def _by_target(self) -> Dict[Tuple[str, str], List[int]]:
+        by_target: Dict[Tuple[str, str], List[int]] = {}
+        for idx, table_cfg in enumerate(self.tables):
+            by_target.setdefault(self._target_key(table_cfg), []).append(idx)
+        return by_target
+
+    def _lookup_tables(self, table_cfg: TableConfig) -> Set[str]:
+        """Имена таблиц, на которые ссылаются lookup-правила и lookup-валидации."""
+        names: Set[str] = set()
+        for rule in table_cfg.mappings or []:
+            if rule.lookup:
+                names.add(rule.lookup.table)
+            for vr in rule.validation or []:
+                if vr.lookup:
+                    names.add(vr.lookup.table)
+        names.discard(table_cfg.target_table)
+        return names
+
+    def _fk_graph(self, pg_conn: PostgresConnector) -> Dict[Tuple[str, str], Set[Tuple[str, str]]]:
+        """
+        Возвращает граф FK: родитель → множество дочерних таблиц.
+        """
+        query = """
+                SELECT pn.nspname, p.relname, cn.nspname, c.relname
+                FROM pg_constraint k
+                JOIN pg_class c      ON c.oid = k.conrelid
+                JOIN pg_namespace cn ON cn.oid = c.relnamespace
+                JOIN pg_class p      ON p.oid = k.confrelid
+                JOIN pg_namespace pn ON pn.oid = p.relnamespace
+                WHERE k.contype = 'f'
+                """
+        graph: Dict[Tuple[str, str], Set[Tuple[str, str]]] = {}
+        for p_schema, p_table, c_schema, c_table in pg_conn.execute(query):
+            if (p_schema, p_table) == (c_schema, c_table):
+                continue
+            graph.setdefault((p_schema, p_table), set()).add((c_schema, c_table))
+        return graph
+
+    def build_graph(self, pg_conn: Optional[PostgresConnector]) -> Dict[int, Set[int]]:
+        """
+        Строит зависимости: индекс таблицы → индексы таблиц, которые должны
+        завершиться до её старта.
+        """
+        by_target = self._by_target()
+        deps: Dict[int, Set[int]] = {idx: set() for idx in range(len(self.tables))}
+
+        # 1) несколько конфигов в одну целевую таблицу — строго в порядке конфига
+        for indices in by_target.values():
+            for prev, nxt in zip(indices, indices[1:]):
+                deps[nxt].add(prev)
+
+        # 2) lookup-таблицы грузятся раньше
+        for idx, table_cfg in enumerate(self.tables):
+            schema = table_cfg.target_schema or 'public'
+            for name in self._lookup_tables(table_cfg):
+                for dep in by_target.get((schema, name), []):
+                    if dep != idx:
+                        deps[idx].add(dep)
+
+        # 3) FK: TRUNCATE ... CASCADE родителя задевает всех потомков,
+        #    в том числе через таблицы, которые в этот запуск не входят
+        if pg_conn is not None:
+            try:
+                fk_graph = self._fk_graph(pg_conn)
+            except Exception as e:
+                logger.warning("Не удалось прочитать FK из Postgres: %s", e)
+                fk_graph = {}
+            for parent_key, parent_indices in by_target.items():
+                seen: Set[Tuple[str, str]] = set()
+                stack = list(fk_graph.get(parent_key, ()))
+                while stack:
+                    child_key = stack.pop()
+                    if child_key in seen or child_key == parent_key:
+                        continue
+                    seen.add(child_key)
+                    stack.extend(fk_graph.get(child_key, ()))
+                    for child_idx in by_target.get(child_key, []):
+                        deps[child_idx].update(parent_indices)
+
+        for idx in deps:
+            deps[idx].discard(idx)
+        return deps
+
+    # ------------------------------------------------------------ размеры
+
+    def segment_sizes(self, ora_conn: Optional[OracleConnector]) -> Dict[int, int]:
+        """
+        Размер каждой таблицы-источника в байтах (сегменты таблицы и её LOB).
+        Если нет доступа к DBA_SEGMENTS — оценка по ALL_TABLES (num_rows * avg_row_len).
+        """
+        sizes: Dict[int, int] = {idx: 0 for idx in range(len(self.tables))}
+        if ora_conn is None or not self.tables:
+            return sizes
+
+        owners = sorted({t.source_schema.upper() for t in self.tables})
+        binds = ", ".join(f":{i + 1}" for i in range(len(owners)))
+        queries = [
+            f"""
+            SELECT s.owner, NVL(l.table_name, s.segment_name), SUM(s.bytes)
+            FROM dba_segments s
+            LEFT JOIN dba_lobs l
+                   ON l.owner = s.owner AND l.segment_name = s.segment_name
+            WHERE s.owner IN ({binds})
+            GROUP BY s.owner, NVL(l.table_name, s.segment_name)
+            """,
+            f"""
+            SELECT owner, table_name, NVL(num_rows, 0) * NVL(avg_row_len, 0)
+            FROM all_tables
+            WHERE owner IN ({binds})
+            """,
+        ]
+        found: Dict[Tuple[str, str], int] = {}
+        for query in queries:
+            try:
+                for owner, table, size in ora_conn.execute(query, tuple(owners)):
+                    found[(owner, table)] = int(size or 0)
+                break
+            except Exception as e:
+                logger.warning("Не удалось получить размеры сегментов Oracle: %s", e)
+
+        for idx, table_cfg in enumerate(self.tables):
+            key = (table_cfg.source_schema.upper(), table_cfg.source_table.upper())
+            sizes[idx] = found.get(key, 0)
+        return sizes
+
+    # --------------------------------------------------------------- запуск
+
+    def plan(self) -> Tuple[Dict[int, Set[int]], Dict[int, int]]:
+        """Собирает метаданные (FK и размеры) через временные соединения."""
+        deps: Dict[int, Set[int]] = {}
+        sizes: Dict[int, int] = {}
+        try:
+            with PostgresConnector() as pg_conn:
+                deps = self.build_graph(pg_conn)
+        except Exception as e:
+            logger.warning("Postgres недоступен для построения DAG, только lookup-зависимости: %s", e)
+            deps = self.build_graph(None)
+        try:
+            with OracleConnector() as ora_conn:
+                sizes = self.segment_sizes(ora_conn)
+        except Exception as e:
+            logger.warning("Oracle недоступен для оценки размеров, порядок из конфига: %s", e)
+            sizes = self.segment_sizes(None)
+        return deps, sizes
+
+    def run(self) -> None:
+        deps, sizes = self.plan()
+        # готовые таблицы: сначала самые большие, при равенстве — порядок конфига
+        queue = DependencyQueue(self.tables, deps, sizes)
+
+        logger.info(
+            "Планировщик: %d таблиц, %d воркеров, зависимостей: %d",
+            len(self.tables), self.workers, queue.dependency_count
+        )
+
+        # метрики воркеров собираются в реестр этого процесса, откуда их отдаёт экспортёр
+        manager = metrics_queue = consumer = None
+        if self.cfg.global_config.metrics is not None:
+            from core.metrics import get_metrics
+            manager = multiprocessing.Manager()
+            metrics_queue = manager.Queue()
+            consumer = threading.Thread(target=get_metrics().consume, args=(metrics_queue,),
+                                        name="metrics-consumer", daemon=True)
+            consumer.start()
+
+        try:
+            failed = self._execute(queue, metrics_queue)
+        finally:
+            if manager is not None:
+                metrics_queue.put(None)
+                consumer.join()
+                manager.shutdown()
+
+        if failed is not None:
+            raise RuntimeError(f"Параллельная обработка таблиц прервана: {failed}") from failed
+
+    def _execute(self, queue: DependencyQueue, metrics_queue) -> Optional[BaseException]:
+        """Раздаёт готовые таблицы воркерам. Возвращает первую ошибку воркера или None."""
+        failed: Optional[BaseException] = None
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+            while queue.pending() or running:
+                while failed is None and queue.ready and len(running) < self.workers:
+                    idx = queue.pop()
+                    table_cfg = self.tables[idx]
+                    logger.info("Запуск таблицы %s → %s (%d байт)",
+                                table_cfg.source_table, table_cfg.target_table, queue.sizes.get(idx, 0))
+                    running[pool.submit(_run_table_worker, self.cfg, idx, self.resume, metrics_queue)] = idx
+
+                if not running:
+                    if failed is not None:
+                        break
+                    queue.break_cycle()
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    idx = running.pop(fut)
+                    exc = fut.exception()
+                    if exc is not None:
+                        logger.error("Ошибка обработки таблицы %s: %s",
+                                     self.tables[idx].source_table, exc)
+                        failed = failed or exc
+                        continue
+                    queue.complete(idx)
+
+                if failed is not None:
+                    # новые таблицы не запускаем, дожидаемся уже запущенных
+                    queue.cancel()
+        return failed
@@ -0,0 +1,232 @@
+# core/self_lookup.py
+import io
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from psycopg2 import sql
+
+from core.batch import ColumnBatch
+from core.copy_text import format_rows
+from mappings.parser import MappingRule, SelfLookupConfig
+
+# Суффикс колонки, в которую DefaultLookup кладёт ключ self-lookup
+TMP_SUFFIX = "_tmp"
+# Предел длины идентификатора Postgres (NAMEDATALEN - 1)
+_MAX_IDENT = 63
+
+
+def primary_key(cur, table: str) -> List[str]:
+    """Колонки первичного ключа public.{table} в порядке индекса (пусто, если PK нет)."""
+    cur.execute(
+        """
+        SELECT a.attname
+        FROM pg_index x
+        JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = ANY(x.indkey)
+        WHERE x.indrelid = to_regclass(%s) AND x.indisprimary
+        ORDER BY array_position(x.indkey::int2[], a.attnum)
+        """,
+        (f'public."{table}"',)
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+class SelfLookupSide:
+    """
+    Self-lookup через боковую таблицу вместо tmp-колонок приёмника:
+      - ключи self-lookup ({target}_tmp) не грузятся в приёмник, а пишутся
+        вместе с ключом строки (PK) в etl_self_{table} — в той же транзакции,
+        что и батч (UNLOGGED, если чекпоинты выключены и продолжать нечего);
+      - resolve: одним соединением (hash join) ключи разрешаются в значения,
+        результат упорядочен по ключу строки и проиндексирован один раз;
+        приёмник обновляется порциями по chunk_rows строк с commit после
+        каждой (короткие блокировки), каждая строка — одним UPDATE на все
+        правила, VACUUM каждые vacuum_every порций даёт переиспользовать место.
+    Иерархии (parent_id по коду родителя в той же таблице) разрешаются
+    после загрузки всех батчей, поэтому порядок строк источника не важен.
+    """
+
+    def __init__(self, table: str, row_key: List[str], rules: Sequence[MappingRule],
+                 settings: SelfLookupConfig):
+        self.table = table
+        self.row_key = row_key
+        self.rules = list(rules)
+        self.settings = settings
+        self.tmp_columns = [r.target + TMP_SUFFIX for r in self.rules]
+        self.name = ("etl_self_" + table)[:_MAX_IDENT]
+        self.resolved_name = ("etl_selfres_" + table)[:_MAX_IDENT]
+
+    def _ident(self, name: str) -> sql.Identifier:
+        return sql.Identifier('public', name)
+
+    def create(self, cur, reset: bool, logged: bool = False) -> None:
+        """
+        Боковая таблица с типами колонок приёмника: ключ строки и по колонке
+        на правило (тип lookup.key_column). reset — начать заново (первый батч).
+        logged — обычная таблица вместо UNLOGGED: с чекпоинтами её строки должны
+        пережить сбой сервера вместе с батчами, которые чекпоинт считает загруженными.
+        При продолжении (reset=False) таблица должна остаться от прерванного запуска.
+        """
+        side = self._ident(self.name)
+        if reset:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {s}").format(s=side))
+        else:
+            cur.execute("SELECT relpersistence FROM pg_class WHERE oid = to_regclass(%s)",
+                        (f'public."{self.name}"',))
+            row = cur.fetchone()
+            if row is None or row[0] == 'u':
+                # UNLOGGED-таблица после сбоя сервера пуста — ключи загруженных батчей потеряны
+                raise RuntimeError(
+                    f"self_lookup: нет надёжной {self.name} для продолжения загрузки {self.table} — "
+                    f"перезапустите без --resume"
+                )
+        cur.execute(
+            sql.SQL("CREATE {kind} TABLE IF NOT EXISTS {s} AS SELECT {cols} FROM {t} WITH NO DATA").format(
+                kind=sql.SQL("" if logged else "UNLOGGED"),
+                s=side,
+                t=self._ident(self.table),
+                cols=sql.SQL(', ').join(
+                    [sql.Identifier(k) for k in self.row_key] + [
+                        sql.SQL("{k} AS {tmp}").format(
+                            k=sql.Identifier(r.lookup.key_column), tmp=sql.Identifier(tmp)
+                        )
+                        for r, tmp in zip(self.rules, self.tmp_columns)
+                    ]
+                )
+            )
+        )
+
+    def detach_rows(self, rows: List[Dict[str, Any]]) -> List[List[Any]]:
+        """Убирает tmp-колонки из строк батча; строки боковой таблицы — где есть ключ."""
+        side = []
+        tmps = self.tmp_columns
+        keys = self.row_key
+        for row in rows:
+            values = [row.pop(tmp, None) for tmp in tmps]
+            if any(v is not None for v in values):
+                side.append([row.get(k) for k in keys] + values)
+        return side
+
+    def detach_columns(self, batch: ColumnBatch) -> List[List[Any]]:
+        """detach_rows для колоночного батча."""
+        tmp_values = [ColumnBatch.as_list(batch.columns.pop(tmp, [None] * len(batch)))
+                      for tmp in self.tmp_columns]
+        if not any(v is not None for col in tmp_values for v in col):
+            return []
+        key_values = [ColumnBatch.as_list(batch.column(k)) for k in self.row_key]
+        return [
+            list(values) for values in zip(*key_values, *tmp_values)
+            if any(v is not None for v in values[len(key_values):])
+        ]
+
+    def write(self, cur, side_rows: List[List[Any]]) -> None:
+        """COPY строк батча в боковую таблицу (на курсоре loader'а, до его commit)."""
+        if not side_rows:
+            return
+        copy_sql = sql.SQL("COPY {s} ({cols}) FROM STDIN").format(
+            s=self._ident(self.name),
+            cols=sql.SQL(', ').join(sql.Identifier(c) for c in self.row_key + self.tmp_columns)
+        )
+        cur.copy_expert(copy_sql.as_string(cur), io.BytesIO(format_rows(side_rows).encode("utf-8")))
+
+    def resolve(self, ctx, conn) -> None:
+        """Разрешение ключей и порционный UPDATE приёмника; боковые таблицы удаляются."""
+        side = self._ident(self.name)
+        resolved = self._ident(self.resolved_name)
+        target = self._ident(self.table)
+        keys = [sql.Identifier(k) for k in self.row_key]
+        started = time.perf_counter()
+
+        joins, values, found = [], [], []
+        for i, (rule, tmp) in enumerate(zip(self.rules, self.tmp_columns)):
+            alias = sql.Identifier(f"l{i}")
+            val = sql.Identifier(rule.lookup.value_column or rule.lookup.key_column)
+            joins.append(
+                sql.SQL(" LEFT JOIN {t} AS {a} ON {a}.{key} = s.{tmp} AND {a}.{val} IS NOT NULL").format(
+                    t=target, a=alias, key=sql.Identifier(rule.lookup.key_column),
+                    tmp=sql.Identifier(tmp), val=val
+                )
+            )
+            values.append(sql.SQL("{a}.{val} AS {c}").format(a=alias, val=val, c=sql.Identifier(rule.target)))
+            found.append(sql.SQL("{a}.{val} IS NOT NULL").format(a=alias, val=val))
+
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {r}").format(r=resolved))
+            # DISTINCT ON: строка приёмника обновляется один раз, даже если ключ встретился повторно
+            cur.execute(
+                sql.SQL(
+                    "CREATE UNLOGGED TABLE {r} AS "
+                    "SELECT row_number() OVER (ORDER BY {keys}) AS etl_n, q.* FROM ("
+                    "SELECT DISTINCT ON ({skeys}) {skeys}, {values} FROM {s} AS s{joins} "
+                    "WHERE {found} ORDER BY {skeys}) AS q"
+                ).format(
+                    r=resolved, s=side,
+                    keys=sql.SQL(', ').join(keys),
+                    skeys=sql.SQL(', ').join(sql.SQL("s.{k}").format(k=k) for k in keys),
+                    values=sql.SQL(', ').join(values),
+                    joins=sql.SQL('').join(joins),
+                    found=sql.SQL(' OR ').join(found),
+                )
+            )
+            total = cur.rowcount
+            cur.execute(sql.SQL("CREATE INDEX ON {r} (etl_n)").format(r=resolved))
+            cur.execute(sql.SQL("ANALYZE {r}").format(r=resolved))
+        conn.commit()
+
+        sets = sql.SQL(', ').join(
+            sql.SQL("{c} = COALESCE(r.{c}, t.{c})").format(c=sql.Identifier(rule.target)) for rule in self.rules
+        )
+        update = sql.SQL(
+            "UPDATE {t} AS t SET {sets} FROM {r} AS r "
+            "WHERE r.etl_n > %s AND r.etl_n <= %s AND {match}"
+        ).format(
+            t=target, r=resolved, sets=sets,
+            match=sql.SQL(' AND ').join(sql.SQL("t.{k} = r.{k}").format(k=k) for k in keys),
+        )
+        chunk = self.settings.chunk_rows
+        updated = 0
+        for n, low in enumerate(range(0, total, chunk), 1):
+            with conn.cursor() as cur:
+                cur.execute(update, (low, low + chunk))
+                updated += cur.rowcount
+            conn.commit()
+            if self.settings.vacuum_every and n % self.settings.vacuum_every == 0 and low + chunk < total:
+                self._vacuum(conn, target)
+
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {r}").format(r=resolved))
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {s}").format(s=side))
+        conn.commit()
+        ctx.info("Self-lookup %s (%s): обновлено %d строк порциями по %d за %.1f с",
+                 self.table, ", ".join(rule.target for rule in self.rules), updated, chunk,
+                 time.perf_counter() - started)
+
+    @staticmethod
+    def _vacuum(conn, target: sql.Identifier) -> None:
+        """VACUUM между порциями: место старых версий строк переиспользуется следующими."""
+        autocommit = conn.autocommit
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("VACUUM {t}").format(t=target))
+        finally:
+            conn.autocommit = autocommit
+
+
+def self_lookup_side(ctx, cur, table: str, rules: Sequence[MappingRule]) -> Optional[SelfLookupSide]:
+    """
+    SelfLookupSide для правил таблицы или None — тогда остаются tmp-колонки
+    приёмника (side_table: false или ключ строки не загружается батчами).
+    """
+    if not rules:
+        return None
+    settings = ctx.table_cfg.self_lookup or SelfLookupConfig()
+    if not settings.side_table:
+        return None
+    row_key = settings.row_key or primary_key(cur, table)
+    loaded = {r.target for r in ctx.table_cfg.mappings if r.target}
+    looked_up = {r.target for r in rules}
+    if not row_key or any(k not in loaded or k in looked_up for k in row_key):
+        ctx.warning("Self-lookup %s: ключ строки %s не загружается батчами — временные колонки в приёмнике",
+                    table, row_key or "(нет PK)")
+        return None
+    return SelfLookupSide(table, row_key, rules, settings)
@@ -0,0 +1,320 @@
+# core/staged.py
+import itertools
+import logging
+import queue
+import threading
+import time
+from functools import partial
+from typing import Any, List, Optional, Sequence
+
+from core.batch_sizer import AdaptiveBatchSizer
+from core.chain import batch_capable, process_batch, process_columns, process_rows
+from core.checkpoint import batch_source_key
+from core.context import ExecutionContext
+from plugin_interfaces.fetcher_interface import FetcherPlugin
+from plugin_interfaces.loader_interface import LoaderPlugin
+from plugin_interfaces.transform_interface import TransformPlugin
+from plugin_interfaces.validation_interface import ValidationPlugin
+
+logger = logging.getLogger(__name__)
+
+# Маркер конца потока в очередях
+_DONE = object()
+
+
+class StagedExecutor:
+    """
+    Конвейерное выполнение одной таблицы:
+      fetch-поток  → raw_queue  → transform/validate (текущий поток)
+                   → load_queue → load-поток (loader.load_batch).
+
+    Очереди ограничены queue_size батчами, поэтому быстрый этап упирается
+    в медленный (backpressure), а память ограничена ~2*queue_size батчами.
+    Интерфейсы плагинов не меняются: fetcher по-прежнему отдаёт строки,
+    loader получает список словарей (или колоночный батч, если supports_columns).
+
+    Размер батчей задаёт AdaptiveBatchSizer: резерв бюджета памяти батча
+    снимается после его загрузки (или отбрасывания всех строк).
+
+    Lookup-ы этапа transform не делят транзакцию с загрузкой: на время run
+    соединение Postgres переводится в separate_lookups() — без пула справочные
+    запросы идут через отдельное autocommit-соединение, с пулом — через полосу
+    lookup. Ошибка lookup не обрывает батч, и lookup не ждёт COPY/commit.
+
+    lanes > 1 (chunking.load_workers): батчи разбирают lanes потоков, каждый
+    сам трансформирует и загружает свой батч на собственном соединении Postgres
+    (отдельная транзакция на батч) — чанки ChunkedFetcher идут в приёмник
+    параллельно. pre_load и finalize_table остаются на основном соединении.
+    Батчи коммитятся в порядке готовности, поэтому чекпоинт хранит только
+    rows_loaded, без ключа источника и watermark.
+    """
+
+    def __init__(
+        self,
+        table_cfg,
+        ora_conn,
+        pg_conn,
+        fetcher: FetcherPlugin,
+        transformers: Sequence[TransformPlugin],
+        validators: Sequence[ValidationPlugin],
+        loader: LoaderPlugin,
+        batch_size: int,
+        queue_size: int = 4,
+        sizer: Optional[AdaptiveBatchSizer] = None,
+        lanes: int = 1,
+    ):
+        self.table_cfg = table_cfg
+        self.ora_conn = ora_conn
+        self.pg_conn = pg_conn
+        self.fetcher = fetcher
+        self.transformers = transformers
+        self.validators = validators
+        self.loader = loader
+        self.batch_size = batch_size
+        self.sizer = sizer or AdaptiveBatchSizer(None, batch_size)
+        self.lanes = max(1, lanes)
+        # колоночный путь, если его поддерживают все плагины цепочки
+        columnar = batch_capable(transformers, validators)
+        # fetcher с supports_tuples отдаёт колоночные батчи прямо из кортежей курсора
+        self._tuples = columnar and getattr(fetcher, "supports_tuples", False)
+        self._load = loader.load_batch
+        if self._tuples:
+            self._process = process_columns
+            # loader с supports_columns получает колоночный батч без сборки строк
+            if getattr(loader, "supports_columns", False):
+                self._process = partial(process_columns, as_batch=True)
+                self._load = loader.load_columns
+        else:
+            self._process = process_batch if columnar else process_rows
+        self.raw_queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self.load_queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+        self._batch_ids = None
+        self._batch_lock = threading.Lock()
+
+    # ------------------------------------------------------------ очереди
+
+    def _put(self, q: "queue.Queue", item: Any) -> bool:
+        """Кладёт элемент, пока не сработал стоп. False — конвейер остановлен."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: "queue.Queue") -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, exc: BaseException) -> None:
+        self._errors.append(exc)
+        self._stop.set()
+        # выборка может ждать бюджет памяти, который держат батчи остановленных этапов
+        self.sizer.close()
+
+    def _drain(self) -> None:
+        """После остановки освобождает резервы батчей, оставшихся в очередях."""
+        for q in (self.raw_queue, self.load_queue):
+            while True:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    continue
+                self.sizer.release(item[2] if isinstance(item, tuple) else item)
+
+    # -------------------------------------------------------------- этапы
+
+    def _fetch_stage(self, ctx: ExecutionContext) -> None:
+        try:
+            if self._tuples:
+                batches = self.sizer.column_batches(self.fetcher.fetch_batches(ctx, self.sizer.current_size))
+            else:
+                batches = self.sizer.batches(self.fetcher.fetch(ctx, self.batch_size))
+            for chunk in batches:
+                if not self._put(self.raw_queue, chunk):
+                    self.sizer.release(chunk)
+                    return
+        except BaseException as e:
+            logger.error("Ошибка в fetch-потоке %s: %s", self.table_cfg.source_table, e)
+            self._fail(e)
+        finally:
+            self._put(self.raw_queue, _DONE)
+
+    def _load_stage(self) -> None:
+        try:
+            while True:
+                item = self._get(self.load_queue)
+                if item is _DONE:
+                    return
+                ctx, rows, raw = item
+                self._load_batch(ctx, rows, raw)
+        except BaseException as e:
+            logger.error("Ошибка в load-потоке %s: %s", self.table_cfg.source_table, e)
+            self._fail(e)
+
+    def _load_batch(self, ctx: ExecutionContext, rows, raw) -> None:
+        try:
+            started = time.perf_counter()
+            self._load(ctx, rows)
+            load_sec = time.perf_counter() - started
+            self.sizer.observe(raw, load_sec)
+            if ctx.metrics is not None:
+                ctx.metrics.batch_done(raw, rows, load_sec, ctx.commit_sec)
+        finally:
+            self.sizer.release(raw)
+        ctx.info("Батч #%d загружен (%d строк)", ctx.batch_id, len(rows))
+
+    def _lane_stage(self, ctx: ExecutionContext) -> None:
+        """Поток-полоса: transform/validate и загрузка батча на соединении ctx.pg_conn."""
+        try:
+            while True:
+                raw = self._get(self.raw_queue)
+                if raw is _DONE:
+                    # маркер один на все полосы — возвращаем его остальным
+                    self._put(self.raw_queue, _DONE)
+                    return
+                with self._batch_lock:
+                    batch_ctx = ctx.for_batch(next(self._batch_ids))
+                # полосы коммитят не по порядку батчей: ключ источника и watermark
+                # закоммиченного батча не значат, что загружено всё до него
+                batch_ctx.last_source_key = None
+                batch_ctx.watermark = None
+                try:
+                    rows = self._process(batch_ctx, raw, self.transformers, self.validators)
+                except BaseException:
+                    self.sizer.release(raw)
+                    raise
+                if not rows:
+                    self.sizer.release(raw)
+                    if batch_ctx.metrics is not None:
+                        batch_ctx.metrics.batch_done(raw, rows)
+                    continue
+                self._load_batch(batch_ctx, rows, raw)
+        except BaseException as e:
+            logger.error("Ошибка в потоке загрузки %s: %s", self.table_cfg.source_table, e)
+            self._fail(e)
+
+    def _run_lanes(self, ctx: ExecutionContext) -> ExecutionContext:
+        from connectors.postgres_connector import PostgresConnector
+
+        self._batch_ids = itertools.count(ctx.batch_id)
+        fetch_thread = threading.Thread(
+            target=self._fetch_stage, args=(ctx,),
+            name=f"fetch-{self.table_cfg.source_table}", daemon=True
+        )
+        conns: List[PostgresConnector] = []
+        threads: List[threading.Thread] = []
+        try:
+            for _ in range(self.lanes):
+                conn = PostgresConnector()
+                conn.connect()
+                conns.append(conn)
+            # контексты полос — до старта выборки, которая сама меняет ctx (_begin)
+            lane_ctxs = []
+            for conn in conns:
+                lane_ctx = ctx.for_batch(ctx.batch_id)
+                lane_ctx.pg_conn = conn
+                lane_ctxs.append(lane_ctx)
+            fetch_thread.start()
+            for i, lane_ctx in enumerate(lane_ctxs):
+                thread = threading.Thread(
+                    target=self._lane_stage, args=(lane_ctx,),
+                    name=f"load-{self.table_cfg.source_table}-{i}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self._drain()
+            if fetch_thread.is_alive():
+                fetch_thread.join()
+            self._drain()
+            for conn in conns:
+                # незакоммиченный батч упавшей полосы откатывается
+                conn.conn.rollback()
+                conn.close()
+
+        if self._errors:
+            raise self._errors[0]
+        with self._batch_lock:
+            last_id = next(self._batch_ids) - 1
+        return ctx.for_batch(max(ctx.batch_id, last_id))
+
+    def run(self, ctx: ExecutionContext) -> ExecutionContext:
+        """
+        Прогоняет всю таблицу. Возвращает контекст последнего батча
+        (для finalize_table).
+        """
+        if self.lanes > 1:
+            return self._run_lanes(ctx)
+        # transform идёт параллельно загрузке — lookup-ам своё соединение
+        with ctx.pg_conn.separate_lookups():
+            return self._run_stages(ctx)
+
+    def _run_stages(self, ctx: ExecutionContext) -> ExecutionContext:
+        fetch_thread = threading.Thread(
+            target=self._fetch_stage, args=(ctx,),
+            name=f"fetch-{self.table_cfg.source_table}", daemon=True
+        )
+        load_thread = threading.Thread(
+            target=self._load_stage,
+            name=f"load-{self.table_cfg.source_table}", daemon=True
+        )
+        fetch_thread.start()
+        load_thread.start()
+
+        batch_id = ctx.batch_id
+        last_ctx = ctx
+        try:
+            while True:
+                raw = self._get(self.raw_queue)
+                if raw is _DONE:
+                    break
+                last_ctx = ctx.for_batch(batch_id)
+                last_ctx.last_source_key = batch_source_key(self.table_cfg, raw)
+                try:
+                    rows = self._process(last_ctx, raw, self.transformers, self.validators)
+                except BaseException:
+                    self.sizer.release(raw)
+                    raise
+                if not rows:
+                    self.sizer.release(raw)
+                    if last_ctx.metrics is not None:
+                        last_ctx.metrics.batch_done(raw, rows)
+                    continue
+                if not self._put(self.load_queue, (last_ctx, rows, raw)):
+                    self.sizer.release(raw)
+                    break
+                batch_id += 1
+        except BaseException as e:
+            logger.error("Ошибка в transform-этапе %s: %s", self.table_cfg.source_table, e)
+            self._fail(e)
+        finally:
+            self._put(self.load_queue, _DONE)
+            load_thread.join()
+            # fetch-поток может висеть на полной очереди — стоп-событие его освободит
+            if self._errors:
+                self._stop.set()
+            # а освобождённый бюджет — от ожидания резерва под следующий батч
+            self._drain()
+            fetch_thread.join()
+            self._drain()
+
+        if self._errors:
+            raise self._errors[0]
+        return last_ctx
@@ -0,0 +1,60 @@
+# core/watermark.py
+import logging
+from typing import Any, Optional
+
+from psycopg2 import sql
+
+from core.checkpoint import decode_key, encode_key
+
+logger = logging.getLogger(__name__)
+
+
+class WatermarkStore:
+    """
+    Контрольная таблица watermark'ов инкрементальной выборки в Postgres:
+    на каждую таблицу хранится последнее загруженное значение
+    (timestamp, SCN или монотонный ID) с сохранением типа.
+    """
+
+    def __init__(self, pg_conn, schema: str = "public", table: str = "etl_watermark"):
+        self.pg = pg_conn
+        self.ident = sql.Identifier(schema, table)
+
+    def ensure(self) -> None:
+        with self.pg.conn.cursor() as cur:
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {t} (
+                    table_key  text PRIMARY KEY,
+                    watermark  text,
+                    updated_at timestamptz NOT NULL DEFAULT now()
+                )
+            """).format(t=self.ident))
+        self.pg.conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self.pg.conn.cursor() as cur:
+            cur.execute(
+                sql.SQL("SELECT watermark FROM {t} WHERE table_key = %s").format(t=self.ident),
+                (key,)
+            )
+            row = cur.fetchone()
+        self.pg.conn.commit()
+        return decode_key(row[0]) if row else None
+
+    def set(self, key: str, value: Any, cur: Optional[Any] = None) -> None:
+        """
+        Сохраняет watermark. Если передан курсор — пишет в его транзакцию
+        (commit делает вызывающий), иначе коммитит сам.
+        """
+        query = sql.SQL("""
+            INSERT INTO {t} (table_key, watermark, updated_at)
+            VALUES (%s, %s, now())
+            ON CONFLICT (table_key) DO UPDATE
+               SET watermark = EXCLUDED.watermark, updated_at = now()
+        """).format(t=self.ident)
+        if cur is not None:
+            cur.execute(query, (key, encode_key(value)))
+            return
+        with self.pg.conn.cursor() as own:
+            own.execute(query, (key, encode_key(value)))
+        self.pg.conn.commit()
@@ -1,10 +1,11 @@
 # Complete setup_logging function with idempotence
 
 import os
-import yaml
 import logging
 from tqdm import tqdm
 
+from mappings.parser import load_raw_config
+
 # Цветовые коды для вывода в консоль
 COLORS = {
     'INFO': '\033[92m',
@@ -48,16 +49,13 @@ def setup_logging():
     if getattr(root, '_setup_done', False):
         return root
 
-    config_path = os.environ.get('ETL_CONFIG_PATH', 'config/config.yaml')
     log_file = 'data/etl_error.log'
     console_level = logging.INFO
     file_level = logging.ERROR
 
     # Читаем секцию global.logging из конфига, если есть
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            cfg = yaml.safe_load(f)
-        logging_cfg = cfg.get('global', {}).get('logging', {})
+        logging_cfg = load_raw_config().get('global', {}).get('logging', {}) or {}
         log_file = logging_cfg.get('log_file', log_file)
         console_level = getattr(
             logging,
@@ -1,9 +1,22 @@
 import os
+import hashlib
+import logging
+import pickle
+import stat
+import sys
+import threading
 import yaml
-from typing import List, Optional, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+import pydantic
 from pydantic import BaseModel, Field, field_validator, ValidationError, ConfigDict
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# libyaml в разы быстрее чистого Python на тысячах файлов таблиц
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 
 # Конфигурация логирования
@@ -12,7 +25,127 @@ class LoggingConfig(BaseModel):
     console_level: str = 'INFO'
     file_level: str = 'ERROR'
 
+# Адаптивный размер батча
+class AdaptiveBatchConfig(BaseModel):
+    min_size: int = Field(500, ge=1, description="Нижняя граница размера батча")
+    max_size: int = Field(50000, ge=1, description="Верхняя граница размера батча")
+    target_batch_seconds: float = Field(
+        2.0, gt=0,
+        description="Целевое время fetch + load одного батча"
+    )
+    max_batch_mb: float = Field(
+        64, gt=0,
+        description="Максимальный объём одного батча в памяти (МБ)"
+    )
+    memory_budget_mb: float = Field(
+        1024, ge=0,
+        description=(
+            "Общий бюджет памяти под буферы батчей (МБ), 0 — без ограничения; "
+            "при parallel_tables > 1 делится поровну между воркерами-процессами"
+        )
+    )
+    wait_timeout_sec: float = Field(
+        600, gt=0,
+        description="Сколько выборка ждёт освобождения бюджета, прежде чем прервать таблицу с ошибкой"
+    )
+
+# Синтетические данные для бенчмарка (connectors.synthetic_connector)
+class SyntheticColumnConfig(BaseModel):
+    name: str = Field(..., description="Имя колонки источника (как в MappingRule.source)")
+    type: Literal["seq", "int", "float", "decimal", "str", "date", "timestamp", "flag", "clob", "blob"] = Field(
+        "str",
+        description=(
+            "seq — возрастающий уникальный ключ; flag — 'Y'/'N'; "
+            "clob/blob — LOB размером lob_size"
+        )
+    )
+    null_ratio: Optional[float] = Field(None, ge=0, le=1, description="Доля NULL (по умолчанию из источника)")
+    length: Optional[int] = Field(None, ge=0, description="Длина строки для str")
+    lob_size: Optional[int] = Field(None, ge=0, description="Размер LOB в байтах/символах")
+    min_value: float = Field(0, description="Нижняя граница для int/float/decimal")
+    max_value: float = Field(1_000_000, description="Верхняя граница для int/float/decimal")
+
+class SyntheticSourceConfig(BaseModel):
+    rows: int = Field(100_000, ge=0, description="Сколько строк сгенерировать")
+    seed: int = Field(42, description="Seed генератора, одинаковые данные от запуска к запуску")
+    null_ratio: float = Field(0.0, ge=0, le=1, description="Доля NULL по умолчанию")
+    string_length: int = Field(20, ge=0, description="Длина строк по умолчанию")
+    lob_size: int = Field(4096, ge=0, description="Размер LOB по умолчанию")
+    pool_size: int = Field(
+        1024, ge=1,
+        description="Сколько разных строк генерируется заранее (дальше они повторяются, кроме seq)"
+    )
+    columns: Optional[List[SyntheticColumnConfig]] = Field(
+        None,
+        description="Колонки источника; не заданы — выводятся из mappings таблицы"
+    )
+
+# Метрики пайплайна
+class MetricsConfig(BaseModel):
+    textfile: Optional[str] = Field(
+        None,
+        description="Файл в формате Prometheus text (для textfile collector node_exporter)"
+    )
+    http_port: Optional[int] = Field(
+        None, ge=0, le=65535,
+        description="Порт локального HTTP-эндпоинта: /metrics (Prometheus) и /status (JSON)"
+    )
+    http_host: str = Field("127.0.0.1", description="Адрес HTTP-эндпоинта")
+    interval_sec: float = Field(10.0, gt=0, description="Период перезаписи textfile (сек)")
+    summary_path: Optional[str] = Field(
+        "metrics/summary.json",
+        description="JSON-сводка по таблицам в конце запуска, null — не писать"
+    )
+
+# Режим профилирования (--profile)
+class ProfileConfig(BaseModel):
+    out_dir: str = Field("profile", description="Папка для отчётов по таблицам (JSON и .pstats)")
+    memory: bool = Field(True, description="Учитывать аллокации и пик памяти через tracemalloc (медленнее)")
+    cprofile: bool = Field(False, description="Дополнительно писать дамп cProfile/pstats по каждой таблице")
+    top: int = Field(25, ge=1, description="Сколько самых дорогих вызовов выводить в лог")
+
+class AsyncEngineConfig(BaseModel):
+    max_tables: int = Field(4, ge=1, description="Сколько таблиц обрабатывается одновременно в одном event loop")
+    oracle_sessions: int = Field(4, ge=1, description="Максимум сессий асинхронного пула Oracle")
+    postgres_connections: int = Field(4, ge=1, description="Максимум соединений асинхронного пула Postgres (загрузка)")
+    chain_threads: int = Field(
+        4, ge=1,
+        description="Потоков для transform/validate (синхронные плагины и их lookup-запросы)"
+    )
+    fetcher_plugin: str = Field(
+        "async_default_fetcher",
+        description=(
+            "Асинхронный fetcher таблиц без своего fetcher_plugin; свой плагин таблицы "
+            "заменяется вариантом async_<имя>, без него запуск прерывается"
+        )
+    )
+    loader_plugin: str = Field(
+        "async_default_loader",
+        description=(
+            "Асинхронный loader таблиц без своего loader_plugin (как fetcher_plugin). "
+            "Не поддерживает adaptive_batch.memory_budget_mb, lob, defer_indexes и self_lookup"
+        )
+    )
+
 # Коннекторы
+class OraclePoolConfig(BaseModel):
+    min: int = Field(1, ge=0, description="Сессий в пуле сразу после создания")
+    max: int = Field(8, ge=1, description="Максимум сессий пула на процесс")
+    increment: int = Field(1, ge=1, description="На сколько сессий пул растёт за раз")
+    stmtcachesize: int = Field(50, ge=0, description="Размер кэша выражений на сессию")
+    timeout: int = Field(
+        0, ge=0,
+        description="Через сколько секунд простоя закрывать сессии сверх min (0 — не закрывать)"
+    )
+    wait_timeout: int = Field(
+        0, ge=0,
+        description="Сколько мс ждать свободную сессию при исчерпании пула (0 — без ограничения)"
+    )
+    ping_interval: int = Field(
+        60, ge=-1,
+        description="Проверять сессию при выдаче, если она простаивала дольше (сек), -1 — никогда"
+    )
+
 class OracleConnectorConfig(BaseModel):
     client_lib_dir: Optional[str]
     user: str
@@ -20,6 +153,34 @@ class OracleConnectorConfig(BaseModel):
     host: str
     port: Union[int, str]
     service_name: str
+    stmtcachesize: Optional[int] = Field(
+        None, ge=0,
+        description="Размер кэша выражений отдельного соединения (без пула)"
+    )
+    pool: Optional[OraclePoolConfig] = Field(
+        None,
+        description="Пул сессий oracledb.create_pool; не задан — отдельное соединение на коннектор"
+    )
+
+class PostgresPoolConfig(BaseModel):
+    min: int = Field(
+        1, ge=0,
+        description="Соединений полосы загрузки, которые пул держит открытыми (лишние закрываются при возврате)"
+    )
+    max: int = Field(4, ge=1, description="Максимум соединений полосы загрузки на процесс")
+    lookup_min: int = Field(
+        2, ge=0,
+        description="Соединений полосы lookup, открываемых сразу (возвращённые хранятся до lookup_max)"
+    )
+    lookup_max: int = Field(8, ge=1, description="Максимум соединений полосы lookup на процесс")
+    lookup_autocommit: bool = Field(
+        True,
+        description="Lookup-запросы в autocommit: не держат транзакцию и не ломают транзакцию загрузки"
+    )
+    wait_timeout: float = Field(
+        30, ge=0,
+        description="Секунд ожидания свободного соединения исчерпанного пула, 0 — без ограничения"
+    )
 
 class PostgresConnectorConfig(BaseModel):
     user: str
@@ -27,6 +188,10 @@ class PostgresConnectorConfig(BaseModel):
     host: str
     port: Union[int, str]
     database: str
+    pool: Optional[PostgresPoolConfig] = Field(
+        None,
+        description="Пул соединений psycopg2 с полосами load/lookup; не задан — одно соединение на коннектор"
+    )
 
 class ConnectorsConfig(BaseModel):
     oracle: OracleConnectorConfig
@@ -37,6 +202,9 @@ class LookupConfig(BaseModel):
     key_column: str
     value_column: Optional[str] = None
     on_missing: Optional[str] = None
+    # true — справочник читается в память целиком (COPY TO) один раз на таблицу
+    # вместо запроса на каждую строку/батч (core.lookup_cache)
+    preload: bool = False
 
 # Правила валидации
 class ValidationRule(BaseModel):
@@ -54,6 +222,145 @@ class ValidationRule(BaseModel):
         description="Что делать, если валидация не прошла: 'null', 'error', 'default:XYZ' и т.п."
     )
 
+# Параллельная выборка таблицы чанками
+class ChunkingConfig(BaseModel):
+    method: Literal["rowid", "pk", "hash"] = Field(
+        "rowid",
+        description=(
+            "Способ нарезки: rowid — диапазоны ROWID по экстентам, "
+            "pk — диапазоны числового ключа, hash — корзины ORA_HASH"
+        )
+    )
+    column: Optional[str] = Field(
+        None,
+        description="Колонка для pk/hash (для hash по умолчанию ROWID)"
+    )
+    chunks: int = Field(16, ge=1, description="На сколько чанков делить таблицу")
+    workers: int = Field(4, ge=1, description="Сколько сессий Oracle выбирают чанки параллельно")
+    split_factor: Optional[float] = Field(
+        3.0,
+        gt=1,
+        description=(
+            "Чанк, который выполняется дольше split_factor × медиана завершённых, "
+            "делится на ходу (только rowid/pk). None — не делить"
+        )
+    )
+    load_workers: int = Field(
+        1,
+        ge=1,
+        description=(
+            "Сколько потоков параллельно трансформируют и загружают батчи чанков, "
+            "каждый со своим соединением Postgres; 1 — один поток загрузки. "
+            "Больше 1 — только с fetcher_plugin: chunked_fetcher (батчи коммитятся "
+            "не по порядку, ключ чекпоинта и watermark не пишутся)"
+        )
+    )
+
+# Инкрементальная выборка по watermark
+class IncrementalConfig(BaseModel):
+    type: Literal["timestamp", "scn", "id"] = Field(
+        "timestamp",
+        description=(
+            "timestamp — колонка даты изменения; id — монотонно растущий ключ; "
+            "scn — ORA_ROWSCN строки (column не нужен)"
+        )
+    )
+    column: Optional[str] = Field(
+        None,
+        description="Колонка watermark в источнике (для timestamp/id)"
+    )
+    initial: Optional[str] = Field(
+        None,
+        description="Начальный watermark, если сохранённого ещё нет (ISO-дата, число или SCN)"
+    )
+    lookback: float = Field(
+        300, ge=0,
+        description=(
+            "timestamp: выборка начинается на lookback секунд раньше сохранённого watermark — "
+            "строки с тем же временем и из транзакций, закоммиченных позже (но не дольше "
+            "lookback), не теряются; повторно выбранные строки сливает upsert_loader"
+        )
+    )
+
+# LOB-колонки источника
+class LobConfig(BaseModel):
+    columns: Optional[List[str]] = Field(
+        None,
+        description="CLOB/NCLOB/BLOB-колонки источника; по умолчанию — из ALL_TAB_COLUMNS"
+    )
+    inline_max_bytes: int = Field(
+        64 * 1024,
+        ge=0,
+        description=(
+            "LOB не длиннее порога приходит в строке батча как str/bytes (без round-trip "
+            "на каждый LOB); длиннее — локатором и читается частями при загрузке. "
+            "Для CLOB — в символах. 0 — все LOB потоком"
+        )
+    )
+    chunk_size: int = Field(
+        1024 * 1024,
+        ge=1,
+        description="Размер части при потоковом чтении большого LOB"
+    )
+
+
+class UpsertConfig(BaseModel):
+    key_columns: Optional[List[str]] = Field(
+        None,
+        description="Колонки ключа слияния в приёмнике; по умолчанию — первичный ключ"
+    )
+    update_columns: Optional[List[str]] = Field(
+        None,
+        description="Обновляемые колонки; по умолчанию — все колонки батча, кроме ключа"
+    )
+    method: Literal["on_conflict", "merge"] = Field(
+        "on_conflict",
+        description=(
+            "on_conflict — INSERT ... ON CONFLICT (ключ) DO UPDATE (нужен уникальный индекс по ключу); "
+            "merge — MERGE (Postgres 15+, на старых версиях — on_conflict)"
+        )
+    )
+
+
+class SelfLookupConfig(BaseModel):
+    side_table: bool = Field(
+        True,
+        description=(
+            "true — ключи self-lookup пишутся в боковую таблицу etl_self_{target} и разрешаются "
+            "порционным UPDATE; false — временные колонки {target}_tmp в приёмнике"
+        )
+    )
+    row_key: Optional[List[str]] = Field(
+        None,
+        description="Ключ строки приёмника для боковой таблицы; по умолчанию — первичный ключ"
+    )
+    chunk_rows: int = Field(
+        50000,
+        ge=1,
+        description="Строк приёмника на один UPDATE (и одну транзакцию) при разрешении"
+    )
+    vacuum_every: int = Field(
+        10,
+        ge=0,
+        description="VACUUM приёмника каждые N порций UPDATE (0 — не делать)"
+    )
+
+
+class DeferIndexesConfig(BaseModel):
+    workers: int = Field(
+        4,
+        ge=1,
+        description="Сколько индексов строится одновременно (по соединению на индекс) после загрузки"
+    )
+    maintenance_work_mem: str = Field(
+        "1GB",
+        description="maintenance_work_mem соединений, которые строят индексы и проверяют FK"
+    )
+    foreign_keys: bool = Field(
+        True,
+        description="Снимать и внешние ключи приёмника (возвращаются NOT VALID + VALIDATE)"
+    )
+
 # Конфиг таблицы
 
 
@@ -109,6 +416,62 @@ class TableConfig(BaseModel):
         None,
         description="Дополнительное условие WHERE для SELECT-запроса"
     )
+    arraysize: Optional[int] = Field(
+        None, ge=1,
+        description="cursor.arraysize выборки (строк за round-trip); по умолчанию = batch_size"
+    )
+    prefetchrows: Optional[int] = Field(
+        None, ge=0,
+        description="cursor.prefetchrows выборки; по умолчанию — значение oracledb"
+    )
+    fetch_format: Literal["tuples", "arrow"] = Field(
+        "tuples",
+        description=(
+            "Формат колоночной выборки DefaultFetcher: tuples — кортежи курсора, "
+            "arrow — record batch'и Arrow (Connection.fetch_df_batches, нужен pyarrow)"
+        )
+    )
+    lob: Optional[LobConfig] = Field(
+        None,
+        description=(
+            "Выборка LOB: маленькие — в строке, большие — потоком из Oracle прямо в COPY. "
+            "Не задано — LOB приходят локаторами oracledb как есть"
+        )
+    )
+    chunking: Optional[ChunkingConfig] = Field(
+        None,
+        description="Настройки параллельной выборки чанками (ChunkedFetcher)"
+    )
+    upsert: Optional[UpsertConfig] = Field(
+        None,
+        description="Ключ и способ слияния для loader_plugin: upsert_loader (по умолчанию — PK и ON CONFLICT)"
+    )
+    self_lookup: Optional[SelfLookupConfig] = Field(
+        None,
+        description="Разрешение self-lookup после загрузки (по умолчанию — боковая таблица по PK)"
+    )
+    defer_indexes: Optional[DeferIndexesConfig] = Field(
+        None,
+        description=(
+            "Вторичные индексы и FK приёмника снимаются в pre_load и строятся заново "
+            "после загрузки (DefaultLoader и наследники); DDL хранится в etl_deferred_ddl"
+        )
+    )
+    incremental: Optional[IncrementalConfig] = Field(
+        None,
+        description="Настройки инкрементальной выборки (IncrementalFetcher)"
+    )
+    synthetic: Optional[SyntheticSourceConfig] = Field(
+        None,
+        description="Профиль синтетических данных таблицы для benchmark.py"
+    )
+    checkpoint_column: Optional[str] = Field(
+        None,
+        description=(
+            "Монотонный уникальный ключ источника для чекпоинтов: выборка идёт "
+            "ORDER BY этой колонке, а --resume продолжает после последнего ключа"
+        )
+    )
     transform_override: bool = Field(
         False,
         description=(
@@ -142,6 +505,62 @@ class GlobalConfig(BaseModel):
 
     batch_size: int = Field(default=5000, ge=1)
 
+    adaptive_batch: Optional[AdaptiveBatchConfig] = Field(
+        default=None,
+        description=(
+            "Адаптивный размер батча по задержкам fetch/load и байтам на строку "
+            "под общим бюджетом памяти. Если не задан — фиксированный batch_size"
+        )
+    )
+
+    parallel_tables: int = Field(
+        default=1,
+        ge=1,
+        description=(
+            "Сколько таблиц обрабатывать одновременно (воркеры-процессы, "
+            "у каждого своя пара соединений). 1 — последовательная обработка."
+        )
+    )
+
+    execution_mode: Literal["serial", "staged", "async"] = Field(
+        default="serial",
+        description=(
+            "serial — fetch/transform/load по очереди; "
+            "staged — отдельные потоки fetch и load с ограниченными очередями батчей; "
+            "async — все таблицы в одном event loop (core.async_engine)"
+        )
+    )
+    async_engine: Optional[AsyncEngineConfig] = Field(
+        default=None,
+        description="Настройки execution_mode: async (пулы сессий, параллельность таблиц)"
+    )
+    queue_size: int = Field(
+        default=4,
+        ge=1,
+        description="Ёмкость очередей между этапами в режиме staged (в батчах)"
+    )
+
+    checkpoints: bool = Field(
+        default=False,
+        description=(
+            "Писать чекпоинты батчей в контрольную таблицу etl_checkpoint (Postgres). "
+            "Включается автоматически при запуске с --resume"
+        )
+    )
+
+    metrics: Optional[MetricsConfig] = Field(
+        default=None,
+        description="Метрики по этапам (fetch/transform/validate/load/commit); не задано — не собираются"
+    )
+
+    profile: Optional[ProfileConfig] = Field(
+        default=None,
+        description=(
+            "Профилирование вызовов плагинов и коннекторов по таблицам "
+            "(включается флагом --profile)"
+        )
+    )
+
     auto_mapping_plugin: str = Field(default="default_auto_mapping")
     fetcher_plugin:     str = Field(default="default_fetcher")
     transform_plugins:  List[str] = Field(
@@ -161,21 +580,237 @@ class GlobalConfig(BaseModel):
         description="Список файлов (имена *.yaml) из tables_folder в порядке обработки"
     )
 
+    config_cache: Optional[str] = Field(
+        default=None,
+        description=(
+            "Папка (относительно config_path.parent) для скомпилированного кэша table_files; "
+            "null — без кэша. Кэш — pickle: папка создаётся с правами 0700, "
+            "файл чужого владельца или доступный на запись другим не читается"
+        )
+    )
+    config_workers: int = Field(
+        default=0,
+        ge=0,
+        description="Процессов для разбора изменившихся table_files; 0 — по числу CPU"
+    )
+
 class Config(BaseModel):
     global_config: GlobalConfig = Field(...,alias="global", description="Конфиг главного файла")
     tables: List[TableConfig]
     model_config = ConfigDict(populate_by_name=True)
 
 
+# Сколько изменившихся файлов таблиц разбирать в одном процессе, прежде чем звать пул
+_PARALLEL_MIN_FILES = 200
+
+_RAW_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_RAW_LOCK = threading.Lock()
+_SCHEMA_KEY: Optional[str] = None
+
+
+def _read_yaml(path: Path) -> Any:
+    return yaml.load(path.read_text(encoding='utf-8'), Loader=_YamlLoader)
+
+
+def config_path(path: Optional[str] = None) -> Path:
+    """Путь к главному конфигу: явный или из ETL_CONFIG_PATH."""
+    return Path(path or os.environ.get('ETL_CONFIG_PATH', 'config/config.yaml'))
+
+
+def load_raw_config(path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Разобранный config.yaml без валидации — общий для логгера и коннекторов.
+    Файл читается один раз на процесс и перечитывается только при изменении.
+    Возвращаемый словарь общий: изменять его нельзя.
+    """
+    cfg_path = config_path(path)
+    st = cfg_path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = str(cfg_path.resolve())
+    with _RAW_LOCK:
+        cached = _RAW_CACHE.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    raw = _read_yaml(cfg_path) or {}
+    with _RAW_LOCK:
+        _RAW_CACHE[key] = (stamp, raw)
+    return raw
+
+
+def connector_settings(name: str, path: Optional[str] = None) -> Dict[str, Any]:
+    """Секция global.connectors.<name> главного конфига."""
+    return load_raw_config(path).get('global', {}).get('connectors', {}).get(name, {})
+
+
+def _schema_key() -> str:
+    """
+    Версия моделей: кэш таблиц сбрасывается при любом изменении этого модуля,
+    версии pydantic или Python (формат pickle моделей зависит от них).
+    """
+    global _SCHEMA_KEY
+    if _SCHEMA_KEY is None:
+        digest = hashlib.sha1(Path(__file__).read_bytes())
+        digest.update(f"pydantic={pydantic.VERSION};python={sys.version_info[:2]}".encode())
+        _SCHEMA_KEY = digest.hexdigest()
+    return _SCHEMA_KEY
+
+
+def _parse_table(file_name: str, data: bytes) -> TableConfig:
+    raw_tbl = yaml.load(data.decode('utf-8'), Loader=_YamlLoader)
+    try:
+        return TableConfig.model_validate(raw_tbl)
+    except ValidationError as e:
+        raise RuntimeError(f"Ошибка в файле {file_name}: {e}")
+
+
+def _parse_tables(items: List[Tuple[str, str]]) -> List[Tuple[str, Tuple[int, int], str, TableConfig]]:
+    """Разбор пачки файлов таблиц (в том числе в дочернем процессе): (имя, stat, sha1, TableConfig)."""
+    out = []
+    for file_name, table_path in items:
+        st = os.stat(table_path)
+        data = Path(table_path).read_bytes()
+        out.append((file_name, (st.st_mtime_ns, st.st_size), hashlib.sha1(data).hexdigest(),
+                    _parse_table(file_name, data)))
+    return out
+
+
+def _private(path: Path) -> bool:
+    """Файл и его папка принадлежат текущему пользователю и не доступны на запись другим."""
+    if not hasattr(os, "getuid"):
+        return True
+    for item in (path, path.parent):
+        st = item.stat()
+        if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return False
+    return True
+
+
+class _TableCache:
+    """
+    Скомпилированный кэш table_files: pickle уже провалидированных TableConfig
+    по абсолютному пути файла. Запись актуальна, если совпали mtime и размер,
+    а при их расхождении — sha1 содержимого (файл переписан без изменений).
+    """
+
+    def __init__(self, cache_file: Optional[Path]):
+        self.cache_file = cache_file
+        self.entries: Dict[str, Tuple[Tuple[int, int], str, bytes]] = {}
+        self.dirty = False
+        if cache_file is None or not cache_file.is_file():
+            return
+        try:
+            if not _private(cache_file):
+                logger.warning("Кэш конфигурации %s не свой или доступен на запись другим — "
+                               "не читается", cache_file)
+                return
+            with open(cache_file, 'rb') as f:
+                payload = pickle.load(f)
+            if payload.get("schema") == _schema_key():
+                self.entries = payload["files"]
+        except Exception as e:
+            logger.warning("Кэш конфигурации %s не прочитан, будет пересобран: %s", cache_file, e)
+
+    def get(self, table_path: str, stamp: Tuple[int, int]) -> Optional[TableConfig]:
+        entry = self.entries.get(table_path)
+        if entry is None:
+            return None
+        cached_stamp, digest, blob = entry
+        if cached_stamp != stamp:
+            if hashlib.sha1(Path(table_path).read_bytes()).hexdigest() != digest:
+                return None
+            self.entries[table_path] = (stamp, digest, blob)
+            self.dirty = True
+        try:
+            return pickle.loads(blob)
+        except Exception as e:
+            logger.warning("Запись кэша конфигурации для %s повреждена, файл будет разобран заново: %s",
+                           table_path, e)
+            del self.entries[table_path]
+            self.dirty = True
+            return None
+
+    def put(self, table_path: str, stamp: Tuple[int, int], digest: str, tbl_cfg: TableConfig) -> None:
+        self.entries[table_path] = (stamp, digest, pickle.dumps(tbl_cfg, pickle.HIGHEST_PROTOCOL))
+        self.dirty = True
+
+    def save(self, keep: List[str]) -> None:
+        if self.cache_file is None:
+            return
+        wanted = set(keep)
+        if set(self.entries) - wanted:
+            self.entries = {k: v for k, v in self.entries.items() if k in wanted}
+            self.dirty = True
+        if not self.dirty:
+            return
+        tmp = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        try:
+            self.cache_file.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+                pickle.dump({"schema": _schema_key(), "files": self.entries}, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            logger.warning("Не удалось сохранить кэш конфигурации %s: %s", self.cache_file, e)
+            tmp.unlink(missing_ok=True)
+
+
+def _load_tables(global_cfg: GlobalConfig, cfg_path: Path, tables_dir: Path) -> List[TableConfig]:
+    base = str(tables_dir.resolve())
+    paths: List[str] = []
+    stamps: List[Tuple[int, int]] = []
+    for file_name in global_cfg.table_files:
+        table_path = os.path.join(base, file_name)
+        try:
+            st = os.stat(table_path)
+        except FileNotFoundError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            raise FileNotFoundError(f"Файл описания таблицы не найден: {tables_dir / file_name}")
+        paths.append(table_path)
+        stamps.append((st.st_mtime_ns, st.st_size))
+
+    cache_file = None
+    if global_cfg.config_cache:
+        cache_file = cfg_path.parent / global_cfg.config_cache / f"{cfg_path.stem}.tables.pickle"
+    cache = _TableCache(cache_file)
+
+    tables: List[Optional[TableConfig]] = []
+    missing: List[int] = []
+    for idx, table_path in enumerate(paths):
+        tbl_cfg = cache.get(table_path, stamps[idx])
+        if tbl_cfg is None:
+            missing.append(idx)
+        tables.append(tbl_cfg)
+
+    if missing:
+        items = [(global_cfg.table_files[idx], paths[idx]) for idx in missing]
+        workers = global_cfg.config_workers or os.cpu_count() or 1
+        if workers > 1 and len(items) >= _PARALLEL_MIN_FILES:
+            chunk = max(1, len(items) // (workers * 4))
+            with ProcessPoolExecutor(workers) as pool:
+                parts = pool.map(_parse_tables, [items[i:i + chunk] for i in range(0, len(items), chunk)])
+                parsed = [item for part in parts for item in part]
+        else:
+            parsed = _parse_tables(items)
+        for idx, (_, stamp, digest, tbl_cfg) in zip(missing, parsed):
+            cache.put(paths[idx], stamp, digest, tbl_cfg)
+            tables[idx] = tbl_cfg
+        logger.debug("Разобрано файлов таблиц: %d из %d", len(missing), len(paths))
+
+    cache.save(paths)
+    return tables
+
+
 def load_config(path: Optional[str] = None) -> Config:
     """
     Загружает конфиг:
      1) главный файл config.yaml → GlobalConfig
-     2) из global.tables_folder и global.table_files читаем каждый файл в TableConfig
+     2) из global.tables_folder и global.table_files читаем каждый файл в TableConfig;
+        провалидированные таблицы кэшируются в global.config_cache, изменившиеся
+        файлы при большом их числе разбираются параллельно в config_workers процессах
     """
-    # 1) главный конфиг
-    config_path = Path(path or os.environ.get('ETL_CONFIG_PATH', 'config/config.yaml'))
-    raw = yaml.safe_load(config_path.read_text(encoding='utf-8'))
+    # 1) главный конфиг (общий разбор с логгером и коннекторами)
+    cfg_path = config_path(path)
+    raw = load_raw_config(str(cfg_path))
 
     try:
         global_cfg = GlobalConfig.model_validate(raw.get('global', {}))
@@ -183,21 +818,78 @@ def load_config(path: Optional[str] = None) -> Config:
         raise RuntimeError(f"Ошибка в секции [global] конфига: {e}")
 
     # 2) находим папку с таблицами
-    tables_dir = config_path.parent / global_cfg.tables_folder
+    tables_dir = cfg_path.parent / global_cfg.tables_folder
     if not tables_dir.is_dir():
         raise FileNotFoundError(f"Папка с таблицами не найдена: {tables_dir}")
 
-    # 3) читаем каждый файл из списка
-    tables: List[TableConfig] = []
-    for file_name in global_cfg.table_files:
-        table_path = tables_dir / file_name
-        if not table_path.is_file():
-            raise FileNotFoundError(f"Файл описания таблицы не найден: {table_path}")
-        raw_tbl = yaml.safe_load(table_path.read_text(encoding='utf-8'))
-        try:
-            tbl_cfg = TableConfig.model_validate(raw_tbl)
-        except ValidationError as e:
-            raise RuntimeError(f"Ошибка в файле {file_name}: {e}")
-        tables.append(tbl_cfg)
+    # 3) читаем каждый файл из списка (неизменившиеся — из скомпилированного кэша)
+    tables = _load_tables(global_cfg, cfg_path, tables_dir)
+    _check_oracle_pool(global_cfg, tables)
+    _check_postgres_pool(global_cfg, tables)
+    _check_load_workers(global_cfg, tables)
+    _check_incremental(global_cfg, tables)
 
     return Config(global_config=global_cfg, tables=tables)
+
+
+def _check_incremental(global_cfg: GlobalConfig, tables: List[TableConfig]) -> None:
+    """timestamp / scn выбирают изменённые и повторные строки — грузить их можно только слиянием."""
+    for tbl in tables:
+        if tbl.incremental is None or tbl.incremental.type == "id":
+            continue
+        loader = tbl.loader_plugin or global_cfg.loader_plugin
+        if loader != "upsert_loader":
+            raise RuntimeError(
+                f"Ошибка в конфиге таблицы {tbl.source_table}: incremental.type "
+                f"{tbl.incremental.type} требует loader_plugin: upsert_loader (сейчас {loader})"
+            )
+
+
+def _check_load_workers(global_cfg: GlobalConfig, tables: List[TableConfig]) -> None:
+    """
+    Полосы загрузки (load_workers > 1) коммитят батчи в порядке готовности, поэтому
+    годятся только для ChunkedFetcher, у которого нет продолжения по ключу.
+    """
+    for tbl in tables:
+        if tbl.chunking is None or tbl.chunking.load_workers <= 1:
+            continue
+        fetcher = tbl.fetcher_plugin or global_cfg.fetcher_plugin
+        if fetcher != "chunked_fetcher":
+            raise RuntimeError(
+                f"Ошибка в конфиге таблицы {tbl.source_table}: chunking.load_workers > 1 "
+                f"поддерживается только с fetcher_plugin: chunked_fetcher (сейчас {fetcher})"
+            )
+
+
+def _check_postgres_pool(global_cfg: GlobalConfig, tables: List[TableConfig]) -> None:
+    """
+    Полоса load пула Postgres должна вместить основное соединение таблицы
+    и по соединению на каждую полосу загрузки (chunking.load_workers).
+    """
+    pool = global_cfg.connectors.postgres.pool
+    if pool is None:
+        return
+    for tbl in tables:
+        if tbl.chunking is not None and pool.max < tbl.chunking.load_workers + 1:
+            raise RuntimeError(
+                f"Ошибка в конфиге таблицы {tbl.source_table}: chunking.load_workers="
+                f"{tbl.chunking.load_workers} требует connectors.postgres.pool.max не меньше "
+                f"{tbl.chunking.load_workers + 1} (сейчас {pool.max})"
+            )
+
+
+def _check_oracle_pool(global_cfg: GlobalConfig, tables: List[TableConfig]) -> None:
+    """
+    Пул сессий Oracle должен вместить воркеров ChunkedFetcher и основную сессию
+    таблицы: иначе лишние воркеры ждут сессию (или падают по wait_timeout).
+    """
+    pool = global_cfg.connectors.oracle.pool
+    if pool is None:
+        return
+    for tbl in tables:
+        if tbl.chunking is not None and pool.max < tbl.chunking.workers + 1:
+            raise RuntimeError(
+                f"Ошибка в конфиге таблицы {tbl.source_table}: chunking.workers={tbl.chunking.workers} "
+                f"требует connectors.oracle.pool.max не меньше {tbl.chunking.workers + 1} "
+                f"(сейчас {pool.max})"
+            )
@@ -3,133 +3,298 @@ import os
 import sys
 import logging
 import argparse
+import asyncio
+import time
+from functools import partial
+from typing import List, Optional
 
 from logger import setup_logging
-from mappings.parser import load_config, Config
+from mappings.parser import load_config, Config, ProfileConfig, TableConfig
 from connectors.oracle_connector import OracleConnector
 from connectors.postgres_connector import PostgresConnector
 from core import get_plugin
 from core import ExecutionContext
+from core.batch_sizer import AdaptiveBatchSizer, budget_bytes, get_memory_budget
+from core.metrics import MetricsExporter, get_metrics
+from core.profiler import Profiler
+from core.checkpoint import attach_checkpoints, batch_source_key, table_key
+from core.row_plan import benchmark_row_plan, compile_row_plan
+from core.chain import batch_capable, process_batch, process_columns, process_rows
+from core.staged import StagedExecutor
 from plugin_interfaces.auto_mapping_interface import AutoMappingPlugin
 from plugin_interfaces.fetcher_interface import FetcherPlugin
 from plugin_interfaces.transform_interface import TransformPlugin
+from plugin_interfaces.validation_interface import ValidationPlugin
 from datetime import datetime
 
-def run_pipeline(cfg: Config):
-
-    setup_logging()
+def process_table(
+    cfg: Config,
+    table_cfg: TableConfig,
+    ora_conn: OracleConnector,
+    pg_conn: PostgresConnector,
+    auto_mapper: Optional[AutoMappingPlugin] = None,
+    global_transformers: Optional[List[TransformPlugin]] = None,
+    global_validators: Optional[List[ValidationPlugin]] = None,
+    resume: bool = False,
+) -> None:
+    """
+    Полный цикл обработки одной таблицы:
+    auto-mapping → fetch → transform → validate → load_batch → finalize_table.
+    Используется как последовательным пайплайном, так и воркерами планировщика.
+    При resume=True завершённые таблицы пропускаются, а частично загруженные
+    продолжаются с последнего закоммиченного ключа без TRUNCATE.
+    """
     logger = logging.getLogger(__name__)
 
-    logger.debug("Запущен пайплайн с конфигом: %s", cfg)
-
-    with OracleConnector() as ora_conn, PostgresConnector() as pg_conn:
-        # 1) Auto-mapper
+    if auto_mapper is None:
         AutoMapCls = get_plugin(cfg.global_config.auto_mapping_plugin, 'auto_mapping')
         auto_mapper = AutoMapCls(pg_conn)
-
-        default_fetcher_name = cfg.global_config.fetcher_plugin
-
+    if global_transformers is None:
         global_transformers = [
             get_plugin(name, 'transform')() for name in cfg.global_config.transform_plugins
         ]
+    if global_validators is None:
         global_validators = [
             get_plugin(name, 'validation')() for name in cfg.global_config.validation_plugins
         ]
 
-        for table_cfg in cfg.tables:
-            table_start = datetime.now()
+    table_start = datetime.now()
 
-            batch_size = cfg.global_config.batch_size
-            batch_id = 0
-            buffer = []
+    batch_size = cfg.global_config.batch_size
+    batch_id = 0
 
-            # Новый контекст для таблицы и первого батча
-            ctx = ExecutionContext(table_cfg, batch_id, ora_conn, pg_conn)
-            ctx.header(table_cfg.target_table, table_cfg.source_table)
-            logger.info("Начало обработки %s", table_start)
-            # 1.1) Auto-mapping
-            auto_mapper.apply(ctx, table_cfg)
+    # Новый контекст для таблицы и первого батча
+    ctx = ExecutionContext(table_cfg, batch_id, ora_conn, pg_conn)
+    ctx.header(table_cfg.target_table, table_cfg.source_table)
+    logger.info("Начало обработки %s", table_start)
 
-            # 2) Fetcher для таблицы
-            fetcher_name = table_cfg.fetcher_plugin or default_fetcher_name
-            fetcher = get_plugin(fetcher_name, 'fetcher')()
+    # 1.0) Чекпоинты и продолжение прерванной загрузки
+    checkpoints = None
+    cp_key = table_key(table_cfg)
+    if cfg.global_config.checkpoints or resume:
+        ctx = attach_checkpoints(ctx, pg_conn, resume)
+        if ctx is None:
+            return
+        batch_id = ctx.batch_id
+        checkpoints = ctx.checkpoint
 
-            # 3) Трансформеры и валидаторы
-            if table_cfg.transform_override:
-                transformers = [ get_plugin(n,'transform')() for n in (table_cfg.transform_plugins or []) ]
-            else:
-                transformers = global_transformers + [ get_plugin(n,'transform')() for n in (table_cfg.transform_plugins or []) ]
-            validators = global_validators
+    # 1.0.1) Метрики по этапам
+    if cfg.global_config.metrics is not None:
+        ctx.metrics = get_metrics().table(cp_key)
+
+    # 1.0.2) Профилирование: вызовы плагинов и коннекторов таблицы оборачиваются замерами
+    profiler = None
+    if cfg.global_config.profile is not None:
+        profiler = Profiler(cfg.global_config.profile, cp_key).start()
+        ora_conn = ctx.ora_conn = profiler.wrap(ora_conn, "connector")
+        pg_conn = ctx.pg_conn = profiler.wrap(pg_conn, "connector")
+        auto_mapper = profiler.wrap(auto_mapper, "auto_mapping")
+
+    try:
+        # 1.1) Auto-mapping
+        auto_mapper.apply(ctx, table_cfg)
+        # 1.2) Компиляция плана transform/validation под итоговые mappings
+        compile_row_plan(table_cfg)
+
+        # 2) Fetcher для таблицы
+        fetcher_name = table_cfg.fetcher_plugin or cfg.global_config.fetcher_plugin
+        fetcher = get_plugin(fetcher_name, 'fetcher')()
 
-            # 4) Loader для таблицы
-            loader_name = cfg.global_config.loader_plugin
-            loader = get_plugin(loader_name, 'loader')()
+        # 3) Трансформеры и валидаторы
+        if table_cfg.transform_override:
+            transformers = [ get_plugin(n,'transform')() for n in (table_cfg.transform_plugins or []) ]
+        else:
+            transformers = global_transformers + [ get_plugin(n,'transform')() for n in (table_cfg.transform_plugins or []) ]
+        validators = global_validators
 
-            # 4.1) Создаём tmp-поля и т.п.
+        # 4) Loader для таблицы
+        loader_name = table_cfg.loader_plugin or cfg.global_config.loader_plugin
+        loader = get_plugin(loader_name, 'loader')()
+
+        if profiler is not None:
+            fetcher = profiler.wrap(fetcher, "fetcher")
+            transformers = [profiler.wrap(t, "transform") for t in transformers]
+            validators = [profiler.wrap(v, "validation") for v in validators]
+            loader = profiler.wrap(loader, "loader")
+
+        # 4.1) Создаём tmp-поля и т.п.
+        # при ошибке loader возвращает снятое в pre_load (индексы, FK)
+        try:
             loader.pre_load(ctx, batch_id)
 
-            # 5) Основной цикл – fetch → transform → validate → buffer → load_batch
-            for raw in fetcher.fetch(ctx, batch_size):
-                rec = raw
-                for tr in transformers:
-                    rec = tr.transform(ctx, rec)
-                ctx.debug(f"Строка преобразована {rec}")
-                skip = False
-                for v in validators:
-                    rec = v.validate(ctx, rec)
-                    if rec.get('_skip'):
-                        ctx.info("Строка пропущена по валидации")
-                        skip = True
-                        break
-                if skip:
-                    continue
-
-                buffer.append(rec)
-
-                # как только накопили batch_size → грузим
-                if len(buffer) >= batch_size:
-                    # вызываем finalize_batch у трансформеров
-                    for tr in transformers:
-                        fin = getattr(tr, "finalize_batch", None)
-                        if callable(fin):
-                            tr.finalize_batch(ctx)
-
-                    # собственно загрузка
-                    loader.load_batch(ctx, buffer)
-
-                    ctx.info("Батч #%d загружен (%d строк)", batch_id, len(buffer))
-                    buffer.clear()
-
-                    # следующий батч
-                    batch_id += 1
-                    ctx = ExecutionContext(table_cfg, batch_id, ora_conn, pg_conn)
-
-            # 6) Остаток после всех fetch’ей
-            if buffer:
-                for tr in transformers:
-                    fin = getattr(tr, "finalize_batch", None)
-                    if callable(fin):
-                        tr.finalize_batch(ctx)
-
-                loader.load_batch(ctx, buffer)
-                if batch_id == 0:
-                    ctx.info("Данные загружены (%d строк)",  len(buffer))
+            # 5) Основной цикл – fetch → transform → validate → load_batch
+            sizer = AdaptiveBatchSizer(cfg.global_config.adaptive_batch, batch_size)
+            # чанки ChunkedFetcher трансформируются и грузятся несколькими потоками
+            lanes = table_cfg.chunking.load_workers if table_cfg.chunking is not None else 1
+            if cfg.global_config.execution_mode == "staged" or lanes > 1:
+                # fetch, transform и load работают параллельно через ограниченные очереди
+                executor = StagedExecutor(
+                    table_cfg, ora_conn, pg_conn,
+                    fetcher, transformers, validators, loader,
+                    batch_size, cfg.global_config.queue_size, sizer, lanes
+                )
+                ctx = executor.run(ctx)
+            else:
+                # колоночный путь, если его поддерживают все плагины цепочки;
+                # fetcher с supports_tuples отдаёт колоночные батчи прямо из кортежей курсора
+                # а loader с supports_columns получает батч целиком, без сборки строк
+                columnar = batch_capable(transformers, validators)
+                load = loader.load_batch
+                if columnar and getattr(fetcher, "supports_tuples", False):
+                    process = process_columns
+                    if getattr(loader, "supports_columns", False):
+                        process = partial(process_columns, as_batch=True)
+                        load = loader.load_columns
+                    raw_batches = sizer.column_batches(fetcher.fetch_batches(ctx, sizer.current_size))
                 else:
-                    ctx.info("Остаток батча #%d загружен (%d строк)", batch_id, len(buffer))
-                buffer.clear()
+                    process = process_batch if columnar else process_rows
+                    raw_batches = sizer.batches(fetcher.fetch(ctx, batch_size))
+                for raw_batch in raw_batches:
+                    try:
+                        if batch_id > ctx.batch_id:
+                            ctx = ctx.for_batch(batch_id)
+                        ctx.last_source_key = batch_source_key(table_cfg, raw_batch)
+                        rows = process(ctx, raw_batch, transformers, validators)
+                        if not rows:
+                            if ctx.metrics is not None:
+                                ctx.metrics.batch_done(raw_batch, rows)
+                            continue
+                        load_started = time.perf_counter()
+                        load(ctx, rows)
+                        load_sec = time.perf_counter() - load_started
+                        sizer.observe(raw_batch, load_sec)
+                        if ctx.metrics is not None:
+                            ctx.metrics.batch_done(raw_batch, rows, load_sec, ctx.commit_sec)
+                        ctx.info("Батч #%d загружен (%d строк)", batch_id, len(rows))
+                        batch_id += 1
+                    finally:
+                        sizer.release(raw_batch)
 
             # 7) Финальная донастройка таблицы (UPDATE … и удаление tmp-полей)
             loader.finalize_table(ctx)
-            table_end = datetime.now()
-            duration = table_end - table_start
-            ctx.info("Таблица %s обработана", table_cfg.source_table)
-            logger.info("Обработка таблицы %s закончена в %s, за %s",
-                        table_cfg.source_table, table_end, duration)
+        except Exception:
+            try:
+                loader.abort_table(ctx)
+            except Exception as e:
+                ctx.error("Ошибка отката загрузки таблицы %s: %s", table_cfg.target_table, e)
+            raise
+        except BaseException:
+            # Ctrl-C / завершение процесса: без долгого abort_table (перестройки индексов и FK) —
+            # только откат, снятые объекты остаются в etl_deferred_ddl до следующего запуска
+            try:
+                ctx.pg_conn.conn.rollback()
+            except Exception as e:
+                ctx.error("Ошибка отката транзакции таблицы %s: %s", table_cfg.target_table, e)
+            if table_cfg.defer_indexes is not None:
+                ctx.warning("Загрузка %s прервана: индексы и FK восстановятся следующим запуском "
+                            "(etl_deferred_ddl)", table_cfg.target_table)
+            raise
+        # fetcher может зафиксировать своё состояние (например, watermark) после загрузки
+        fetcher_fin = getattr(fetcher, "finalize_table", None)
+        if callable(fetcher_fin):
+            fetcher_fin(ctx)
+        if checkpoints is not None:
+            checkpoints.finish(cp_key)
+        if ctx.metrics is not None:
+            ctx.metrics.finish()
+        table_end = datetime.now()
+        duration = table_end - table_start
+        ctx.info("Таблица %s обработана", table_cfg.source_table)
+        logger.info("Обработка таблицы %s закончена в %s, за %s",
+                    table_cfg.source_table, table_end, duration)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+
+def run_pipeline(cfg: Config, resume: bool = False):
+
+    setup_logging()
+    logger = logging.getLogger(__name__)
 
-    ctx.info("Pipeline успешно завершён")
+    logger.debug("Запущен пайплайн с конфигом: %s", cfg)
+
+    # Общий бюджет памяти под буферы батчей (в каждом процессе свой)
+    if cfg.global_config.adaptive_batch is not None:
+        get_memory_budget().configure(budget_bytes(cfg.global_config.adaptive_batch))
+
+    # Экспорт метрик (textfile / HTTP) на время запуска, сводка — в конце
+    exporter = None
+    if cfg.global_config.metrics is not None:
+        exporter = MetricsExporter(cfg.global_config.metrics).start()
+    try:
+        _run_tables(cfg, resume)
+    except BaseException:
+        get_metrics().mark_failed()
+        raise
+    finally:
+        if exporter is not None:
+            exporter.stop()
 
+    logger.info("Pipeline успешно завершён")
 
 
+def _run_tables(cfg: Config, resume: bool = False) -> None:
+    # Асинхронный режим: все таблицы в одном event loop на пулах Oracle/Postgres
+    if cfg.global_config.execution_mode == "async":
+        from core.async_engine import run_pipeline_async
+        asyncio.run(run_pipeline_async(cfg, resume))
+        return
+
+    # Параллельный режим: таблицы раздаются воркерам-процессам с учётом зависимостей
+    if cfg.global_config.parallel_tables > 1 and len(cfg.tables) > 1:
+        from core.scheduler import TableScheduler
+        TableScheduler(cfg, cfg.global_config.parallel_tables, resume).run()
+        return
+
+    with OracleConnector() as ora_conn, PostgresConnector() as pg_conn:
+        # 1) Auto-mapper
+        AutoMapCls = get_plugin(cfg.global_config.auto_mapping_plugin, 'auto_mapping')
+        auto_mapper = AutoMapCls(pg_conn)
+
+        global_transformers = [
+            get_plugin(name, 'transform')() for name in cfg.global_config.transform_plugins
+        ]
+        global_validators = [
+            get_plugin(name, 'validation')() for name in cfg.global_config.validation_plugins
+        ]
+
+        for table_cfg in cfg.tables:
+            process_table(
+                cfg, table_cfg, ora_conn, pg_conn,
+                auto_mapper, global_transformers, global_validators,
+                resume=resume
+            )
+
+
+
+
+
+def run_plan_benchmark(cfg: Config, sample_rows: int, repeat: int = 3) -> List[dict]:
+    """
+    Режим бенчмарка плана: для каждой таблицы выбирает первые sample_rows строк
+    и сравнивает интерпретируемый transform/validate со скомпилированным планом.
+    Ничего не загружает в Postgres.
+    """
+    setup_logging()
+    results = []
+    with OracleConnector() as ora_conn, PostgresConnector() as pg_conn:
+        AutoMapCls = get_plugin(cfg.global_config.auto_mapping_plugin, 'auto_mapping')
+        auto_mapper = AutoMapCls(pg_conn)
+        for table_cfg in cfg.tables:
+            ctx = ExecutionContext(table_cfg, 0, ora_conn, pg_conn)
+            auto_mapper.apply(ctx, table_cfg)
+            fetcher_name = table_cfg.fetcher_plugin or cfg.global_config.fetcher_plugin
+            fetcher = get_plugin(fetcher_name, 'fetcher')()
+            rows = []
+            for raw in fetcher.fetch(ctx, min(sample_rows, cfg.global_config.batch_size)):
+                rows.append(raw)
+                if len(rows) >= sample_rows:
+                    break
+            result = benchmark_row_plan(ctx, rows, repeat)
+            result["table"] = table_cfg.target_table
+            results.append(result)
+    return results
 
 
 def main():
@@ -139,12 +304,39 @@ def main():
         default="config/config.yaml",
         help="Путь до главного конфигурационного файла"
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Продолжить прерванную загрузку по чекпоинтам"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Профилировать вызовы плагинов и коннекторов (время, CPU, память по таблицам)"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=None,
+        help="Папка для отчётов профилирования (по умолчанию global.profile.out_dir или ./profile)"
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="Вместе с --profile писать дамп cProfile/pstats по каждой таблице"
+    )
     args = parser.parse_args()
 
     os.environ["ETL_CONFIG_PATH"] = args.config
     cfg = load_config(args.config)
+    if args.profile:
+        profile = cfg.global_config.profile or ProfileConfig()
+        if args.profile_dir:
+            profile.out_dir = args.profile_dir
+        if args.cprofile:
+            profile.cprofile = True
+        cfg.global_config.profile = profile
     try:
-        run_pipeline(cfg)
+        run_pipeline(cfg, resume=args.resume)
     except Exception as e:
         logging.error("Фатальная ошибка пайплайна: %s", e)
         sys.exit(1)
@@ -3,5 +3,7 @@ from .fetcher_interface import FetcherPlugin
 from .auto_mapping_interface import AutoMappingPlugin
 from .validation_interface import ValidationPlugin
 from .loader_interface import LoaderPlugin
+from .async_fetcher_interface import AsyncFetcherPlugin
+from .async_loader_interface import AsyncLoaderPlugin
 
 __all__ = ['TransformPlugin', 'FetcherPlugin', 'AutoMappingPlugin', 'ValidationPlugin']
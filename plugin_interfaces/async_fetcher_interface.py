@@ -0,0 +1,26 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core import ExecutionContext
+    from core.batch import ColumnBatch
+
+class AsyncFetcherPlugin(ABC):
+    """
+    Асинхронный fetcher для execution_mode: async.
+    ctx.ora_conn — AsyncOracleConnector (сессия из асинхронного пула).
+    """
+
+    class_name: str
+
+    @abstractmethod
+    def fetch_batches(
+        self,
+        ctx: "ExecutionContext",
+        batch_size: Union[int, Callable[[], int]]
+    ) -> AsyncIterator["ColumnBatch"]:
+        """
+        Асинхронный итератор колоночных батчей таблицы.
+        :param batch_size: размер батча или функция, возвращающая текущий размер
+        """
+        ...
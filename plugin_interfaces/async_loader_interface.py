@@ -0,0 +1,29 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core import ExecutionContext
+
+class AsyncLoaderPlugin(ABC):
+    """
+    Асинхронный loader для execution_mode: async.
+    ctx.pg_async — AsyncPostgresConnector (соединение из асинхронного пула),
+    ctx.pg_conn — синхронный PostgresConnector для lookup-ов и чекпоинтов.
+    """
+
+    @abstractmethod
+    async def pre_load(self, ctx: "ExecutionContext", batch_id: int = 0) -> None:
+        """Вызывается один раз перед загрузкой первой порции данных для таблицы."""
+        ...
+
+    @abstractmethod
+    async def load_batch(self,
+                         ctx: "ExecutionContext",
+                         rows: List[Dict[str, Any]]) -> None:
+        """Загрузка одной порции данных; чекпоинт батча — в той же транзакции."""
+        ...
+
+    @abstractmethod
+    async def finalize_table(self, ctx: "ExecutionContext") -> None:
+        """Вызывается после загрузки всех батчей."""
+        ...
@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Iterator, Optional, TYPE_CHECKING
+from typing import Callable, Iterator, Optional, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from core import ExecutionContext
+    from core.batch import ColumnBatch
     from connectors.base import BaseConnector
 
 class FetcherPlugin(ABC):
@@ -16,6 +17,9 @@ class FetcherPlugin(ABC):
     # Уникальное имя плагина, совпадает с классом
     class_name: str
 
+    # True, если плагин реализует fetch_batches (колоночные батчи из кортежей курсора)
+    supports_tuples: bool = False
+
     @abstractmethod
     def fetch(
         self,
@@ -31,3 +35,15 @@ class FetcherPlugin(ABC):
         :return: итератор словарей (каждая запись – dict)
         """
         pass
+
+    def fetch_batches(
+        self,
+        ctx: "ExecutionContext",
+        batch_size: Union[int, Callable[[], int]]
+    ) -> Iterator["ColumnBatch"]:
+        """
+        Выборка колоночными батчами прямо из кортежей курсора, без словаря на строку.
+        Вызывается, только если supports_tuples = True.
+        :param batch_size: размер батча или функция, возвращающая текущий размер
+        """
+        raise NotImplementedError
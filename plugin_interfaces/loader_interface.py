@@ -3,9 +3,13 @@ from typing import List, Dict, Any, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from core import ExecutionContext
+    from core.batch import ColumnBatch
 
 class LoaderPlugin(ABC):
 
+    # True, если плагин реализует load_columns (загрузка колоночного батча без строк-словарей)
+    supports_columns: bool = False
+
     @abstractmethod
     def pre_load(self, ctx: "ExecutionContext", batch_id: int = 0) -> None:
         """
@@ -29,3 +33,20 @@ class LoaderPlugin(ABC):
         Вызывается после загрузки всех батчей. Тут мы делаем UPDATE … и удаляем tmp-колонки.
         """
         ...
+
+    def load_columns(self,
+                     ctx: "ExecutionContext",
+                     batch: "ColumnBatch") -> None:
+        """
+        Загрузка колоночного батча (без пропущенных строк) — например, колонок Arrow.
+        Вызывается, только если supports_columns = True.
+        """
+        raise NotImplementedError
+
+    def abort_table(self, ctx: "ExecutionContext") -> None:
+        """
+        Вызывается, если загрузка таблицы прервана ошибкой (после pre_load).
+        Здесь можно вернуть то, что pre_load снял с таблицы (индексы, FK).
+        При KeyboardInterrupt/SystemExit не вызывается — транзакция только откатывается.
+        """
+        pass
@@ -3,6 +3,7 @@ from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from core import ExecutionContext
+    from core.batch import ColumnBatch
 
 class TransformPlugin(ABC):
     """
@@ -10,6 +11,8 @@ class TransformPlugin(ABC):
     """
     # уникальное имя плагина
     class_name: str
+    # True, если плагин реализует колоночный transform_batch
+    supports_batch: bool = False
 
     @abstractmethod
     def transform(self, ctx: "ExecutionContext", row: dict) -> dict:
@@ -20,3 +23,11 @@ class TransformPlugin(ABC):
         :return: преобразованный row
         """
         ...
+
+    def transform_batch(self, ctx: "ExecutionContext", batch: "ColumnBatch") -> "ColumnBatch":
+        """
+        Необязательный колоночный вариант transform: получает весь батч
+        в виде колонок (list / np.ndarray) и возвращает преобразованный батч.
+        Пайплайн вызывает его, только если supports_batch=True у всех плагинов цепочки.
+        """
+        raise NotImplementedError
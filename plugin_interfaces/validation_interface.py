@@ -3,6 +3,7 @@ from typing import Dict, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from core import ExecutionContext
+    from core.batch import ColumnBatch
 
 class ValidationPlugin(ABC):
     """
@@ -10,6 +11,8 @@ class ValidationPlugin(ABC):
     (_skip=True), либо меняет поля по правилам, либо бросает ошибку.
     """
     class_name: str
+    # True, если плагин реализует колоночный validate_batch
+    supports_batch: bool = False
 
     @abstractmethod
     def validate(self, ctx: "ExecutionContext", row: Dict) -> Dict:
@@ -20,3 +23,10 @@ class ValidationPlugin(ABC):
                  либо изменённый (например row[field]=None), либо бросает ошибку.
         """
         pass
+
+    def validate_batch(self, ctx: "ExecutionContext", batch: "ColumnBatch") -> "ColumnBatch":
+        """
+        Необязательный колоночный вариант validate: проверяет колонки батча,
+        меняет значения и/или помечает строки в batch.skip, либо бросает ошибку.
+        """
+        raise NotImplementedError
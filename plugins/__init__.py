@@ -1 +1,7 @@
-from .directory_column_mapping import DirectoryMapping
+try:
+    from .directory_column_mapping import DirectoryMapping
+except ModuleNotFoundError as e:
+    # плагин автомаппинга поставляется отдельно — без него пакет остаётся рабочим
+    if e.name != f"{__name__}.directory_column_mapping":
+        raise
+    DirectoryMapping = None
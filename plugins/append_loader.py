@@ -0,0 +1,15 @@
+from core import register_loader
+from plugins import default_loader
+
+class_name = "AppendLoader"
+
+
+@register_loader
+class AppendLoader(default_loader.DefaultLoader):
+    """
+    Loader для дозагрузки (инкрементальная выборка): как DefaultLoader,
+    но без TRUNCATE перед первым батчем — строки добавляются к существующим.
+    Только для append-only источников с incremental.type: id — при timestamp/scn
+    изменённые строки вставляются повторно (для них — upsert_loader).
+    """
+    truncate_before_load = False
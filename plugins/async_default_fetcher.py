@@ -0,0 +1,43 @@
+import logging
+from typing import AsyncIterator, Callable, Union
+
+from core import ExecutionContext, register_async_fetcher
+from core.batch import ColumnBatch
+from plugin_interfaces.async_fetcher_interface import AsyncFetcherPlugin
+from plugins import default_fetcher
+
+class_name = "AsyncDefaultFetcher"
+
+@register_async_fetcher
+class AsyncDefaultFetcher(AsyncFetcherPlugin):
+    """
+    Асинхронный вариант DefaultFetcher: тот же SELECT (колонки, where, чекпоинты,
+    повтор без колонки при ORA-00904), выборка через AsyncOracleConnector.fetch_tuples.
+    """
+
+    def __init__(self):
+        self._sync = default_fetcher.DefaultFetcher()
+
+    async def fetch_batches(
+        self,
+        ctx: ExecutionContext,
+        batch_size: Union[int, Callable[[], int]]
+    ) -> AsyncIterator[ColumnBatch]:
+        size = batch_size() if callable(batch_size) else batch_size
+        options = self._sync._fetch_options(ctx, size)
+        plan = self._sync._plan(ctx)
+        attempt = 0
+        while True:
+            attempt += 1
+            query = plan.query()
+            logging.debug(f"Попытка {attempt}: {query}")
+            try:
+                async for index, rows in ctx.ora_conn.fetch_tuples(query, batch_size, params=plan.params, **options):
+                    yield ColumnBatch.from_tuples(index, rows)
+                return
+            except Exception as e:
+                retry = self._sync._retry_missing(plan, e)
+                if retry is None:
+                    raise
+                if not retry:
+                    return
@@ -0,0 +1,109 @@
+import time
+from typing import Any, Dict, List
+
+from core import ExecutionContext, register_async_loader
+from core.checkpoint import record_batch_async
+from core.copy_text import format_rows
+from plugin_interfaces.async_loader_interface import AsyncLoaderPlugin
+
+class_name = "AsyncDefaultLoader"
+
+
+def _ident(*parts: str) -> str:
+    return ".".join('"' + p.replace('"', '""') + '"' for p in parts)
+
+
+@register_async_loader
+class AsyncDefaultLoader(AsyncLoaderPlugin):
+    """
+    Асинхронный вариант DefaultLoader на asyncpg (ctx.pg_async):
+      1) pre_load — TRUNCATE перед первым батчем и tmp-колонки self-lookup;
+      2) load_batch — COPY в текстовом формате, чекпоинт в той же транзакции;
+      3) finalize_table — UPDATE … FROM … из tmp-колонок и их удаление.
+    """
+    truncate_before_load = True
+
+    def _self_rules(self, ctx: ExecutionContext):
+        tbl = ctx.table_cfg.target_table
+        return [r for r in ctx.table_cfg.mappings if r.lookup and r.lookup.table == tbl]
+
+    async def pre_load(self, ctx: ExecutionContext, batch_id: int = 0) -> None:
+        tbl = ctx.table_cfg.target_table
+        pg = ctx.pg_async
+        truncate_flag = batch_id == 0 and self.truncate_before_load
+        self_rules = self._self_rules(ctx)
+        if not self_rules and not truncate_flag:
+            return
+        async with pg.transaction():
+            if truncate_flag:
+                await pg.execute(f'TRUNCATE TABLE {_ident(tbl)} RESTART IDENTITY CASCADE')
+                ctx.info(f"Таблица {tbl} очищена перед вставкой данных.")
+            for rule in self_rules:
+                key_col = rule.lookup.key_column
+                rows = await pg.execute(
+                    """
+                    SELECT data_type
+                    FROM information_schema.columns
+                    WHERE table_schema = 'public'
+                      AND table_name = $1
+                      AND column_name = $2
+                    """,
+                    (tbl, key_col)
+                )
+                if not rows:
+                    ctx.error("Не нашёл информацию о колонке %s.%s", tbl, key_col)
+                    continue
+                data_type = rows[0][0]
+                tmp_col = f"{rule.target}_tmp"
+                await pg.execute(
+                    f"ALTER TABLE {_ident('public', tbl)} ADD COLUMN IF NOT EXISTS {_ident(tmp_col)} {data_type}"
+                )
+                ctx.info("Создана временная колонка %s.%s %s", tbl, tmp_col, data_type)
+
+    async def load_batch(self, ctx: ExecutionContext, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        tbl = ctx.table_cfg.target_table
+        pg = ctx.pg_async
+        columns = list(rows[0].keys())
+        data = format_rows([row.get(col) for col in columns] for row in rows).encode("utf-8")
+
+        tx = pg.transaction()
+        await tx.start()
+        try:
+            await pg.copy_text('public', tbl, columns, data)
+            # чекпоинт батча — в той же транзакции, что и данные
+            await record_batch_async(ctx, pg.conn, len(rows))
+        except BaseException:
+            await tx.rollback()
+            raise
+        started = time.perf_counter()
+        await tx.commit()
+        if ctx.metrics is not None:
+            ctx.commit_sec = time.perf_counter() - started
+        ctx.info("Загружен батч %d строк в %s", len(rows), tbl)
+
+    async def finalize_table(self, ctx: ExecutionContext) -> None:
+        tbl = ctx.table_cfg.target_table
+        pg = ctx.pg_async
+        self_rules = self._self_rules(ctx)
+        if not self_rules:
+            return
+        target = _ident('public', tbl)
+        async with pg.transaction():
+            for rule in self_rules:
+                src_tmp = f"{rule.target}_tmp"
+                lookup = rule.lookup.key_column
+                valcol = rule.lookup.value_column or lookup
+                await pg.execute(
+                    f"""
+                    UPDATE {target} AS target
+                    SET {_ident(rule.target)} = source.{_ident(valcol)}
+                    FROM {target} AS source
+                    WHERE target.{_ident(src_tmp)} = source.{_ident(lookup)}
+                      AND source.{_ident(valcol)} IS NOT NULL
+                    """
+                )
+                ctx.info("Self-lookup выполнен: %s ← %s via %s", rule.target, src_tmp, lookup)
+                await pg.execute(f"ALTER TABLE {target} DROP COLUMN IF EXISTS {_ident(src_tmp)}")
+                ctx.info("Удалена временная колонка %s.%s", tbl, src_tmp)
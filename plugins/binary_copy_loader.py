@@ -0,0 +1,84 @@
+import io
+import struct
+from typing import Any, Dict, List
+
+from psycopg2 import sql
+
+from core import register_loader
+from core import ExecutionContext
+from core.copy_binary import encoders_for, format_binary, unsupported
+from core.lob import has_streams
+from core.metrics import commit_batch
+from plugins import copy_loader
+
+class_name = "BinaryCopyLoader"
+
+
+@register_loader
+class BinaryCopyLoader(copy_loader.CopyLoader):
+    """
+    Loader на COPY ... FROM STDIN WITH (FORMAT binary): значения кодируются
+    по типам колонок приёмника (udt_name из information_schema) без форматирования
+    в текст и разбора на сервере (core.copy_binary).
+    Если у колонки нет бинарного кодировщика или значение не подходит к типу
+    колонки — батч грузится text COPY, как CopyLoader.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # target_table → {колонка: udt_name}
+        self._types: Dict[str, Dict[str, str]] = {}
+
+    def _column_types(self, ctx: ExecutionContext) -> Dict[str, str]:
+        tbl = self._target(ctx)
+        types = self._types.get(tbl)
+        if types is None:
+            # после pre_load: tmp-колонки self-lookup уже созданы
+            with ctx.pg_conn.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT column_name, udt_name
+                    FROM information_schema.columns
+                    WHERE table_schema = 'public'
+                      AND table_name = %s
+                    """,
+                    (tbl,)
+                )
+                types = dict(cur.fetchall())
+            self._types[tbl] = types
+        return types
+
+    def load_batch(self, ctx: ExecutionContext, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        side_rows = self._detach_self_lookup(ctx, rows)
+        columns = list(rows[0].keys())
+        if ctx.table_cfg.lob is not None and has_streams(rows):
+            self._copy_rows(ctx, rows, columns, side_rows)
+            return
+
+        types = self._column_types(ctx)
+        encoders = encoders_for(columns, types)
+        if encoders is None:
+            ctx.debug("Нет бинарного кодировщика для %s — text COPY", ", ".join(unsupported(columns, types)))
+            self._copy_text(ctx, rows, columns, side_rows)
+            return
+        try:
+            data = format_binary([[row.get(col) for col in columns] for row in rows], encoders)
+        except (TypeError, ValueError, OverflowError, struct.error) as e:
+            ctx.debug("Батч не кодируется в бинарный COPY (%s) — text COPY", e)
+            self._copy_text(ctx, rows, columns, side_rows)
+            return
+
+        tbl = self._target(ctx)
+        conn = ctx.pg_conn.conn
+        copy_sql = sql.SQL("COPY {t} ({cols}) FROM STDIN WITH (FORMAT binary)").format(
+            t=sql.Identifier('public', tbl),
+            cols=sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+        )
+        with conn.cursor() as cur:
+            cur.copy_expert(copy_sql.as_string(conn), io.BytesIO(data), size=256 * 1024)
+            # чекпоинт батча — в той же транзакции, что и данные
+            self._record_batch(ctx, cur, len(rows), side_rows)
+        commit_batch(ctx, conn)
+        ctx.info("Загружен батч %d строк в %s (binary COPY, %d байт)", len(rows), tbl, len(data))
@@ -0,0 +1,424 @@
+import logging
+import queue
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core import register_fetcher, ExecutionContext
+from connectors.oracle_connector import OracleConnector
+from plugin_interfaces.fetcher_interface import FetcherPlugin
+from mappings.parser import ChunkingConfig
+
+class_name = "ChunkedFetcher"
+
+logger = logging.getLogger(__name__)
+
+# Алфавит base64, которым Oracle кодирует extended ROWID (OOOOOOFFFBBBBBBRRR)
+_ROWID_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_ROWID_INDEX = {ch: i for i, ch in enumerate(_ROWID_ALPHABET)}
+_ROWID_MAX_ROW = 32767
+# Служебная колонка с ключом чанка (ROWID или pk), в выдачу не попадает
+_KEY_COL = "ETL$KEY"
+
+# Маркер завершения воркера в выходной очереди
+_DONE = object()
+
+
+def _b64(value: int, width: int) -> str:
+    chars = []
+    for _ in range(width):
+        chars.append(_ROWID_ALPHABET[value & 63])
+        value >>= 6
+    return "".join(reversed(chars))
+
+
+def encode_rowid(obj: int, fno: int, block: int, row: int) -> str:
+    """Собирает extended ROWID из номера объекта, файла, блока и строки."""
+    return _b64(obj, 6) + _b64(fno, 3) + _b64(block, 6) + _b64(row, 3)
+
+
+def decode_rowid(rowid: str) -> Tuple[int, int, int, int]:
+    """Разбирает extended ROWID на (data_object_id, relative_fno, block, row)."""
+    def num(part: str) -> int:
+        value = 0
+        for ch in part:
+            value = (value << 6) | _ROWID_INDEX[ch]
+        return value
+    return num(rowid[0:6]), num(rowid[6:9]), num(rowid[9:15]), num(rowid[15:18])
+
+
+class _Chunk:
+    """
+    Один диапазон выборки:
+      - pk:    lo..hi по ключу (lo_exclusive — нижняя граница не включается);
+      - rowid: lo..hi по ROWID + список экстентов (obj, fno, block_from, block_to)
+               для дробления на ходу;
+      - hash:  номер корзины ORA_HASH.
+    """
+    def __init__(self, lo: Any = None, hi: Any = None, lo_exclusive: bool = False,
+                 bucket: Optional[int] = None, extents: Optional[List[Tuple[int, int, int, int]]] = None):
+        self.lo = lo
+        self.hi = hi
+        self.lo_exclusive = lo_exclusive
+        self.bucket = bucket
+        self.extents = extents or []
+
+    def __repr__(self) -> str:
+        if self.bucket is not None:
+            return f"<bucket {self.bucket}>"
+        return f"<{'(' if self.lo_exclusive else '['}{self.lo}, {self.hi}]>"
+
+
+@register_fetcher
+class ChunkedFetcher(FetcherPlugin):
+    """
+    Параллельная выборка одной таблицы чанками (по аналогии с DBMS_PARALLEL_EXECUTE):
+      - rowid: диапазоны ROWID, собранные из DBA_EXTENTS;
+      - pk:    равные диапазоны числового ключа между MIN и MAX;
+      - hash:  корзины ORA_HASH(column|ROWID, chunks-1).
+    Каждый чанк выбирается в собственной сессии Oracle (workers потоков),
+    строки сливаются в один поток батчей, который разбирают chunking.load_workers
+    потоков transform/load, каждый со своим соединением Postgres
+    (при load_workers: 1 — как обычно, в режиме staged параллельно с выборкой).
+
+    Если чанк выполняется дольше split_factor × медиана уже завершённых,
+    а свободные воркеры простаивают, остаток чанка (после последнего
+    выбранного ключа/ROWID) делится пополам и раздаётся заново.
+    """
+    name = "ChunkedFetcher"
+
+    def __init__(self, additional_fields: dict = None):
+        self.additional_fields = additional_fields or {}
+        self._cond = threading.Condition()
+        self._pending: deque = deque()
+        self._active = 0
+        self._durations: List[float] = []
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    # ------------------------------------------------------------ колонки
+
+    def _probe_columns(self, ctx: ExecutionContext, cols: List[str]) -> List[str]:
+        """Проверяет список колонок пустым запросом, выкидывая отсутствующие (ORA-00904)."""
+        schema = ctx.table_cfg.source_schema
+        table = ctx.table_cfg.source_table
+        pattern = re.compile(r"ORA-00904: \"([^\"]+)\"")
+        cols = list(cols)
+        while cols:
+            try:
+                ctx.ora_conn.execute(f"SELECT {', '.join(cols)} FROM {schema}.{table} WHERE 1 = 0")
+                return cols
+            except Exception as e:
+                m = pattern.search(str(e))
+                if m and m.group(1) in cols:
+                    logging.warning(f"Поле '{m.group(1)}' отсутствует в Oracle и удалено из запроса")
+                    cols.remove(m.group(1))
+                    continue
+                raise
+        return cols
+
+    # ------------------------------------------------------------- нарезка
+
+    def _rowid_chunks(self, ctx: ExecutionContext, chunking: ChunkingConfig) -> List[_Chunk]:
+        rows = ctx.ora_conn.execute(
+            """
+            SELECT o.data_object_id, e.relative_fno, e.block_id, e.block_id + e.blocks - 1
+            FROM dba_extents e
+            JOIN dba_objects o
+              ON o.owner = e.owner
+             AND o.object_name = e.segment_name
+             AND NVL(o.subobject_name, '-') = NVL(e.partition_name, '-')
+            WHERE e.owner = :1 AND e.segment_name = :2
+              AND e.segment_type LIKE 'TABLE%'
+              AND o.data_object_id IS NOT NULL
+            ORDER BY o.data_object_id, e.relative_fno, e.block_id
+            """,
+            (ctx.table_cfg.source_schema.upper(), ctx.table_cfg.source_table.upper())
+        )
+        extents = [tuple(int(v) for v in r) for r in rows]
+        if not extents:
+            return []
+
+        total_blocks = sum(e[3] - e[2] + 1 for e in extents)
+        per_chunk = max(1, total_blocks // chunking.chunks)
+        chunks: List[_Chunk] = []
+        group: List[Tuple[int, int, int, int]] = []
+        blocks = 0
+        for ext in extents:
+            group.append(ext)
+            blocks += ext[3] - ext[2] + 1
+            if blocks >= per_chunk:
+                chunks.append(self._rowid_chunk(group))
+                group, blocks = [], 0
+        if group:
+            chunks.append(self._rowid_chunk(group))
+        return chunks
+
+    @staticmethod
+    def _rowid_chunk(extents: List[Tuple[int, int, int, int]], lo: Optional[str] = None) -> _Chunk:
+        first, last = extents[0], extents[-1]
+        hi = encode_rowid(last[0], last[1], last[3], _ROWID_MAX_ROW)
+        if lo is not None:
+            return _Chunk(lo, hi, lo_exclusive=True, extents=list(extents))
+        return _Chunk(encode_rowid(first[0], first[1], first[2], 0), hi, extents=list(extents))
+
+    def _pk_chunks(self, ctx: ExecutionContext, chunking: ChunkingConfig, where: str) -> List[_Chunk]:
+        col = chunking.column
+        res = ctx.ora_conn.execute(
+            f"SELECT MIN({col}), MAX({col}) FROM "
+            f"{ctx.table_cfg.source_schema}.{ctx.table_cfg.source_table}{where}"
+        )
+        lo, hi = res[0] if res else (None, None)
+        if lo is None:
+            return []
+        if isinstance(lo, float) or isinstance(hi, float):
+            lo, hi = Decimal(str(lo)), Decimal(str(hi))
+        step = (hi - lo) / chunking.chunks
+        if isinstance(lo, int) and isinstance(hi, int):
+            step = max(1, (hi - lo) // chunking.chunks)
+        chunks: List[_Chunk] = []
+        bound = lo
+        first = True
+        while step > 0 and bound + step < hi and len(chunks) < chunking.chunks - 1:
+            nxt = bound + step
+            chunks.append(_Chunk(bound, nxt, lo_exclusive=not first))
+            bound, first = nxt, False
+        chunks.append(_Chunk(bound, hi, lo_exclusive=not first))
+        return chunks
+
+    def _hash_chunks(self, chunking: ChunkingConfig) -> List[_Chunk]:
+        return [_Chunk(bucket=b) for b in range(chunking.chunks)]
+
+    # -------------------------------------------------------------- запросы
+
+    def _chunk_query(self, ctx: ExecutionContext, chunking: ChunkingConfig,
+                     cols: List[str], chunk: _Chunk) -> Tuple[str, Dict[str, Any]]:
+        schema = ctx.table_cfg.source_schema
+        table = ctx.table_cfg.source_table
+        conds = [f"({ctx.table_cfg.where})"] if ctx.table_cfg.where else []
+        select = ", ".join(cols)
+        order = ""
+        params: Dict[str, Any] = {}
+
+        if chunk.bucket is not None:
+            expr = chunking.column or "ROWID"
+            conds.append(f"ORA_HASH({expr}, :max_bucket) = :bucket")
+            params.update(max_bucket=chunking.chunks - 1, bucket=chunk.bucket)
+        elif chunking.method == "rowid":
+            op = ">" if chunk.lo_exclusive else ">="
+            conds.append(f"ROWID {op} CHARTOROWID(:lo) AND ROWID <= CHARTOROWID(:hi)")
+            params.update(lo=chunk.lo, hi=chunk.hi)
+            select += f", ROWIDTOCHAR(ROWID) AS {_KEY_COL}"
+            order = " ORDER BY ROWID" if chunking.split_factor else ""
+        else:
+            col = chunking.column
+            op = ">" if chunk.lo_exclusive else ">="
+            conds.append(f"{col} {op} :lo AND {col} <= :hi")
+            params.update(lo=chunk.lo, hi=chunk.hi)
+            select += f", {col} AS {_KEY_COL}"
+            order = f" ORDER BY {col}" if chunking.split_factor else ""
+
+        where = " WHERE " + " AND ".join(conds)
+        return f"SELECT {select} FROM {schema}.{table}{where}{order}", params
+
+    # ------------------------------------------------------------ дробление
+
+    def _split(self, chunking: ChunkingConfig, chunk: _Chunk, last: Any) -> Optional[List[_Chunk]]:
+        """Делит остаток чанка после ключа/ROWID last пополам. None — делить нечего."""
+        if last is None or chunk.bucket is not None:
+            return None
+        if chunking.method == "rowid":
+            obj, fno, block, _ = decode_rowid(last)
+            rest = [e for e in chunk.extents if (e[0], e[1], e[3]) >= (obj, fno, block)]
+            if len(rest) < 2:
+                return None
+            mid = len(rest) // 2
+            return [self._rowid_chunk(rest[:mid], lo=last), self._rowid_chunk(rest[mid:])]
+
+        if not isinstance(last, (int, float, Decimal)):
+            return None
+        hi = chunk.hi
+        if isinstance(last, int) and isinstance(hi, int):
+            if hi - last < 2:
+                return None
+            mid = last + (hi - last) // 2
+        else:
+            mid = last + (hi - last) / 2
+            if mid <= last or mid >= hi:
+                return None
+        return [_Chunk(last, mid, lo_exclusive=True), _Chunk(mid, hi, lo_exclusive=True)]
+
+    def _should_split(self, chunking: ChunkingConfig, started: float) -> bool:
+        with self._cond:
+            # делим, только если очередь пуста и есть простаивающие воркеры
+            if self._pending or self._active >= chunking.workers or len(self._durations) < 2:
+                return False
+            median = statistics.median(self._durations)
+        return time.monotonic() - started > chunking.split_factor * max(median, 0.001)
+
+    # --------------------------------------------------------------- воркеры
+
+    def _next_chunk(self) -> Optional[_Chunk]:
+        with self._cond:
+            while not self._stop.is_set():
+                if self._pending:
+                    self._active += 1
+                    return self._pending.popleft()
+                if self._active == 0:
+                    return None
+                self._cond.wait(0.5)
+        return None
+
+    def _chunk_done(self, duration: Optional[float], new_chunks: Optional[List[_Chunk]] = None) -> None:
+        with self._cond:
+            self._active -= 1
+            if duration is not None:
+                self._durations.append(duration)
+            if new_chunks:
+                self._pending.extend(new_chunks)
+            self._cond.notify_all()
+
+    def _put(self, out: "queue.Queue", item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(self, ctx: ExecutionContext, chunking: ChunkingConfig,
+                cols: List[str], batch_size: int, out: "queue.Queue") -> None:
+        try:
+            with OracleConnector() as ora:
+                while True:
+                    chunk = self._next_chunk()
+                    if chunk is None:
+                        return
+                    query, params = self._chunk_query(ctx, chunking, cols, chunk)
+                    started = time.monotonic()
+                    buf: List[dict] = []
+                    last = None
+                    new_chunks = None
+                    # сессия воркера закрывается раньше загрузки, локаторы LOB до неё
+                    # не доживут — с lob-настройкой LOB приходят значениями целиком
+                    rows = ora.fetch(query, batch_size=batch_size, params=params,
+                                     arraysize=ctx.table_cfg.arraysize or batch_size,
+                                     prefetchrows=ctx.table_cfg.prefetchrows,
+                                     inline_lobs=ctx.table_cfg.lob is not None)
+                    try:
+                        for row in rows:
+                            if chunk.bucket is None:
+                                last = row.pop(_KEY_COL)
+                            buf.append(row)
+                            if len(buf) >= batch_size:
+                                if not self._put(out, buf):
+                                    return
+                                buf = []
+                                if chunking.split_factor and self._should_split(chunking, started):
+                                    new_chunks = self._split(chunking, chunk, last)
+                                    if new_chunks:
+                                        ctx.info("Чанк %r долго выполняется, остаток поделен: %r",
+                                                 chunk, new_chunks)
+                                        break
+                    finally:
+                        rows.close()
+                    if buf and not self._put(out, buf):
+                        return
+                    # длительность дроблёного чанка в медиану не учитываем
+                    self._chunk_done(None if new_chunks else time.monotonic() - started, new_chunks)
+        except BaseException as e:
+            logger.error("Ошибка выборки чанка %s: %s", ctx.table_cfg.source_table, e)
+            self._errors.append(e)
+            self._stop.set()
+            with self._cond:
+                self._cond.notify_all()
+        finally:
+            # маркер нужен и после стопа: по нему fetch считает завершённые воркеры
+            if not self._put(out, _DONE):
+                try:
+                    out.put_nowait(_DONE)
+                except queue.Full:
+                    pass
+
+    # ---------------------------------------------------------------- fetch
+
+    def fetch(self, ctx: ExecutionContext, batch_size: int) -> Iterator[dict]:
+        chunking = ctx.table_cfg.chunking or ChunkingConfig()
+        if ctx.resume_key is not None:
+            # чанки выбираются вразнобой: «продолжить после ключа» без дублей невозможно
+            raise RuntimeError("ChunkedFetcher не поддерживает --resume по checkpoint_column")
+        cols = self._probe_columns(ctx, [m.source for m in ctx.table_cfg.mappings])
+        if not cols:
+            logging.error(f"Не осталось колонок для таблицы {ctx.table_cfg.source_table}, прекращаем выборку")
+            return
+
+        where = f" WHERE {ctx.table_cfg.where}" if ctx.table_cfg.where else ""
+        if chunking.method == "rowid":
+            try:
+                chunks = self._rowid_chunks(ctx, chunking)
+            except Exception as e:
+                ctx.warning("Нет доступа к DBA_EXTENTS (%s), переключаюсь на ORA_HASH", e)
+                chunking = chunking.model_copy(update={"method": "hash", "column": None})
+                chunks = self._hash_chunks(chunking)
+        elif chunking.method == "pk":
+            if not chunking.column:
+                raise RuntimeError("chunking.method=pk требует chunking.column")
+            chunks = self._pk_chunks(ctx, chunking, where)
+        else:
+            chunks = self._hash_chunks(chunking)
+
+        if not chunks:
+            ctx.info("Таблица %s пуста, чанков нет", ctx.table_cfg.source_table)
+            return
+        ctx.info("Таблица %s разбита на %d чанков (%s), воркеров: %d",
+                 ctx.table_cfg.source_table, len(chunks), chunking.method, chunking.workers)
+
+        self._pending = deque(chunks)
+        self._active = 0
+        self._durations = []
+        self._stop.clear()
+        self._errors = []
+
+        workers = min(chunking.workers, len(chunks))
+        out: "queue.Queue" = queue.Queue(maxsize=workers * 2)
+        threads = [
+            threading.Thread(
+                target=self._worker, args=(ctx, chunking, cols, batch_size, out),
+                name=f"chunk-{ctx.table_cfg.source_table}-{i}", daemon=True
+            )
+            for i in range(workers)
+        ]
+        for t in threads:
+            t.start()
+
+        finished = 0
+        try:
+            while finished < workers:
+                try:
+                    item = out.get(timeout=0.5)
+                except queue.Empty:
+                    # ошибка воркера или все воркеры завершились, не оставив маркер
+                    if self._errors or not any(t.is_alive() for t in threads) and out.empty():
+                        break
+                    continue
+                if item is _DONE:
+                    finished += 1
+                    continue
+                if self._errors:
+                    break
+                for row in item:
+                    yield row
+        finally:
+            self._stop.set()
+            with self._cond:
+                self._cond.notify_all()
+            for t in threads:
+                t.join()
+
+        if self._errors:
+            raise self._errors[0]
@@ -0,0 +1,49 @@
+import io
+from typing import Any, Dict, List
+
+from psycopg2 import sql
+
+from core import register_loader
+from core import ExecutionContext
+from core.copy_text import format_rows
+from core.lob import has_streams
+from core.metrics import commit_batch
+from plugins import default_loader
+
+class_name = "CopyLoader"
+
+
+@register_loader
+class CopyLoader(default_loader.DefaultLoader):
+    """
+    Loader на COPY ... FROM STDIN в текстовом формате вместо INSERT (execute_values):
+    батч кодируется в буфер в памяти (core.copy_text — экранирование NULL, TAB,
+    переводов строк и обратного слэша) и уходит одним COPY, сервер не разбирает SQL.
+    tmp-колонки и self-lookup — как у DefaultLoader (pre_load/finalize_table).
+    """
+
+    def load_batch(self, ctx: ExecutionContext, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        side_rows = self._detach_self_lookup(ctx, rows)
+        columns = list(rows[0].keys())
+        if ctx.table_cfg.lob is not None and has_streams(rows):
+            self._copy_rows(ctx, rows, columns, side_rows)
+            return
+        self._copy_text(ctx, rows, columns, side_rows)
+
+    def _copy_text(self, ctx: ExecutionContext, rows: List[Dict[str, Any]], columns: List[str],
+                   side_rows: List[List[Any]]) -> None:
+        tbl = self._target(ctx)
+        conn = ctx.pg_conn.conn
+        copy_sql = sql.SQL("COPY {t} ({cols}) FROM STDIN").format(
+            t=sql.Identifier('public', tbl),
+            cols=sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+        )
+        data = format_rows([row.get(col) for col in columns] for row in rows).encode("utf-8")
+        with conn.cursor() as cur:
+            cur.copy_expert(copy_sql.as_string(conn), io.BytesIO(data), size=256 * 1024)
+            # чекпоинт батча — в той же транзакции, что и данные
+            self._record_batch(ctx, cur, len(rows), side_rows)
+        commit_batch(ctx, conn)
+        ctx.info("Загружен батч %d строк в %s (COPY, %d байт)", len(rows), tbl, len(data))
@@ -1,11 +1,48 @@
 import re
-from typing import Iterator, List
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 from core import ExecutionContext
+from core import lob
+from core.batch import ColumnBatch
 from plugin_interfaces.fetcher_interface import FetcherPlugin
 import logging
 
 class_name = "DefaultFetcher"
 
+# Регулярка для поиска ошибки отсутствия колонки
+_ORA_00904 = re.compile(r"ORA-00904: \"([^\"]+)\"")
+
+
+class _QueryPlan:
+    """SELECT таблицы: список колонок меняется при повторах после ORA-00904."""
+
+    def __init__(self, cols: List[str], extra_cols: List[str], source: str,
+                 tail: str, params: Dict[str, Any], key_col: Optional[str]):
+        self.cols = cols
+        self.extra_cols = extra_cols
+        self.source = source
+        self.tail = tail
+        self.params = params
+        self.key_col = key_col
+        # LOB-колонки, разделённые на значение и локатор (core.lob)
+        self.lobs: List[str] = []
+        self.lob_inline = 0
+
+    def query(self) -> str:
+        lobs = {c.upper() for c in self.lobs}
+        exprs: List[str] = []
+        for col in self.cols:
+            if col.upper() in lobs:
+                exprs.extend(lob.select_expressions(col, self.lob_inline))
+            else:
+                exprs.append(col)
+        cols_str = ", ".join(exprs + self.extra_cols)
+        return f"SELECT {cols_str} FROM {self.source}{self.tail}"
+
+    def lob_names(self) -> List[str]:
+        """Имена LOB-колонок в выдаче курсора (оставшиеся после повторов)."""
+        cols = {c.upper() for c in self.cols}
+        return [c.upper() for c in self.lobs if c.upper() in cols]
+
 class DefaultFetcher(FetcherPlugin):
     """
     Дефолтный плагин для выборки данных из Oracle.
@@ -13,53 +50,181 @@ class DefaultFetcher(FetcherPlugin):
     При ошибке ORA-00904 удаляет отсутствующее поле и ретраит запрос.
     """
     name = "DefaultFetcher"
+    supports_tuples = True
 
     def __init__(self, additional_fields: dict = None):
         # Дополнительные поля здесь не используются, но могут быть учтены
         self.additional_fields = additional_fields or {}
 
-    def fetch(
-        self,
-        ctx: ExecutionContext,
-        batch_size: int
-    ) -> Iterator[dict]:
+    def _extra_filters(self, ctx: ExecutionContext) -> Tuple[List[str], Dict[str, Any]]:
+        """Дополнительные условия WHERE и bind-переменные (для наследников)."""
+        return [], {}
+
+    def _extra_columns(self, ctx: ExecutionContext) -> List[str]:
+        """Дополнительные выражения в SELECT (для наследников)."""
+        return []
+
+    def _order_column(self, ctx: ExecutionContext) -> Optional[str]:
+        """Ключ, по которому упорядочивается выборка (ключ батча); None — без ORDER BY."""
+        return ctx.table_cfg.checkpoint_column if ctx.checkpoint is not None else None
+
+    def _fetch_options(self, ctx: ExecutionContext, batch_size: int) -> Dict[str, Any]:
+        """Настройки курсора из конфига таблицы."""
+        options = {
+            "arraysize": ctx.table_cfg.arraysize or batch_size,
+            "prefetchrows": ctx.table_cfg.prefetchrows,
+        }
+        if ctx.table_cfg.lob is not None:
+            options["inline_lobs"] = True
+        return options
+
+    def _split_lobs(self, ctx: ExecutionContext, plan: "_QueryPlan") -> None:
+        """
+        LOB-колонки выборки: не длиннее lob.inline_max_bytes приходят значением,
+        длиннее — локатором в колонке <col>__LOB и становятся LobStream.
+        """
+        lob_cfg = ctx.table_cfg.lob
+        if lob_cfg is None:
+            return
+        names = lob_cfg.columns
+        if names is None:
+            lob_columns = getattr(ctx.ora_conn, "lob_columns", None)
+            names = lob_columns(ctx.table_cfg.source_schema, ctx.table_cfg.source_table) if lob_columns else []
+        wanted = {n.upper() for n in names}
+        plan.lobs = [c for c in plan.cols if c.upper() in wanted and c != plan.key_col]
+        plan.lob_inline = lob_cfg.inline_max_bytes
+        if plan.lobs and plan.lob_inline > 0:
+            plan.params[lob.INLINE_PARAM] = plan.lob_inline
+        if plan.lobs:
+            logging.info(f"LOB-колонки {plan.lobs}: до {plan.lob_inline} в строке, больше — потоком")
+
+    def _plan(self, ctx: ExecutionContext) -> "_QueryPlan":
+        """Колонки, условия и bind-переменные SELECT для таблицы контекста."""
         # Инициализация списка колонок
         cols: List[str] = [m.source for m in ctx.table_cfg.mappings]
 
         schema = ctx.table_cfg.source_schema
         table = ctx.table_cfg.source_table
-        where_clause = f" WHERE {ctx.table_cfg.where}" if getattr(ctx.table_cfg, 'where', None) else ""
+        conds: List[str] = [ctx.table_cfg.where] if getattr(ctx.table_cfg, 'where', None) else []
+        params: Dict[str, Any] = {}
+
+        # Чекпоинты: упорядочиваем по ключу и продолжаем после последнего загруженного
+        key_col = self._order_column(ctx)
+        order_clause = ""
+        if key_col:
+            if key_col.upper() not in (c.upper() for c in cols):
+                cols.append(key_col)
+            order_clause = f" ORDER BY {key_col}"
+            if ctx.resume_key is not None:
+                conds.append(f"{key_col} > :resume_key")
+                params["resume_key"] = ctx.resume_key
+
+        # Условия и колонки, которые добавляют наследники (например, watermark)
+        extra_conds, extra_params = self._extra_filters(ctx)
+        conds.extend(extra_conds)
+        params.update(extra_params)
 
-        # Регулярка для поиска ошибки отсутствия колонки
-        pattern = re.compile(r"ORA-00904: \"([^\"]+)\"")
+        if len(conds) > 1:
+            where_clause = " WHERE " + " AND ".join(f"({c})" for c in conds)
+        else:
+            where_clause = f" WHERE {conds[0]}" if conds else ""
 
+        return _QueryPlan(cols, self._extra_columns(ctx), f"{schema}.{table}",
+                          f"{where_clause}{order_clause}", params, key_col)
+
+    def _retry_missing(self, plan: "_QueryPlan", exc: Exception) -> Optional[bool]:
+        """
+        Разбор ошибки выборки: ORA-00904 по колонке из mappings — колонка удаляется
+        и возвращается True (повторить запрос); False — колонок не осталось,
+        выборка прекращается; None — ошибка не про колонку, её нужно пробросить.
+        """
+        msg = str(exc)
+        m = _ORA_00904.search(msg)
+        if m:
+            missing = m.group(1)
+            logging.error(f"Поле '{missing}' отсутствует в Oracle, удаляем и повторяем запрос")
+            # Удаляем отсутствующее поле
+            if missing in plan.cols and missing != plan.key_col:
+                plan.cols.remove(missing)
+                logging.warning(f"Поле '{missing}' удалено из запроса")
+                if not plan.cols:
+                    logging.error(f"Не осталось колонок для таблицы {plan.source}, прекращаем выборку")
+                    return False
+                return True
+        # Любая другая ошибка
+        logging.error(f"Ошибка выборки данных: {msg}")
+        return None
+
+    def _run(self, ctx: ExecutionContext, execute: Callable[[str, Dict[str, Any]], Iterator[Any]],
+             plan: Optional["_QueryPlan"] = None) -> Iterator[Any]:
+        """
+        Строит SELECT и отдаёт результат execute(query, params).
+        При ORA-00904 удаляет отсутствующее поле и повторяет запрос.
+        """
+        if plan is None:
+            plan = self._plan(ctx)
         attempt = 0
         while True:
             attempt += 1
-            cols_str = ", ".join(cols)
-            query = f"SELECT {cols_str} FROM {schema}.{table}{where_clause}"
+            query = plan.query()
             logging.debug(f"Попытка {attempt}: {query}")
             try:
-                for row in ctx.ora_conn.fetch(query, batch_size=batch_size):
-                    yield row
+                for item in execute(query, plan.params):
+                    yield item
                 # Успешно завершили выборку
                 return
             except Exception as e:
-                msg = str(e)
-                m = pattern.search(msg)
-                if m:
-                    missing = m.group(1)
-                    logging.error(f"Поле '{missing}' отсутствует в Oracle, удаляем и повторяем запрос")
-                    # Удаляем отсутствующее поле
-                    if missing in cols:
-                        cols.remove(missing)
-                        logging.warning(f"Поле '{missing}' удалено из запроса")
-                        if not cols:
-                            logging.error(f"Не осталось колонок для таблицы {table}, прекращаем выборку")
-                            return
-                        continue
-                # Любая другая ошибка
-                logging.error(f"Ошибка выборки данных: {msg}")
-                raise
+                retry = self._retry_missing(plan, e)
+                if retry is None:
+                    raise
+                if not retry:
+                    return
 
+    def fetch(
+        self,
+        ctx: ExecutionContext,
+        batch_size: int
+    ) -> Iterator[dict]:
+        options = self._fetch_options(ctx, batch_size)
+        plan = self._plan(ctx)
+        self._split_lobs(ctx, plan)
+        rows = self._run(
+            ctx,
+            lambda query, params: ctx.ora_conn.fetch(query, batch_size=batch_size, params=params, **options),
+            plan
+        )
+        if not plan.lobs:
+            return rows
+        chunk_size = ctx.table_cfg.lob.chunk_size
+        return (lob.merge_row(row, plan.lob_names(), chunk_size) for row in rows)
 
+    def fetch_batches(
+        self,
+        ctx: ExecutionContext,
+        batch_size: Union[int, Callable[[], int]]
+    ) -> Iterator[ColumnBatch]:
+        """
+        Колоночные батчи прямо из кортежей курсора (OracleConnector.fetch_tuples),
+        а при fetch_format=arrow — из record batch'ей Arrow (OracleConnector.fetch_arrow).
+        """
+        size = batch_size() if callable(batch_size) else batch_size
+        if ctx.table_cfg.fetch_format == "arrow":
+            # размер порции Arrow фиксируется на весь запрос
+            for table in self._run(
+                ctx,
+                lambda query, params: ctx.ora_conn.fetch_arrow(query, size, params=params)
+            ):
+                yield ColumnBatch.from_arrow(table)
+            return
+        options = self._fetch_options(ctx, size)
+        plan = self._plan(ctx)
+        self._split_lobs(ctx, plan)
+        for index, rows in self._run(
+            ctx,
+            lambda query, params: ctx.ora_conn.fetch_tuples(query, batch_size, params=params, **options),
+            plan
+        ):
+            batch = ColumnBatch.from_tuples(index, rows)
+            if plan.lobs:
+                batch = lob.merge_batch(batch, plan.lob_names(), ctx.table_cfg.lob.chunk_size)
+            yield batch
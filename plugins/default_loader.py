@@ -1,12 +1,19 @@
 import io
 import re
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from psycopg2 import sql
 from psycopg2.extras import execute_values
 
 from core import register_loader
 from plugin_interfaces import LoaderPlugin
 from core import ExecutionContext
+from core.batch import ColumnBatch
+from core.checkpoint import record_batch
+from core.copy_text import CopyStream
+from core.index_deferral import defer_indexes, restore_indexes
+from core.lob import has_streams
+from core.metrics import commit_batch
+from core.self_lookup import SelfLookupSide, self_lookup_side
 from mappings.parser import MappingRule
 
 class_name = "DefaultLoader"
@@ -20,18 +27,37 @@ class DefaultLoader(LoaderPlugin):
           2) Загружает батчи (COPY/INSERT) как обычно.
           3) После всей загрузки делает UPDATE … FROM …, переносит значения
              из tmp в настоящий target и удаляет tmp-колонки.
+        Если ключ строки (PK или self_lookup.row_key) загружается батчами, вместо
+        tmp-колонок ключи self-lookup идут в боковую таблицу (core.self_lookup),
+        а приёмник обновляется порционно без ALTER TABLE.
+        С defer_indexes в конфиге таблицы вторичные индексы и FK снимаются
+        в pre_load и строятся заново в finalize_table (или в abort_table при ошибке).
         """
+    # Очищать ли таблицу перед первым батчем (наследники для дозагрузки выключают)
+    truncate_before_load = True
+    # колоночные батчи с колонками Arrow грузятся через COPY (load_columns)
+    supports_columns = True
+
+    def __init__(self):
+        # target → боковая таблица self-lookup (None — tmp-колонки или правил нет)
+        self._sides: Dict[str, Optional[SelfLookupSide]] = {}
+
+    def _target(self, ctx: ExecutionContext) -> str:
+        """Таблица, в которую пишет loader (наследники подменяют, например, на staging-копию)."""
+        return ctx.table_cfg.target_table
 
     def pre_load(self, ctx: ExecutionContext, batch_id: int = 0) -> None:
-        tbl = ctx.table_cfg.target_table
+        tbl = self._target(ctx)
         pg = ctx.pg_conn  # ваш PostgresConnector
         conn = pg.conn
-        truncate_flag = True if batch_id == 0 else False
+        truncate_flag = True if batch_id == 0 and self.truncate_before_load else False
 
         self_rules = [
             r for r in ctx.table_cfg.mappings
-            if r.lookup and r.lookup.table == tbl
+            if r.lookup and r.lookup.table == ctx.table_cfg.target_table
         ]
+        if ctx.table_cfg.defer_indexes is not None:
+            defer_indexes(ctx, tbl, ctx.table_cfg.defer_indexes)
         if not self_rules and truncate_flag is False:
             return
         with conn.cursor() as cur:
@@ -43,6 +69,11 @@ class DefaultLoader(LoaderPlugin):
                 except Exception as e:
                     ctx.error(f"Ошибка при очистке таблицы {tbl}: {e}")
                     return
+            side = self._sides[tbl] = self_lookup_side(ctx, cur, tbl, self_rules)
+            if side is not None:
+                side.create(cur, reset=batch_id == 0, logged=ctx.checkpoint is not None)
+                ctx.info("Self-lookup %s: ключи пишутся в %s", tbl, side.name)
+                self_rules = []
             for rule in self_rules:
                 key_col = rule.lookup.key_column
                 # получаем data_type
@@ -84,11 +115,15 @@ class DefaultLoader(LoaderPlugin):
         if not rows:
             return
 
-        tbl = ctx.table_cfg.target_table
+        tbl = self._target(ctx)
         conn = ctx.pg_conn.conn
+        side_rows = self._detach_self_lookup(ctx, rows)
 
         # Берём список колонок из первого row
         columns = list(rows[0].keys())
+        if ctx.table_cfg.lob is not None and has_streams(rows):
+            self._copy_rows(ctx, rows, columns, side_rows)
+            return
         # Генерим SQL
         insert_sql = sql.SQL("INSERT INTO {t} ({cols}) VALUES %s").format(
             t=sql.Identifier('public', tbl),
@@ -103,20 +138,100 @@ class DefaultLoader(LoaderPlugin):
         with conn.cursor() as cur:
             # execute_values гораздо быстрее, чем executemany
             execute_values(cur, insert_sql.as_string(conn), values, page_size=1000)
-        conn.commit()
+            # чекпоинт батча — в той же транзакции, что и данные
+            self._record_batch(ctx, cur, len(rows), side_rows)
+        commit_batch(ctx, conn)
         ctx.info("Загружен батч %d строк в %s", len(rows), tbl)
 
+    def _detach_self_lookup(self, ctx: ExecutionContext, rows: List[Dict[str, Any]]) -> List[List[Any]]:
+        """Ключи self-lookup из строк батча для боковой таблицы (из строк убираются)."""
+        side = self._sides.get(self._target(ctx))
+        return side.detach_rows(rows) if side is not None else []
+
+    def _detach_self_lookup_columns(self, ctx: ExecutionContext, batch: ColumnBatch) -> List[List[Any]]:
+        side = self._sides.get(self._target(ctx))
+        return side.detach_columns(batch) if side is not None else []
+
+    def _record_batch(self, ctx: ExecutionContext, cur, count: int, side_rows: List[List[Any]]) -> None:
+        """Строки боковой таблицы self-lookup и чекпоинт — на курсоре батча, до commit."""
+        if side_rows:
+            self._sides[self._target(ctx)].write(cur, side_rows)
+        record_batch(ctx, cur, count)
+
+    def _copy_rows(self, ctx: ExecutionContext, rows: List[Dict[str, Any]], columns: List[str],
+                   side_rows: List[List[Any]]) -> None:
+        """
+        Батч с большими LOB (LobStream): COPY в текстовом формате, поток собирается
+        по мере чтения psycopg2, LOB читаются из Oracle частями прямо в него.
+        """
+        tbl = self._target(ctx)
+        conn = ctx.pg_conn.conn
+        copy_sql = sql.SQL("COPY {t} ({cols}) FROM STDIN").format(
+            t=sql.Identifier('public', tbl),
+            cols=sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+        )
+        stream = CopyStream([row.get(col) for col in columns] for row in rows)
+        with conn.cursor() as cur:
+            cur.copy_expert(copy_sql.as_string(conn), stream, size=256 * 1024)
+            self._record_batch(ctx, cur, len(rows), side_rows)
+        commit_batch(ctx, conn)
+        ctx.info("Загружен батч %d строк в %s (COPY с потоковыми LOB, %d байт)", len(rows), tbl, stream.bytes)
+
+    def load_columns(self, ctx: ExecutionContext, batch: ColumnBatch) -> None:
+        """
+        Колоночный батч: если в нём остались колонки Arrow (fetch_format=arrow),
+        данные сериализует pyarrow в csv и они уходят через COPY без объектов Python;
+        иначе батч собирается в строки и грузится как в load_batch.
+        """
+        if not len(batch):
+            return
+        if not batch.has_arrow():
+            self.load_batch(ctx, batch.to_rows())
+            return
+        from core.copy_arrow import format_csv
+
+        tbl = self._target(ctx)
+        conn = ctx.pg_conn.conn
+        side_rows = self._detach_self_lookup_columns(ctx, batch)
+        columns = list(batch.columns)
+        copy_sql = sql.SQL("COPY {t} ({cols}) FROM STDIN WITH (FORMAT csv)").format(
+            t=sql.Identifier('public', tbl),
+            cols=sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+        )
+        data = format_csv(batch, columns)
+        with conn.cursor() as cur:
+            cur.copy_expert(copy_sql.as_string(conn), io.BytesIO(data))
+            self._record_batch(ctx, cur, len(batch), side_rows)
+        commit_batch(ctx, conn)
+        ctx.info("Загружен батч %d строк в %s (COPY из Arrow)", len(batch), tbl)
+
     def finalize_table(self, ctx: ExecutionContext) -> None:
-        tbl = ctx.table_cfg.target_table
+        self._apply_self_lookup(ctx)
+        if ctx.table_cfg.defer_indexes is not None:
+            restore_indexes(ctx, self._target(ctx), ctx.table_cfg.defer_indexes, analyze=True)
+
+    def abort_table(self, ctx: ExecutionContext) -> None:
+        """Загрузка таблицы прервана ошибкой: возвращаем снятые индексы и FK."""
+        if ctx.table_cfg.defer_indexes is None:
+            return
+        ctx.pg_conn.conn.rollback()
+        restore_indexes(ctx, self._target(ctx), ctx.table_cfg.defer_indexes)
+
+    def _apply_self_lookup(self, ctx: ExecutionContext) -> None:
+        tbl = self._target(ctx)
         pg = ctx.pg_conn
         conn = pg.conn
 
         self_rules = [
             r for r in ctx.table_cfg.mappings
-            if r.lookup and r.lookup.table == tbl
+            if r.lookup and r.lookup.table == ctx.table_cfg.target_table
         ]
         if not self_rules:
             return
+        side = self._sides.get(tbl)
+        if side is not None:
+            side.resolve(ctx, conn)
+            return
 
         with conn.cursor() as cur:
             for rule in self_rules:
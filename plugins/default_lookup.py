@@ -2,7 +2,10 @@ import json
 from psycopg2 import sql
 from typing import Any, Dict, List
 
+import numpy as np
+
 from core import register_transform
+from core.batch import ColumnBatch
 from plugin_interfaces import TransformPlugin
 from core import ExecutionContext
 from mappings.parser import MappingRule
@@ -19,6 +22,8 @@ class DefaultLookup(TransformPlugin):
          накапливает все записи в батче и в finalize_batch() подставляет
          значения из тех же записей (self-lookup).
     """
+    supports_batch = True
+
     def __init__(self):
         # Буфер всех строк текущего батча
         self._buffer: List[Dict[str, Any]] = []
@@ -26,10 +31,15 @@ class DefaultLookup(TransformPlugin):
         self._self_rules: List[MappingRule]     = []
         self._external_rules: List[MappingRule] = []
         self._initialized = False
+        self._table_cfg = None
 
     def _init_rules(self, ctx: ExecutionContext):
         """Разбиваем все rule.lookup на внешние и self."""
         tbl = ctx.table_cfg.target_table
+        # экземпляр может переиспользоваться для нескольких таблиц
+        self._self_rules = []
+        self._external_rules = []
+        self._table_cfg = ctx.table_cfg
         for rule in ctx.table_cfg.mappings:
             if not rule.lookup:
                 continue
@@ -43,7 +53,7 @@ class DefaultLookup(TransformPlugin):
 
     def transform(self, ctx: ExecutionContext, row: Dict[str, Any]) -> Dict[str, Any]:
         # инициализируем правила один раз
-        if not self._initialized:
+        if not self._initialized or self._table_cfg is not ctx.table_cfg:
             self._init_rules(ctx)
 
         # 1) внешний lookup
@@ -68,9 +78,13 @@ class DefaultLookup(TransformPlugin):
             )
 
             try:
-                with ctx.pg_conn.conn.cursor() as cur:
-                    cur.execute(query, (str(src_val),))
-                    res = cur.fetchone()
+                if rule.lookup.preload:
+                    found = ctx.lookup_cache.values(ctx.pg_conn, rule.lookup)
+                    res = (found[str(src_val)],) if str(src_val) in found else None
+                else:
+                    with ctx.pg_conn.lookup_cursor() as cur:
+                        cur.execute(query, (str(src_val),))
+                        res = cur.fetchone()
                 if res:
                     row[rule.target] = res[0]
                 else:
@@ -108,3 +122,74 @@ class DefaultLookup(TransformPlugin):
             row[tgt_tmp] = src_val
 
         return row
+
+    def transform_batch(self, ctx: ExecutionContext, batch: ColumnBatch) -> ColumnBatch:
+        """
+        Колоночный lookup: для каждого внешнего правила один запрос
+        с ANY(%s) по всем уникальным значениям батча вместо запроса на строку.
+        """
+        if not self._initialized or self._table_cfg is not ctx.table_cfg:
+            self._init_rules(ctx)
+
+        # 1) внешний lookup
+        for rule in self._external_rules:
+            values = ColumnBatch.as_list(batch.column(rule.source))
+            wanted = {str(v) for v, active in zip(values, batch.active) if v is not None and active}
+            if not wanted:
+                continue
+
+            tbl_ident = rule.lookup.table
+            key_col   = rule.lookup.key_column
+            val_col   = rule.lookup.value_column or key_col
+
+            query = sql.SQL(
+                'SELECT CAST({key} AS text), CAST({valcol} AS text)'
+                '  FROM {tbl}'
+                ' WHERE CAST({key} AS text) = ANY(%s)'
+            ).format(
+                valcol=sql.Identifier(val_col),
+                tbl   =sql.Identifier(tbl_ident),
+                key   =sql.Identifier(key_col),
+            )
+            try:
+                if rule.lookup.preload:
+                    found = ctx.lookup_cache.values(ctx.pg_conn, rule.lookup)
+                else:
+                    with ctx.pg_conn.lookup_cursor() as cur:
+                        cur.execute(query, (list(wanted),))
+                        found = dict(cur.fetchall())
+            except Exception as e:
+                ctx.error("External lookup error %s.%s: %s", tbl_ident, key_col, e)
+                raise
+
+            om = (rule.lookup.on_missing or 'error').lower()
+            target = ColumnBatch.as_list(batch.column(rule.target))
+            target = list(target)
+            missing = np.zeros(len(batch), dtype=bool)
+            for i, v in enumerate(values):
+                if v is None or not batch.active[i]:
+                    continue
+                key = str(v)
+                if key in found:
+                    target[i] = found[key]
+                    continue
+                missing[i] = True
+                if om == 'null':
+                    target[i] = None
+                elif om.startswith('default:'):
+                    target[i] = rule.lookup.on_missing.split(':', 1)[1]
+                elif om != 'skip':
+                    ctx.error("External lookup error %s.%s=%r: not found", tbl_ident, key_col, v)
+                    raise RuntimeError(f"Lookup failed: {tbl_ident}.{key_col}={v}")
+            if om == 'skip' and missing.any():
+                batch.mark_skip(missing)
+            batch.set_column(rule.target, target)
+
+        # 2) self-lookup: значение уходит во временный столбец, настоящий обнуляется
+        for rule in self._self_rules:
+            tgt = rule.target
+            values = ColumnBatch.as_list(batch.column(tgt))
+            batch.set_column(f"{tgt}_tmp", list(values))
+            batch.set_column(tgt, [None] * len(batch))
+
+        return batch
@@ -1,16 +1,27 @@
 from core import ExecutionContext
+from core.batch import ColumnBatch
+from core.row_plan import get_row_plan
 from plugin_interfaces.transform_interface import TransformPlugin
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 class_name = "DefaultTransform"
 
 class DefaultTransform(TransformPlugin):
     name = "DefaultTransform"
+    supports_batch = True
 
     def transform(self, ctx: "ExecutionContext", row: dict) -> dict:
+        """
+        Переносит поля согласно скомпилированному плану таблицы (core.row_plan).
+        """
+        return get_row_plan(ctx.table_cfg).transform(row)
+
+    def transform_interpreted(self, ctx: "ExecutionContext", row: dict) -> dict:
         """
         Переносит поля 1:1 согласно mappings, применяя transform-правила из MappingRule.
+        Интерпретируемый путь: используется для сравнения в бенчмарке плана.
         """
         out = {}
         for rule in ctx.table_cfg.mappings:
@@ -39,3 +50,36 @@ class DefaultTransform(TransformPlugin):
                     logger.debug("Неизвестная операция '%s' для поля %s", op, rule.source)
             out[rule.target] = val
         return out
+
+    def transform_batch(self, ctx: "ExecutionContext", batch: ColumnBatch) -> ColumnBatch:
+        """
+        Колоночный вариант transform: каждая операция применяется сразу ко всей колонке.
+        """
+        out = ColumnBatch(length=len(batch), skip=batch.skip)
+        for rule in ctx.table_cfg.mappings:
+            # колонка без операций переносится как есть (Arrow остаётся Arrow)
+            col = batch.column(rule.source) if rule.transform else batch.raw(rule.source)
+            for op in rule.transform or []:
+                if op == "strip":
+                    col = [v.strip() if isinstance(v, str) else v for v in col]
+                elif op == "upper":
+                    col = [v.upper() if isinstance(v, str) else v for v in col]
+                elif op == "lower":
+                    col = [v.lower() if isinstance(v, str) else v for v in col]
+                elif "false" in op or "true" in op:
+                    arr = np.empty(len(batch), dtype=object)
+                    arr[:] = ColumnBatch.as_list(col)
+                    is_false = (arr == "N") | (arr == 0)
+                    is_true = ~is_false & ((arr == "Y") | (arr == 1))
+                    arr[is_false] = False
+                    arr[is_true] = True
+                    col = arr
+                elif op.startswith("insert:"):
+                    value = op.split(":", 1)[1]
+                    if value == 'null':
+                        value = None
+                    col = [value] * len(batch)
+                else:
+                    logger.debug("Неизвестная операция '%s' для поля %s", op, rule.source)
+            out.set_column(rule.target, col)
+        return out
@@ -1,14 +1,25 @@
 import json
 from core import register_validation, ExecutionContext
+from core.batch import ColumnBatch
+from core.row_plan import get_row_plan
 from plugin_interfaces import ValidationPlugin
 import re
+import numpy as np
+from psycopg2 import sql as pg_sql
 from typing import Dict, Any
 
 class_name = "DefaultValidation"
 
 @register_validation
 class DefaultValidation(ValidationPlugin):
+    supports_batch = True
+
     def validate(self, ctx: ExecutionContext, row: Dict[str, Any]) -> Dict[str, Any]:
+        # скомпилированный план: regex и range разобраны один раз на таблицу
+        return get_row_plan(ctx.table_cfg).validate(ctx, row)
+
+    def validate_interpreted(self, ctx: ExecutionContext, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Интерпретируемый путь: используется для сравнения в бенчмарке плана."""
         for rule in ctx.table_cfg.mappings:              # MappingRule
             if not rule.validation:
                 continue
@@ -66,9 +77,12 @@ class DefaultValidation(ValidationPlugin):
                     sql = f"SELECT 1 FROM \"{tbl}\" WHERE \"{key}\" = %s LIMIT 1"
                     exists = False
                     try:
-                        with ctx.pg_conn.conn.cursor() as cur:
-                            cur.execute(sql, (str(val),))
-                            exists = cur.fetchone() is not None
+                        if vr.lookup.preload:
+                            exists = str(val) in ctx.lookup_cache.keys(ctx.pg_conn, vr.lookup)
+                        else:
+                            with ctx.pg_conn.lookup_cursor() as cur:
+                                cur.execute(sql, (str(val),))
+                                exists = cur.fetchone() is not None
                     except Exception as e:
                         ctx.error("Ошибка выполнения запроса %s.%s=%r: %s",
                                   tbl, key, val, e)
@@ -91,3 +105,116 @@ class DefaultValidation(ValidationPlugin):
                             )
                 # другие типы можно добавить здесь
         return row
+
+    # ------------------------------------------------------------------
+    # Колоночный режим
+    # ------------------------------------------------------------------
+
+    def _apply_fail(self, batch: ColumnBatch, target: str, fail: np.ndarray,
+                    action, error: str) -> None:
+        """Применяет on_fail ко всем строкам батча из маски fail."""
+        if action is None:
+            col = np.empty(len(batch), dtype=object)
+            col[:] = ColumnBatch.as_list(batch.column(target))
+            col[fail] = None
+            batch.set_column(target, col)
+        elif action == "skip":
+            batch.mark_skip(fail)
+        elif action.startswith("default:"):
+            col = np.empty(len(batch), dtype=object)
+            col[:] = ColumnBatch.as_list(batch.column(target))
+            col[fail] = action.split(":", 1)[1]
+            batch.set_column(target, col)
+        else:
+            raise RuntimeError(error)
+
+    def _lookup_existing(self, ctx: ExecutionContext, tbl: str, key: str, values) -> set:
+        """Одним запросом возвращает множество найденных в справочнике значений."""
+        query = pg_sql.SQL(
+            "SELECT DISTINCT CAST({key} AS text) FROM {tbl} WHERE CAST({key} AS text) = ANY(%s)"
+        ).format(key=pg_sql.Identifier(key), tbl=pg_sql.Identifier(tbl))
+        with ctx.pg_conn.lookup_cursor() as cur:
+            cur.execute(query, (list(values),))
+            return {r[0] for r in cur.fetchall()}
+
+    def validate_batch(self, ctx: ExecutionContext, batch: ColumnBatch) -> ColumnBatch:
+        for rule in ctx.table_cfg.mappings:
+            if not rule.validation or rule.target not in batch:
+                continue
+            for vr in rule.validation:
+                values = ColumnBatch.as_list(batch.column(rule.target))
+                # пропускаем пустые и уже пропущенные строки
+                checked = np.fromiter((v is not None for v in values), dtype=bool, count=len(values))
+                checked &= batch.active
+                if not checked.any():
+                    continue
+                action = vr.on_fail
+
+                # 1) REGEX
+                if vr.type == "regex":
+                    pattern = vr.pattern or ""
+                    rx = re.compile(pattern)
+                    fail = np.fromiter(
+                        (c and rx.match(str(v)) is None for v, c in zip(values, checked)),
+                        dtype=bool, count=len(values)
+                    )
+                    if fail.any():
+                        bad = values[int(np.argmax(fail))]
+                        ctx.warning("Не прошёл regex для %s: %d строк, например %r (pattern=%r) → %s",
+                                    rule.target, int(fail.sum()), bad, pattern, action)
+                        self._apply_fail(
+                            batch, rule.target, fail, action,
+                            f"Валидация regex прошла с ошибкой: {rule.target}={bad} !~ {pattern}"
+                        )
+
+                # 2) RANGE (pattern вида "min-max")
+                elif vr.type == "range":
+                    try:
+                        low, high = vr.pattern.split("-", 1)
+                        low, high = float(low), float(high)
+                    except Exception as e:
+                        ctx.error("Ошибка парсинга range для %s: %s", rule.target, e)
+                        continue
+                    nums = np.full(len(values), np.nan)
+                    for i in np.flatnonzero(checked):
+                        try:
+                            nums[i] = float(values[i])
+                        except Exception as e:
+                            ctx.error("Ошибка парсинга range для %s: %s", rule.target, e)
+                    parsed = ~np.isnan(nums)
+                    fail = parsed & ~((low <= nums) & (nums <= high))
+                    if fail.any():
+                        bad = values[int(np.argmax(fail))]
+                        ctx.warning("Не в диапазоне %s: %d строк, например %r (range=%s) → %s",
+                                    rule.target, int(fail.sum()), bad, vr.pattern, action)
+                        self._apply_fail(
+                            batch, rule.target, fail, action,
+                            f"Валидация range прошла с ошибкой: {rule.target}={bad} not in [{low},{high}]"
+                        )
+
+                # 3) LOOKUP (проверка в справочнике) — один запрос на батч
+                elif vr.type == "lookup" and vr.lookup:
+                    tbl = vr.lookup.table
+                    key = vr.lookup.key_column
+                    wanted = {str(v) for v, c in zip(values, checked) if c}
+                    try:
+                        if vr.lookup.preload:
+                            found = ctx.lookup_cache.keys(ctx.pg_conn, vr.lookup)
+                        else:
+                            found = self._lookup_existing(ctx, tbl, key, wanted)
+                    except Exception as e:
+                        ctx.error("Ошибка выполнения запроса %s.%s: %s", tbl, key, e)
+                        found = set()
+                    fail = np.fromiter(
+                        (c and str(v) not in found for v, c in zip(values, checked)),
+                        dtype=bool, count=len(values)
+                    )
+                    if fail.any():
+                        bad = values[int(np.argmax(fail))]
+                        ctx.warning("Ошибка выполнения запроса for %s: %d строк, например %r in %s.%s → %s",
+                                    rule.target, int(fail.sum()), bad, tbl, key, action)
+                        self._apply_fail(
+                            batch, rule.target, fail, action,
+                            f"Валидация lookup прошла с ошибкой: {tbl}.{key}={bad} not found"
+                        )
+        return batch
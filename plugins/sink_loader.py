@@ -0,0 +1,42 @@
+from typing import Any, Dict, List
+
+from core import register_loader
+from core import ExecutionContext
+from core.batch import ColumnBatch
+from core.checkpoint import record_batch
+from plugin_interfaces import LoaderPlugin
+
+class_name = "SinkLoader"
+
+@register_loader
+class SinkLoader(LoaderPlugin):
+    """
+    Loader для синтетического приёмника (SyntheticSinkConnector):
+    передаёт батч в ctx.pg_conn.write_rows (колоночный — в write_batch),
+    ничего не пишет в Postgres. Используется benchmark.py, чтобы мерить пайплайн без базы.
+    """
+    supports_columns = True
+
+    def pre_load(self, ctx: ExecutionContext, batch_id: int = 0) -> None:
+        pass
+
+    def load_batch(self, ctx: ExecutionContext, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        sink = ctx.pg_conn
+        sink.write_rows(ctx.table_cfg.target_table, rows)
+        with sink.conn.cursor() as cur:
+            record_batch(ctx, cur, len(rows))
+        ctx.debug("Батч %d строк передан в приёмник", len(rows))
+
+    def load_columns(self, ctx: ExecutionContext, batch: ColumnBatch) -> None:
+        if not len(batch):
+            return
+        sink = ctx.pg_conn
+        sink.write_batch(ctx.table_cfg.target_table, batch)
+        with sink.conn.cursor() as cur:
+            record_batch(ctx, cur, len(batch))
+        ctx.debug("Колоночный батч %d строк передан в приёмник", len(batch))
+
+    def finalize_table(self, ctx: ExecutionContext) -> None:
+        pass
@@ -0,0 +1,491 @@
+import re
+from typing import List, Optional, Tuple
+
+from psycopg2 import sql
+
+from core import register_loader
+from core import ExecutionContext
+from core.checkpoint import table_key
+from core.index_deferral import DeferredDdlStore
+from plugins import binary_copy_loader
+
+class_name = "StagingLoader"
+
+STAGING_SUFFIX = "__staging"
+OLD_SUFFIX = "__old"
+# Предел длины идентификатора Postgres (NAMEDATALEN - 1)
+_MAX_IDENT = 63
+
+_NOT_VALID_RE = re.compile(r"\s+NOT VALID$", re.IGNORECASE)
+
+
+def _suffixed(name: str, suffix: str) -> str:
+    return name[:_MAX_IDENT - len(suffix)] + suffix
+
+
+@register_loader
+class StagingLoader(binary_copy_loader.BinaryCopyLoader):
+    """
+    Loader с загрузкой в staging-копию приёмника:
+      1) pre_load — CREATE UNLOGGED TABLE {target}__staging (LIKE target INCLUDING ALL),
+         батчи (binary/text COPY) пишутся в неё без WAL;
+      2) finalize_table — self-lookup на staging, SET LOGGED и ANALYZE,
+         затем в одной короткой транзакции подмена приёмника:
+           - обычная таблица — переименованием (старая удаляется);
+           - секция — DETACH старой и ATTACH staging с той же границей;
+         владелец, права, триггеры и FK приёмника (свои и ссылающиеся на него),
+         RLS с политиками, REPLICA IDENTITY и членство в публикациях переносятся
+         на новую таблицу, FK — NOT VALID с VALIDATE после подмены.
+    Пока идёт загрузка, читатели видят прежние данные приёмника.
+    Приёмник, от которого зависят представления, или владелец, которым
+    роль ETL не может назначить новую таблицу, отклоняются ещё в pre_load.
+    Триггеры приёмника на самой загрузке не срабатывают (staging их не имеет).
+    """
+    # staging создаётся пустой, TRUNCATE не нужен
+    truncate_before_load = False
+
+    def _target(self, ctx: ExecutionContext) -> str:
+        return _suffixed(ctx.table_cfg.target_table, STAGING_SUFFIX)
+
+    def pre_load(self, ctx: ExecutionContext, batch_id: int = 0) -> None:
+        tbl = ctx.table_cfg.target_table
+        staging = self._target(ctx)
+        conn = ctx.pg_conn.conn
+        with conn.cursor() as cur:
+            cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (f'public."{tbl}"',))
+            row = cur.fetchone()
+            if row is None:
+                raise RuntimeError(f"staging_loader: таблица {tbl} не найдена")
+            if row[0] == 'p':
+                raise RuntimeError(
+                    f"staging_loader: {tbl} — секционированная таблица, укажите приёмником её секцию"
+                )
+            self._check_dependents(cur, tbl)
+            if batch_id == 0:
+                cur.execute(sql.SQL("DROP TABLE IF EXISTS {s}").format(s=sql.Identifier('public', staging)))
+                if ctx.table_cfg.defer_indexes is not None:
+                    # снятые индексы прежней staging ушли вместе с ней
+                    store = DeferredDdlStore()
+                    store.ensure(cur)
+                    store.clear(cur, staging)
+                cur.execute(
+                    sql.SQL("CREATE UNLOGGED TABLE {s} (LIKE {t} INCLUDING ALL)").format(
+                        s=sql.Identifier('public', staging),
+                        t=sql.Identifier('public', tbl)
+                    )
+                )
+                ctx.info("Создана staging-таблица %s (UNLOGGED)", staging)
+            else:
+                self._check_resume(ctx, cur, staging)
+        conn.commit()
+        # tmp-колонки self-lookup — в staging
+        super().pre_load(ctx, batch_id)
+
+    @staticmethod
+    def _check_dependents(cur, tbl: str) -> None:
+        """
+        До загрузки — то, что не даст удалить старый приёмник при подмене:
+        зависимые представления (DROP без CASCADE) и владелец, которым
+        текущая роль не может сделать новую таблицу.
+        """
+        regclass = f'public."{tbl}"'
+        cur.execute(
+            """
+            SELECT DISTINCT v.oid::regclass::text
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            WHERE d.classid = 'pg_rewrite'::regclass
+              AND d.refclassid = 'pg_class'::regclass
+              AND d.refobjid = to_regclass(%s)
+              AND v.oid <> d.refobjid
+            """,
+            (regclass,)
+        )
+        views = [r[0] for r in cur.fetchall()]
+        if views:
+            raise RuntimeError(
+                f"staging_loader: от {tbl} зависят представления {', '.join(views)} — "
+                f"подмена таблицы невозможна, используйте другой loader"
+            )
+        cur.execute(
+            "SELECT pg_get_userbyid(relowner), pg_has_role(relowner, 'MEMBER') FROM pg_class WHERE oid = to_regclass(%s)",
+            (regclass,)
+        )
+        owner, member = cur.fetchone()
+        if not member:
+            raise RuntimeError(
+                f"staging_loader: текущая роль не входит в роль {owner}, владельца {tbl}, "
+                f"и не сможет передать ей новую таблицу"
+            )
+
+    def _check_resume(self, ctx: ExecutionContext, cur, staging: str) -> None:
+        """
+        Продолжение загрузки: staging должна существовать и содержать столько строк,
+        сколько записано в чекпоинте (UNLOGGED-таблица очищается после сбоя сервера).
+        """
+        cur.execute("SELECT to_regclass(%s)", (f'public."{staging}"',))
+        if cur.fetchone()[0] is None:
+            raise RuntimeError(
+                f"staging_loader: нет {staging} для продолжения загрузки — перезапустите без --resume"
+            )
+        if ctx.checkpoint is None:
+            return
+        cp = ctx.checkpoint.get(table_key(ctx.table_cfg))
+        if cp is None:
+            return
+        cur.execute(sql.SQL("SELECT count(*) FROM {s}").format(s=sql.Identifier('public', staging)))
+        count = cur.fetchone()[0]
+        if count != cp.rows_loaded:
+            raise RuntimeError(
+                f"staging_loader: в {staging} {count} строк, по чекпоинту {cp.rows_loaded} "
+                f"(UNLOGGED-таблица могла быть очищена после сбоя) — перезапустите без --resume"
+            )
+
+    def abort_table(self, ctx: ExecutionContext) -> None:
+        """
+        Приёмник не менялся. Без чекпоинтов продолжить staging нельзя — она удаляется
+        вместе с записями etl_deferred_ddl о её снятых индексах; с чекпоинтами
+        остаётся для --resume (индексы построит finalize_table продолженного запуска).
+        """
+        conn = ctx.pg_conn.conn
+        conn.rollback()
+        if ctx.checkpoint is not None:
+            return
+        staging = self._target(ctx)
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {s}").format(s=sql.Identifier('public', staging)))
+            if ctx.table_cfg.defer_indexes is not None:
+                store = DeferredDdlStore()
+                store.ensure(cur)
+                store.clear(cur, staging)
+        conn.commit()
+        ctx.info("Staging-таблица %s удалена после ошибки загрузки", staging)
+
+    def finalize_table(self, ctx: ExecutionContext) -> None:
+        # self-lookup, удаление tmp-колонок и отложенные индексы — на staging
+        super().finalize_table(ctx)
+
+        tbl = ctx.table_cfg.target_table
+        staging = self._target(ctx)
+        conn = ctx.pg_conn.conn
+        staging_ident = sql.Identifier('public', staging)
+        with conn.cursor() as cur:
+            # перезапись в WAL одним проходом — до подмены, без блокировки приёмника
+            cur.execute(sql.SQL("ALTER TABLE {s} SET LOGGED").format(s=staging_ident))
+            cur.execute(sql.SQL("ANALYZE {s}").format(s=staging_ident))
+        conn.commit()
+        ctx.info("Staging-таблица %s переведена в LOGGED", staging)
+
+        try:
+            with conn.cursor() as cur:
+                target = sql.Identifier('public', tbl)
+                cur.execute(sql.SQL("LOCK TABLE {t} IN ACCESS EXCLUSIVE MODE").format(t=target))
+                parent = self._partition_of(cur, tbl)
+                grants = self._grants(cur, tbl)
+                # определения — до переименования: ссылки в них идут по имени приёмника
+                foreign_keys = self._foreign_keys(cur, tbl)
+                triggers = self._triggers(cur, tbl)
+                security = self._security(cur, tbl)
+                cur.execute("SELECT pg_get_userbyid(relowner) FROM pg_class WHERE oid = to_regclass(%s)",
+                            (f'public."{tbl}"',))
+                owner = cur.fetchone()[0]
+                cur.execute(
+                    sql.SQL("ALTER TABLE {s} OWNER TO {o}").format(s=staging_ident, o=sql.Identifier(owner))
+                )
+                # FK других таблиц на приёмник не дали бы удалить старую таблицу
+                for table, name, _, _ in foreign_keys:
+                    if table != tbl:
+                        cur.execute(
+                            sql.SQL("ALTER TABLE {t} DROP CONSTRAINT {c}").format(
+                                t=sql.SQL(table), c=sql.Identifier(name)
+                            )
+                        )
+                if parent is None:
+                    self._swap_rename(cur, tbl, staging)
+                else:
+                    self._swap_partition(cur, tbl, staging, *parent)
+                self._rename_indexes(cur, tbl, staging)
+                for privilege, grantee in grants:
+                    cur.execute(
+                        sql.SQL("GRANT {p} ON {t} TO {g}").format(
+                            p=sql.SQL(privilege),
+                            t=target,
+                            g=sql.SQL('PUBLIC') if grantee is None else sql.Identifier(grantee)
+                        )
+                    )
+                for table, name, ddl, _ in foreign_keys:
+                    cur.execute(
+                        sql.SQL("ALTER TABLE {t} ADD CONSTRAINT {c} {d} NOT VALID").format(
+                            t=target if table == tbl else sql.SQL(table), c=sql.Identifier(name), d=sql.SQL(ddl)
+                        )
+                    )
+                for name, ddl, enabled in triggers:
+                    cur.execute(ddl)
+                    if enabled == 'D':
+                        cur.execute(
+                            sql.SQL("ALTER TABLE {t} DISABLE TRIGGER {g}").format(t=target, g=sql.Identifier(name))
+                        )
+                self._restore_security(cur, tbl, security)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            ctx.error("Подмена %s на %s не выполнена, данные приёмника не изменены: %s", tbl, staging, e)
+            raise
+        ctx.info("Таблица %s подменена загруженной %s", tbl, staging)
+        self._validate_foreign_keys(ctx, tbl, foreign_keys)
+
+    def _validate_foreign_keys(self, ctx: ExecutionContext, tbl: str,
+                               foreign_keys: List[Tuple[str, str, str, bool]]) -> None:
+        """VALIDATE перенесённых FK (SHARE UPDATE EXCLUSIVE, чтение и запись не блокируются)."""
+        conn = ctx.pg_conn.conn
+        failed = []
+        for table, name, _, validated in foreign_keys:
+            if not validated:
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        sql.SQL("ALTER TABLE {t} VALIDATE CONSTRAINT {c}").format(
+                            t=sql.Identifier('public', tbl) if table == tbl else sql.SQL(table),
+                            c=sql.Identifier(name)
+                        )
+                    )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                ctx.error("FK %s на %s не прошёл проверку после подмены и остался NOT VALID: %s", name, table, e)
+                failed.append(name)
+        if failed:
+            raise RuntimeError(f"staging_loader: после подмены {tbl} не проверены FK {', '.join(failed)}")
+
+    @staticmethod
+    def _foreign_keys(cur, tbl: str) -> List[Tuple[str, str, str, bool]]:
+        """
+        (таблица, имя, определение, validated) FK приёмника и FK других таблиц на него.
+        Своя таблица — именем tbl, чужие — regclass-текстом. FK, унаследованные
+        секцией от родителя, пропускаются: ATTACH возвращает их сам.
+        """
+        regclass = f'public."{tbl}"'
+        cur.execute(
+            """
+            SELECT CASE WHEN conrelid = to_regclass(%s) THEN %s ELSE conrelid::regclass::text END,
+                   conname, pg_get_constraintdef(oid), convalidated
+            FROM pg_constraint
+            WHERE contype = 'f' AND conparentid = 0
+              AND (conrelid = to_regclass(%s) OR confrelid = to_regclass(%s))
+            ORDER BY conrelid = to_regclass(%s) DESC, conname
+            """,
+            (regclass, tbl, regclass, regclass, regclass)
+        )
+        return [(table, name, _NOT_VALID_RE.sub("", ddl), validated) for table, name, ddl, validated in cur.fetchall()]
+
+    @staticmethod
+    def _triggers(cur, tbl: str) -> List[Tuple[str, str, str]]:
+        """(имя, CREATE TRIGGER, tgenabled) пользовательских триггеров приёмника, кроме унаследованных."""
+        inherited = "AND tgparentid = 0" if cur.connection.server_version >= 130000 else ""
+        cur.execute(
+            f"""
+            SELECT tgname, pg_get_triggerdef(oid), tgenabled
+            FROM pg_trigger
+            WHERE tgrelid = to_regclass(%s) AND NOT tgisinternal {inherited}
+            ORDER BY tgname
+            """,
+            (f'public."{tbl}"',)
+        )
+        return cur.fetchall()
+
+    @staticmethod
+    def _security(cur, tbl: str) -> dict:
+        """
+        То, что LIKE ... INCLUDING ALL не копирует, а без чего подмена молча меняет
+        поведение: RLS и политики, REPLICA IDENTITY, явное членство в публикациях.
+        """
+        regclass = f'public."{tbl}"'
+        cur.execute(
+            """
+            SELECT c.relrowsecurity, c.relforcerowsecurity, c.relreplident,
+                   (SELECT regexp_replace(pg_get_indexdef(x.indexrelid), '^.* USING ', '')
+                    FROM pg_index x WHERE x.indrelid = c.oid AND x.indisreplident)
+            FROM pg_class c WHERE c.oid = to_regclass(%s)
+            """,
+            (regclass,)
+        )
+        rls, force_rls, replident, replident_index = cur.fetchone()
+        cur.execute(
+            """
+            SELECT policyname, permissive, roles::text[], cmd, qual, with_check
+            FROM pg_policies WHERE schemaname = 'public' AND tablename = %s
+            ORDER BY policyname
+            """,
+            (tbl,)
+        )
+        policies = cur.fetchall()
+        if cur.connection.server_version >= 150000:
+            cur.execute(
+                """
+                SELECT p.pubname, pg_get_expr(r.prqual, r.prrelid),
+                       (SELECT array_agg(a.attname::text ORDER BY a.attnum) FROM pg_attribute a
+                        WHERE a.attrelid = r.prrelid AND a.attnum = ANY (r.prattrs))
+                FROM pg_publication_rel r JOIN pg_publication p ON p.oid = r.prpubid
+                WHERE r.prrelid = to_regclass(%s)
+                ORDER BY p.pubname
+                """,
+                (regclass,)
+            )
+        else:
+            cur.execute(
+                """
+                SELECT p.pubname, NULL, NULL
+                FROM pg_publication_rel r JOIN pg_publication p ON p.oid = r.prpubid
+                WHERE r.prrelid = to_regclass(%s)
+                ORDER BY p.pubname
+                """,
+                (regclass,)
+            )
+        publications = cur.fetchall()
+        return dict(rls=rls, force_rls=force_rls, replident=replident, replident_index=replident_index,
+                    policies=policies, publications=publications)
+
+    @staticmethod
+    def _restore_security(cur, tbl: str, security: dict) -> None:
+        """Переносит _security старого приёмника на подменённую таблицу (та же транзакция)."""
+        target = sql.Identifier('public', tbl)
+        if security["rls"]:
+            cur.execute(sql.SQL("ALTER TABLE {t} ENABLE ROW LEVEL SECURITY").format(t=target))
+        if security["force_rls"]:
+            cur.execute(sql.SQL("ALTER TABLE {t} FORCE ROW LEVEL SECURITY").format(t=target))
+        for name, permissive, roles, cmd, qual, with_check in security["policies"]:
+            query = sql.SQL("CREATE POLICY {n} ON {t} AS {p} FOR {c} TO {r}").format(
+                n=sql.Identifier(name), t=target, p=sql.SQL(permissive), c=sql.SQL(cmd),
+                r=sql.SQL(', ').join(
+                    sql.SQL('PUBLIC') if role == 'public' else sql.Identifier(role) for role in roles
+                ),
+            )
+            if qual is not None:
+                query += sql.SQL(" USING ({q})").format(q=sql.SQL(qual))
+            if with_check is not None:
+                query += sql.SQL(" WITH CHECK ({q})").format(q=sql.SQL(with_check))
+            cur.execute(query)
+        replident = security["replident"]
+        if replident == 'f':
+            cur.execute(sql.SQL("ALTER TABLE {t} REPLICA IDENTITY FULL").format(t=target))
+        elif replident == 'n':
+            cur.execute(sql.SQL("ALTER TABLE {t} REPLICA IDENTITY NOTHING").format(t=target))
+        elif replident == 'i':
+            # имена индексов после LIKE могут отличаться — ищем индекс с тем же определением
+            cur.execute(
+                """
+                SELECT i.relname FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+                WHERE x.indrelid = to_regclass(%s)
+                  AND regexp_replace(pg_get_indexdef(x.indexrelid), '^.* USING ', '') = %s
+                """,
+                (f'public."{tbl}"', security["replident_index"])
+            )
+            row = cur.fetchone()
+            if row is None:
+                raise RuntimeError(f"staging_loader: не найден индекс REPLICA IDENTITY для {tbl}")
+            cur.execute(
+                sql.SQL("ALTER TABLE {t} REPLICA IDENTITY USING INDEX {i}").format(
+                    t=target, i=sql.Identifier(row[0])
+                )
+            )
+        for pubname, row_filter, columns in security["publications"]:
+            query = sql.SQL("ALTER PUBLICATION {p} ADD TABLE {t}").format(p=sql.Identifier(pubname), t=target)
+            if columns:
+                query += sql.SQL(" ({c})").format(c=sql.SQL(', ').join(sql.Identifier(c) for c in columns))
+            if row_filter is not None:
+                query += sql.SQL(" WHERE ({f})").format(f=sql.SQL(row_filter))
+            cur.execute(query)
+
+    @staticmethod
+    def _partition_of(cur, tbl: str) -> Optional[Tuple[str, str]]:
+        """(родитель, граница FOR VALUES ...) для секции или None."""
+        cur.execute(
+            """
+            SELECT i.inhparent::regclass::text, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_class c
+            JOIN pg_inherits i ON i.inhrelid = c.oid
+            WHERE c.oid = to_regclass(%s) AND c.relispartition
+            """,
+            (f'public."{tbl}"',)
+        )
+        return cur.fetchone()
+
+    @staticmethod
+    def _grants(cur, tbl: str) -> List[Tuple[str, Optional[str]]]:
+        """Права на приёмник (кроме владельца): LIKE их не копирует."""
+        cur.execute(
+            """
+            SELECT a.privilege_type,
+                   CASE WHEN a.grantee = 0 THEN NULL ELSE pg_get_userbyid(a.grantee) END
+            FROM pg_class c, aclexplode(c.relacl) a
+            WHERE c.oid = to_regclass(%s) AND a.grantee <> c.relowner
+            """,
+            (f'public."{tbl}"',)
+        )
+        return cur.fetchall()
+
+    @staticmethod
+    def _swap_rename(cur, tbl: str, staging: str) -> None:
+        old = _suffixed(tbl, OLD_SUFFIX)
+        target = sql.Identifier('public', tbl)
+        cur.execute(sql.SQL("ALTER TABLE {t} RENAME TO {o}").format(t=target, o=sql.Identifier(old)))
+        cur.execute(
+            sql.SQL("ALTER TABLE {s} RENAME TO {t}").format(
+                s=sql.Identifier('public', staging), t=sql.Identifier(tbl)
+            )
+        )
+        # serial-последовательности принадлежат старой таблице, а DEFAULT новой ссылается на них
+        cur.execute(
+            """
+            SELECT a.attname, pg_get_serial_sequence(%s, a.attname)
+            FROM pg_attribute a
+            WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0
+              AND NOT a.attisdropped AND a.attidentity = ''
+            """,
+            (f'public."{old}"', f'public."{old}"')
+        )
+        for col, seq in cur.fetchall():
+            if seq is None:
+                continue
+            cur.execute(
+                sql.SQL("ALTER SEQUENCE {seq} OWNED BY {t}.{c}").format(
+                    seq=sql.SQL(seq), t=sql.Identifier('public', tbl), c=sql.Identifier(col)
+                )
+            )
+        # без CASCADE: представления проверены в pre_load, FK на приёмник уже сняты
+        cur.execute(sql.SQL("DROP TABLE {o}").format(o=sql.Identifier('public', old)))
+
+    @staticmethod
+    def _swap_partition(cur, tbl: str, staging: str, parent: str, bound: str) -> None:
+        target = sql.Identifier('public', tbl)
+        cur.execute(sql.SQL("ALTER TABLE {p} DETACH PARTITION {t}").format(p=sql.SQL(parent), t=target))
+        cur.execute(
+            sql.SQL("ALTER TABLE {p} ATTACH PARTITION {s} {b}").format(
+                p=sql.SQL(parent), s=sql.Identifier('public', staging), b=sql.SQL(bound)
+            )
+        )
+        cur.execute(sql.SQL("DROP TABLE {t}").format(t=target))
+        cur.execute(
+            sql.SQL("ALTER TABLE {s} RENAME TO {t}").format(
+                s=sql.Identifier('public', staging), t=sql.Identifier(tbl)
+            )
+        )
+
+    @staticmethod
+    def _rename_indexes(cur, tbl: str, staging: str) -> None:
+        """Индексы, созданные LIKE с префиксом staging, получают имена от приёмника."""
+        cur.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s",
+            (tbl,)
+        )
+        for (name,) in cur.fetchall():
+            if not name.startswith(staging):
+                continue
+            new_name = _suffixed(tbl, name[len(staging):])
+            cur.execute(
+                sql.SQL("ALTER INDEX {i} RENAME TO {n}").format(
+                    i=sql.Identifier('public', name), n=sql.Identifier(new_name)
+                )
+            )
@@ -0,0 +1,198 @@
+import io
+from typing import Any, Callable, Dict, List, Optional
+
+from psycopg2 import sql
+
+from core import register_loader
+from core import ExecutionContext
+from core.batch import ColumnBatch
+from core.copy_text import CopyStream, format_rows
+from core.lob import has_streams
+from core.metrics import commit_batch
+from core.self_lookup import primary_key
+from mappings.parser import UpsertConfig
+from plugins import default_loader
+
+class_name = "UpsertLoader"
+
+# Предел длины идентификатора Postgres (NAMEDATALEN - 1)
+_MAX_IDENT = 63
+
+
+@register_loader
+class UpsertLoader(default_loader.DefaultLoader):
+    """
+    Loader слиянием вместо truncate-and-insert (TableConfig.upsert):
+      1) батч уходит COPY во временную таблицу etl_upsert_{target}
+         (ON COMMIT DELETE ROWS, своя на каждое соединение);
+      2) одним запросом сливается в приёмник по ключу (по умолчанию — PK):
+         INSERT ... ON CONFLICT DO UPDATE или MERGE (Postgres 15+).
+    Обновляются только строки, у которых значения действительно изменились
+    (IS DISTINCT FROM); дубли ключа в батче схлопываются, побеждает последняя строка.
+    Подходит для incremental_fetcher: повторная выборка после сбоя не даёт дублей.
+    """
+    truncate_before_load = False
+
+    def __init__(self):
+        super().__init__()
+        # target_table → колонки первичного ключа
+        self._keys: Dict[str, List[str]] = {}
+        # (pid серверного процесса, id соединения, target_table) с уже созданной временной таблицей
+        self._temp_ready: set = set()
+        self._server_version: Optional[int] = None
+
+    def _settings(self, ctx: ExecutionContext) -> UpsertConfig:
+        return ctx.table_cfg.upsert or UpsertConfig()
+
+    def _key_columns(self, ctx: ExecutionContext) -> List[str]:
+        settings = self._settings(ctx)
+        if settings.key_columns:
+            return settings.key_columns
+        tbl = self._target(ctx)
+        keys = self._keys.get(tbl)
+        if keys is None:
+            with ctx.pg_conn.conn.cursor() as cur:
+                keys = primary_key(cur, tbl)
+            if not keys:
+                raise RuntimeError(f"upsert_loader: у {tbl} нет первичного ключа — задайте upsert.key_columns")
+            self._keys[tbl] = keys
+        return keys
+
+    def _temp_table(self, ctx: ExecutionContext) -> sql.Identifier:
+        """
+        Временная таблица под батч на соединении loader'а. Создаётся один раз
+        отдельной транзакцией, чтобы откат батча её не удалял.
+        """
+        tbl = self._target(ctx)
+        ident = sql.Identifier(("etl_upsert_" + tbl)[:_MAX_IDENT])
+        conn = ctx.pg_conn.conn
+        # временная таблица живёт в сессии: id объекта может достаться новому
+        # соединению (пул, полосы загрузки), а pid бэкенда — только этой сессии
+        key = (conn.get_backend_pid(), id(conn), tbl)
+        if key not in self._temp_ready:
+            with conn.cursor() as cur:
+                cur.execute(
+                    sql.SQL(
+                        "CREATE TEMP TABLE IF NOT EXISTS {tmp} (LIKE {t} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                    ).format(tmp=ident, t=sql.Identifier('public', tbl))
+                )
+            conn.commit()
+            self._temp_ready.add(key)
+        return ident
+
+    def _use_merge(self, ctx: ExecutionContext) -> bool:
+        if self._settings(ctx).method != "merge":
+            return False
+        if self._server_version is None:
+            self._server_version = ctx.pg_conn.conn.server_version
+            if self._server_version < 150000:
+                ctx.warning("MERGE недоступен в Postgres %d, слияние через ON CONFLICT", self._server_version)
+        return self._server_version >= 150000
+
+    def _merge_sql(self, ctx: ExecutionContext, tmp: sql.Identifier, columns: List[str]) -> sql.Composed:
+        settings = self._settings(ctx)
+        keys = self._key_columns(ctx)
+        missing = [k for k in keys if k not in columns]
+        if missing:
+            raise RuntimeError(f"upsert_loader: в батче нет колонок ключа {missing}")
+        updates = [c for c in (settings.update_columns or columns) if c not in keys and c in columns]
+
+        target = sql.Identifier('public', self._target(ctx))
+        cols = sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+        key_list = sql.SQL(', ').join(sql.Identifier(k) for k in keys)
+        # последняя строка батча с тем же ключом (ctid растёт в порядке COPY)
+        source = sql.SQL("SELECT DISTINCT ON ({keys}) {cols} FROM {tmp} ORDER BY {keys}, ctid DESC").format(
+            keys=key_list, cols=cols, tmp=tmp
+        )
+
+        def changed(left: str, right: str) -> sql.Composed:
+            return sql.SQL("({l}) IS DISTINCT FROM ({r})").format(
+                l=sql.SQL(', ').join(sql.Identifier(left, c) for c in updates),
+                r=sql.SQL(', ').join(sql.Identifier(right, c) for c in updates),
+            )
+
+        if self._use_merge(ctx):
+            on = sql.SQL(' AND ').join(
+                sql.SQL("t.{k} = s.{k}").format(k=sql.Identifier(k)) for k in keys
+            )
+            matched = sql.SQL("")
+            if updates:
+                matched = sql.SQL(" WHEN MATCHED AND {changed} THEN UPDATE SET {sets}").format(
+                    changed=changed("t", "s"),
+                    sets=sql.SQL(', ').join(
+                        sql.SQL("{c} = s.{c}").format(c=sql.Identifier(c)) for c in updates
+                    ),
+                )
+            return sql.SQL(
+                "MERGE INTO {t} AS t USING ({src}) AS s ON {on}{matched}"
+                " WHEN NOT MATCHED THEN INSERT ({cols}) VALUES ({vals})"
+            ).format(
+                t=target, src=source, on=on, matched=matched, cols=cols,
+                vals=sql.SQL(', ').join(sql.Identifier('s', c) for c in columns),
+            )
+
+        if not updates:
+            action = sql.SQL("DO NOTHING")
+        else:
+            action = sql.SQL("DO UPDATE SET {sets} WHERE {changed}").format(
+                sets=sql.SQL(', ').join(
+                    sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(c)) for c in updates
+                ),
+                changed=changed("t", "excluded"),
+            )
+        return sql.SQL("INSERT INTO {t} AS t ({cols}) {src} ON CONFLICT ({keys}) {action}").format(
+            t=target, cols=cols, src=source, keys=key_list, action=action
+        )
+
+    def _merge(self, ctx: ExecutionContext, columns: List[str], count: int,
+               fill: Callable[[Any, sql.Identifier], None], side_rows: List[List[Any]]) -> None:
+        """Батч во временную таблицу (fill) и слияние в приёмник — в одной транзакции."""
+        conn = ctx.pg_conn.conn
+        tmp = self._temp_table(ctx)
+        with conn.cursor() as cur:
+            fill(cur, tmp)
+            cur.execute(self._merge_sql(ctx, tmp, columns))
+            affected = cur.rowcount
+            # чекпоинт батча — в той же транзакции, что и данные
+            self._record_batch(ctx, cur, count, side_rows)
+        commit_batch(ctx, conn)
+        ctx.info("Слит батч %d строк в %s: вставлено или изменено %d", count, self._target(ctx), affected)
+
+    def load_batch(self, ctx: ExecutionContext, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        side_rows = self._detach_self_lookup(ctx, rows)
+        columns = list(rows[0].keys())
+        values = ([row.get(col) for col in columns] for row in rows)
+        if ctx.table_cfg.lob is not None and has_streams(rows):
+            stream = CopyStream(values)
+        else:
+            stream = io.BytesIO(format_rows(values).encode("utf-8"))
+
+        def fill(cur, tmp: sql.Identifier) -> None:
+            copy_sql = sql.SQL("COPY {tmp} ({cols}) FROM STDIN").format(
+                tmp=tmp, cols=sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+            )
+            cur.copy_expert(copy_sql.as_string(cur), stream, size=256 * 1024)
+
+        self._merge(ctx, columns, len(rows), fill, side_rows)
+
+    def load_columns(self, ctx: ExecutionContext, batch: ColumnBatch) -> None:
+        if not len(batch):
+            return
+        if not batch.has_arrow():
+            self.load_batch(ctx, batch.to_rows())
+            return
+        from core.copy_arrow import format_csv
+
+        side_rows = self._detach_self_lookup_columns(ctx, batch)
+        columns = list(batch.columns)
+        data = format_csv(batch, columns)
+
+        def fill(cur, tmp: sql.Identifier) -> None:
+            copy_sql = sql.SQL("COPY {tmp} ({cols}) FROM STDIN WITH (FORMAT csv)").format(
+                tmp=tmp, cols=sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+            )
+            cur.copy_expert(copy_sql.as_string(cur), io.BytesIO(data))
+
+        self._merge(ctx, columns, len(batch), fill, side_rows)
@@ -0,0 +1,129 @@
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from core.batch_sizer import (AdaptiveBatchSizer, MemoryBudget, SizedBatch, budget_bytes,
+                              value_bytes)
+from core.lob import LobStream
+from mappings.parser import AdaptiveBatchConfig
+
+MB = 1024 * 1024
+
+
+def make_batch(n, row_bytes, fetch_sec):
+    batch = SizedBatch({"ID": i} for i in range(n))
+    batch.nbytes = n * row_bytes
+    batch.fetch_sec = fetch_sec
+    return batch
+
+
+def make_sizer(batch_size=100, **cfg):
+    cfg = AdaptiveBatchConfig(**{"min_size": 10, "max_size": 1000, "target_batch_seconds": 1.0,
+                                 "max_batch_mb": 1, **cfg})
+    return AdaptiveBatchSizer(cfg, batch_size, budget=MemoryBudget(0))
+
+
+def test_observe_grows_at_most_twice_then_by_time():
+    sizer = make_sizer()
+    # 2 мс на строку → по времени 500 строк, рост ×2 за шаг
+    sizes = []
+    for _ in range(4):
+        sizer.observe(make_batch(sizer.size, 100, 0.001 * sizer.size), 0.001 * sizer.size)
+        sizes.append(sizer.size)
+    assert sizes == [200, 400, 500, 500]
+
+
+def test_observe_shrinks_slow_batch_to_min():
+    sizer = make_sizer()
+    sizer.observe(make_batch(100, 100, 0.1), 10.0)
+    assert sizer.size == 10
+
+
+def test_observe_limited_by_memory():
+    sizer = make_sizer(batch_size=1000)
+    # 10 КБ на строку при max_batch_mb=1 → ~102 строки
+    sizer.observe(make_batch(1000, 10 * 1024, 0.0), 0.001)
+    assert sizer.size == 102
+    assert sizer.row_bytes == 10 * 1024
+
+
+def test_observe_smooths_measurements():
+    sizer = make_sizer()
+    sizer.observe(make_batch(100, 100, 0.0), 0.1)
+    sizer.observe(make_batch(100, 300, 0.0), 0.3)
+    assert sizer.row_bytes == pytest.approx(200)
+    assert sizer.row_latency == pytest.approx(0.002)
+
+
+def test_disabled_sizer_keeps_batch_size():
+    sizer = AdaptiveBatchSizer(None, 777, budget=MemoryBudget(0))
+    sizer.observe(make_batch(777, 100, 5.0), 5.0)
+    assert sizer.size == 777
+    assert [len(b) for b in sizer.batches({"ID": i} for i in range(2000))] == [777, 777, 446]
+
+
+def test_budget_acquire_and_release():
+    budget = MemoryBudget(100)
+    assert budget.acquire(60) == 60
+    assert budget.try_acquire(60) == 40
+    assert budget.used == 100
+    budget.release(100)
+    assert budget.used == 0
+    # батч больше бюджета проходит, когда других резервов нет
+    assert budget.acquire(500) == 500
+
+
+def test_budget_unlimited():
+    budget = MemoryBudget(0)
+    assert budget.acquire(10 ** 12, timeout=0.01) == 0
+    assert budget.used == 0
+
+
+def test_budget_waits_for_release():
+    budget = MemoryBudget(100)
+    budget.acquire(80)
+    timer = threading.Timer(0.05, budget.release, args=(80,))
+    timer.start()
+    assert budget.acquire(50, timeout=5) == 50
+    timer.join()
+    assert budget.used == 50
+
+
+def test_budget_timeout():
+    budget = MemoryBudget(100)
+    budget.acquire(80)
+    with pytest.raises(RuntimeError, match="Бюджет памяти"):
+        budget.acquire(50, timeout=0.05)
+    assert budget.used == 80
+
+
+def test_budget_cancel_returns_zero():
+    budget = MemoryBudget(100)
+    budget.acquire(80)
+    cancel = threading.Event()
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(got=budget.acquire(50, timeout=5, cancel=cancel)))
+    thread.start()
+    cancel.set()
+    budget.wake()
+    thread.join(2)
+    assert not thread.is_alive()
+    assert result["got"] == 0
+    assert budget.used == 80
+
+
+def test_budget_bytes_split_between_workers():
+    cfg = AdaptiveBatchConfig(memory_budget_mb=1024)
+    assert budget_bytes(cfg) == 1024 * MB
+    assert budget_bytes(cfg, 4) == 256 * MB
+    assert budget_bytes(cfg, 0) == 1024 * MB
+
+
+def test_value_bytes_lob():
+    locator = SimpleNamespace(size=lambda: 50 * MB, read=lambda offset, amount: "")
+    assert value_bytes(LobStream(locator, 65536)) == 65536
+    # непрочитанный LOB Oracle занимает весь свой размер
+    assert value_bytes(locator) == 50 * MB
+    assert value_bytes("abc") == sys.getsizeof("abc")
@@ -0,0 +1,135 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from mappings.parser import ChunkingConfig
+from plugins import chunked_fetcher
+from plugins.chunked_fetcher import ChunkedFetcher, _Chunk, decode_rowid, encode_rowid
+
+
+class FakeOracle:
+    """ctx.ora_conn: отвечает на запросы нарезки заранее заданными строками."""
+
+    def __init__(self, extents=None, bounds=None):
+        self.extents = extents or []
+        self.bounds = bounds
+
+    def execute(self, query, params=None):
+        if "dba_extents" in query:
+            return self.extents
+        if "MIN(" in query:
+            return [self.bounds]
+        return []
+
+
+def make_ctx(chunking, ora=None):
+    log = lambda *a: None
+    table_cfg = SimpleNamespace(
+        source_schema="HR", source_table="EMPLOYEES", where=None,
+        mappings=[SimpleNamespace(source="EMP_ID")], chunking=chunking,
+        arraysize=None, prefetchrows=None, lob=None,
+    )
+    return SimpleNamespace(table_cfg=table_cfg, ora_conn=ora or FakeOracle(), resume_key=None,
+                           info=log, warning=log, debug=log, error=log)
+
+
+@pytest.mark.parametrize("parts", [(0, 0, 0, 0), (73194, 4, 135, 0), (2**36 - 1, 1023, 2**36 - 1, 32767)])
+def test_rowid_roundtrip(parts):
+    rowid = encode_rowid(*parts)
+    assert len(rowid) == 18
+    assert decode_rowid(rowid) == parts
+
+
+def test_rowid_fields():
+    assert encode_rowid(0, 0, 0, 1) == "AAAAAAAAAAAAAAAAAB"
+    assert decode_rowid("AAAAAAAAB" + "AAAAAA" + "AAA") == (0, 1, 0, 0)
+
+
+def test_pk_chunks_cover_range():
+    chunking = ChunkingConfig(method="pk", column="EMP_ID", chunks=4)
+    ctx = make_ctx(chunking, FakeOracle(bounds=(1, 100)))
+    chunks = ChunkedFetcher()._pk_chunks(ctx, chunking, "")
+    assert len(chunks) == 4
+    assert (chunks[0].lo, chunks[0].lo_exclusive) == (1, False)
+    assert chunks[-1].hi == 100
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert nxt.lo == prev.hi and nxt.lo_exclusive
+
+
+def test_pk_chunks_empty_table():
+    chunking = ChunkingConfig(method="pk", column="EMP_ID", chunks=4)
+    ctx = make_ctx(chunking, FakeOracle(bounds=(None, None)))
+    assert ChunkedFetcher()._pk_chunks(ctx, chunking, "") == []
+
+
+def test_rowid_chunks_group_extents():
+    chunking = ChunkingConfig(method="rowid", chunks=2)
+    extents = [(10, 1, 0, 7), (10, 1, 8, 15), (10, 2, 0, 7), (10, 2, 8, 15)]
+    ctx = make_ctx(chunking, FakeOracle(extents=extents))
+    chunks = ChunkedFetcher()._rowid_chunks(ctx, chunking)
+    assert [c.extents for c in chunks] == [extents[:2], extents[2:]]
+    assert decode_rowid(chunks[0].lo) == (10, 1, 0, 0)
+    assert decode_rowid(chunks[0].hi) == (10, 1, 15, 32767)
+    assert decode_rowid(chunks[1].lo) == (10, 2, 0, 0)
+
+
+def test_split_pk_remainder():
+    chunking = ChunkingConfig(method="pk", column="EMP_ID")
+    halves = ChunkedFetcher()._split(chunking, _Chunk(0, 100), 10)
+    assert [(c.lo, c.hi, c.lo_exclusive) for c in halves] == [(10, 55, True), (55, 100, True)]
+    assert ChunkedFetcher()._split(chunking, _Chunk(0, 100), 99) is None
+    assert ChunkedFetcher()._split(chunking, _Chunk(bucket=3), 10) is None
+
+
+def test_split_rowid_remainder():
+    chunking = ChunkingConfig(method="rowid")
+    extents = [(10, 1, 0, 7), (10, 1, 8, 15), (10, 1, 16, 23), (10, 1, 24, 31)]
+    chunk = ChunkedFetcher._rowid_chunk(extents)
+    last = encode_rowid(10, 1, 9, 5)
+    first, second = ChunkedFetcher()._split(chunking, chunk, last)
+    assert (first.lo, first.lo_exclusive) == (last, True)
+    assert first.extents == extents[1:2]
+    assert second.extents == extents[2:]
+    assert ChunkedFetcher()._split(chunking, chunk, encode_rowid(10, 1, 30, 0)) is None
+
+
+def test_worker_error_stops_fetch(monkeypatch):
+    class BrokenOracle:
+        def __enter__(self):
+            raise RuntimeError("ORA-12541: нет прослушивателя")
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(chunked_fetcher, "OracleConnector", BrokenOracle)
+    chunking = ChunkingConfig(method="hash", chunks=8, workers=4)
+    ctx = make_ctx(chunking)
+    result = {}
+
+    def consume():
+        try:
+            list(ChunkedFetcher().fetch(ctx, 100))
+        except RuntimeError as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), "fetch завис после ошибки воркера"
+    assert "ORA-12541" in str(result["error"])
+
+
+@pytest.mark.parametrize("fetcher, ok", [("chunked_fetcher", True), ("default_fetcher", False),
+                                         ("incremental_fetcher", False)])
+def test_load_workers_require_chunked_fetcher(fetcher, ok):
+    from mappings.parser import _check_load_workers
+
+    global_cfg = SimpleNamespace(fetcher_plugin="default_fetcher")
+    table = SimpleNamespace(source_table="EMPLOYEES", fetcher_plugin=fetcher,
+                            chunking=ChunkingConfig(load_workers=4))
+    if ok:
+        _check_load_workers(global_cfg, [table])
+    else:
+        with pytest.raises(RuntimeError, match="load_workers"):
+            _check_load_workers(global_cfg, [table])
@@ -0,0 +1,99 @@
+import json
+import struct
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, localcontext
+
+import pytest
+
+from core.copy_binary import (
+    HEADER, TRAILER, ENCODERS, _jsonb, _numeric, _timestamp, _timestamptz, format_binary,
+)
+
+_PG_EPOCH = datetime(2000, 1, 1)
+
+
+def decode_numeric(data: bytes) -> Decimal:
+    """Обратное преобразование numeric, как его читает Postgres (numeric_recv)."""
+    ndigits, weight, sign, dscale = struct.unpack("!hhHh", data[:8])
+    if sign == 0xC000:
+        return Decimal("NaN")
+    groups = struct.unpack(f"!{ndigits}H", data[8:])
+    with localcontext() as dctx:
+        dctx.prec = 1000
+        value = sum((Decimal(g) * Decimal(10000) ** (weight - i) for i, g in enumerate(groups)), Decimal(0))
+        value = value.quantize(Decimal(1).scaleb(-dscale))
+    return -value if sign == 0x4000 else value
+
+
+def decode_timestamp(data: bytes) -> datetime:
+    (micros,) = struct.unpack("!q", data)
+    return _PG_EPOCH + timedelta(microseconds=micros)
+
+
+@pytest.mark.parametrize("value", [
+    "0", "1", "-1", "0.5", "123.456", "-0.0001", "10000", "99990000",
+    "1.00", "0.00012300", "12345678901234567890.123456789", "1E+5", "-7.5E-7",
+])
+def test_numeric_roundtrip(value):
+    dec = Decimal(value)
+    assert decode_numeric(_numeric(dec)) == dec
+    # dscale сохраняет число знаков после запятой
+    assert struct.unpack("!h", _numeric(dec)[6:8])[0] == max(0, -dec.as_tuple().exponent)
+
+
+def test_numeric_from_int_and_float():
+    assert decode_numeric(_numeric(42)) == Decimal(42)
+    assert decode_numeric(_numeric(0.1)) == Decimal("0.1")
+
+
+def test_numeric_special():
+    assert decode_numeric(_numeric(Decimal("NaN"))).is_nan()
+    with pytest.raises(ValueError):
+        _numeric(Decimal("Infinity"))
+
+
+@pytest.mark.parametrize("value", [
+    datetime(2000, 1, 1), datetime(1999, 12, 31, 23, 59, 59, 999999),
+    datetime(2024, 2, 29, 12, 30, 15, 123456), datetime(1900, 1, 1, 0, 0, 0, 1),
+])
+def test_timestamp_roundtrip(value):
+    assert decode_timestamp(_timestamp(value)) == value
+
+
+def test_timestamp_from_date_and_aware():
+    assert decode_timestamp(_timestamp(date(2024, 5, 1))) == datetime(2024, 5, 1)
+    aware = datetime(2024, 5, 1, 10, tzinfo=timezone(timedelta(hours=3)))
+    # timestamp without time zone отбрасывает смещение
+    assert decode_timestamp(_timestamp(aware)) == datetime(2024, 5, 1, 10)
+
+
+def test_timestamptz_roundtrip():
+    value = datetime(2024, 5, 1, 10, 0, 0, 5, tzinfo=timezone(timedelta(hours=3)))
+    assert decode_timestamp(_timestamptz(value)) == datetime(2024, 5, 1, 7, 0, 0, 5)
+    with pytest.raises(TypeError):
+        _timestamptz(datetime(2024, 5, 1))
+
+
+@pytest.mark.parametrize("value", [{"a": 1, "b": [1, 2, None]}, [1, "два", {"x": True}], {"дата": "2024"}])
+def test_jsonb_roundtrip(value):
+    data = _jsonb(value)
+    assert data[:1] == b"\x01"
+    assert json.loads(data[1:].decode("utf-8")) == value
+
+
+def test_jsonb_string_passthrough():
+    assert _jsonb('{"a": 1}') == b'\x01{"a": 1}'
+
+
+@pytest.mark.parametrize("udt, value", [("int2", 2 ** 15), ("int4", -2 ** 31 - 1), ("int8", 2 ** 63)])
+def test_int_out_of_range(udt, value):
+    # binary_copy_loader ловит struct.error и уходит на text COPY
+    with pytest.raises(struct.error):
+        format_binary([[value]], [ENCODERS[udt]])
+
+
+def test_format_binary_layout():
+    data = format_binary([[1, None]], [ENCODERS["int4"], ENCODERS["text"]])
+    assert data.startswith(HEADER) and data.endswith(TRAILER)
+    body = data[len(HEADER):-len(TRAILER)]
+    assert body == struct.pack("!h", 2) + struct.pack("!ii", 4, 1) + struct.pack("!i", -1)
@@ -0,0 +1,71 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from core.copy_text import NULL, decode_row, encode_value, format_row, format_rows
+
+
+@pytest.mark.parametrize("value", [
+    "plain", "", "tab\there", "line\nbreak", "cr\rlf\r\n", "back\\slash", "\\N", "\b\f\v",
+    "юникод\t\\\n", "trailing\\",
+])
+def test_string_roundtrip(value):
+    field = encode_value(value)
+    # в поле не остаётся сырых разделителей строки и колонки
+    assert "\t" not in field and "\n" not in field and "\r" not in field
+    assert decode_row(field) == [value]
+
+
+def test_null_and_literal_backslash_n_differ():
+    assert encode_value(None) == NULL
+    assert decode_row(encode_value(None)) == [None]
+    assert decode_row(encode_value("\\N")) == ["\\N"]
+
+
+@pytest.mark.parametrize("value, text", [
+    (True, "t"), (False, "f"), (42, "42"), (1.5, "1.5"), (Decimal("-0.010"), "-0.010"),
+    (date(2024, 2, 29), "2024-02-29"), (datetime(2024, 2, 29, 12, 30, 1, 5), "2024-02-29T12:30:01.000005"),
+])
+def test_scalars(value, text):
+    assert encode_value(value) == text
+
+
+def test_bytea_hex():
+    field = encode_value(b"\x00\xffhi")
+    assert field == "\\\\x00ff6869"
+    # после разбора COPY остаётся hex-формат bytea
+    assert decode_row(field) == ["\\x00ff6869"]
+    assert encode_value(memoryview(b"\x01")) == "\\\\x01"
+
+
+@pytest.mark.parametrize("value, literal", [
+    (["a", "b", None], '{"a","b",NULL}'),
+    ([1, 2, 3], '{"1","2","3"}'),
+    ([[1, 2], [3, None]], '{{"1","2"},{"3",NULL}}'),
+    (['q"uote', "back\\slash"], '{"q\\"uote","back\\\\slash"}'),
+    ([True, date(2024, 1, 2)], '{"t","2024-01-02"}'),
+    ([], "{}"),
+])
+def test_array_literal(value, literal):
+    assert decode_row(encode_value(value)) == [literal]
+
+
+def test_array_with_tab_is_escaped():
+    field = encode_value(["a\tb"])
+    assert "\t" not in field
+    assert decode_row(field) == ['{"a\tb"}']
+
+
+def test_dict_as_json():
+    assert decode_row(encode_value({"k": "v\tw", "n": 1})) == ['{"k": "v\\tw", "n": 1}']
+
+
+def test_format_rows_and_decode():
+    rows = [["a\tb", None, 1], ["", "x\ny", True]]
+    text = format_rows(rows)
+    assert text == format_row(rows[0]) + format_row(rows[1])
+    lines = text.split("\n")
+    assert lines[-1] == "" and len(lines) == 3
+    assert decode_row(lines[0]) == ["a\tb", None, "1"]
+    assert decode_row(lines[1]) == ["", "x\ny", "t"]
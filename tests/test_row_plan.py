@@ -0,0 +1,144 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from core.row_plan import classify_op, compile_row_plan, get_row_plan
+from mappings.parser import MappingRule, TableConfig
+from plugins.default_transform import DefaultTransform
+from plugins.default_validation import DefaultValidation
+
+
+class FakeLookupConn:
+    """ctx.pg_conn: справочник в памяти вместо запроса SELECT 1 ... LIMIT 1."""
+
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self.queries = 0
+
+    @contextmanager
+    def lookup_cursor(self):
+        found = []
+
+        def execute(query, params):
+            self.queries += 1
+            found[:] = [(1,)] if params[0] in self.keys else []
+
+        yield SimpleNamespace(execute=execute, fetchone=lambda: found[0] if found else None)
+
+
+def make_ctx(mappings, lookup_keys=()):
+    log = lambda *a: None
+    table_cfg = TableConfig(source_table="EMPLOYEES", source_schema="HR",
+                            target_table="employees", mappings=mappings)
+    return SimpleNamespace(table_cfg=table_cfg, pg_conn=FakeLookupConn(lookup_keys),
+                           warning=log, error=log, info=log, debug=log)
+
+
+def both_paths(ctx, row):
+    """Результат интерпретируемого и скомпилированного пути на копиях одной строки."""
+    interpreted = DefaultValidation().validate_interpreted(
+        ctx, DefaultTransform().transform_interpreted(ctx, dict(row)))
+    plan = get_row_plan(ctx.table_cfg)
+    compiled = plan.validate(ctx, plan.transform(dict(row)))
+    return interpreted, compiled
+
+
+TRANSFORM_MAPPINGS = [
+    MappingRule(source="EMP_ID", target="emp_id"),
+    MappingRule(source="NAME", target="name", transform="strip, upper"),
+    MappingRule(source="EMAIL", target="email", transform=["lower"]),
+    MappingRule(source="ACTIVE", target="active", transform=["true/false"]),
+    MappingRule(source="NAME", target="source", transform=["insert:oracle"]),
+    MappingRule(source="NAME", target="comment", transform=["strip", "insert:null"]),
+    MappingRule(source="NOTE", target="note", transform=["reverse"]),
+    MappingRule(source="MISSING", target="missing"),
+]
+
+
+@pytest.mark.parametrize("row", [
+    {"EMP_ID": 1, "NAME": "  ivanov ", "EMAIL": "A@B.RU", "ACTIVE": "Y", "NOTE": "x"},
+    {"EMP_ID": 2, "NAME": None, "EMAIL": None, "ACTIVE": 0, "NOTE": None},
+    {"EMP_ID": 3, "NAME": 42, "EMAIL": 7, "ACTIVE": "maybe"},
+    {"EMP_ID": 4, "NAME": "", "EMAIL": "", "ACTIVE": 1},
+    {},
+])
+def test_transform_matches_interpreted(row):
+    ctx = make_ctx(TRANSFORM_MAPPINGS)
+    interpreted, compiled = both_paths(ctx, row)
+    assert compiled == interpreted
+    assert list(compiled) == list(interpreted)
+
+
+def test_classify_op():
+    assert classify_op("strip")[0] == "fn"
+    assert classify_op("Y/N true false")[0] == "fn"
+    assert classify_op("insert:a:b") == ("insert", "a:b")
+    assert classify_op("insert:null") == ("insert", None)
+    assert classify_op("reverse") == ("unknown", "reverse")
+
+
+def test_insert_is_const():
+    # всё до insert отбрасывается, колонка источника не читается
+    ctx = make_ctx([MappingRule(source="NAME", target="source", transform=["upper", "insert:oracle"])])
+    plan = compile_row_plan(ctx.table_cfg)
+    assert plan.columns[0].is_const and plan.columns[0].funcs == []
+    assert plan.transform({"NAME": "x"}) == {"source": "oracle"}
+
+
+def _validated(on_fail, vtype, pattern=None, lookup=None):
+    return [MappingRule(source="CODE", target="code", validation=[
+        {"type": vtype, "pattern": pattern, "lookup": lookup, "on_fail": on_fail}])]
+
+
+@pytest.mark.parametrize("on_fail", [None, "skip", "default:0"])
+@pytest.mark.parametrize("vtype, pattern, lookup", [
+    ("regex", r"^\d{3}$", None),
+    ("range", "100-500", None),
+    ("range", "bad", None),
+    ("lookup", None, {"table": "codes", "key_column": "code"}),
+])
+@pytest.mark.parametrize("value", ["123", "777", "abc", None, 250])
+def test_validation_matches_interpreted(on_fail, vtype, pattern, lookup, value):
+    ctx = make_ctx(_validated(on_fail, vtype, pattern, lookup), lookup_keys={"123", "250"})
+    interpreted, compiled = both_paths(ctx, {"CODE": value})
+    assert compiled == interpreted
+
+
+@pytest.mark.parametrize("vtype, pattern, lookup", [
+    ("regex", r"^\d{3}$", None),
+    ("lookup", None, {"table": "codes", "key_column": "code"}),
+])
+def test_validation_error_matches_interpreted(vtype, pattern, lookup):
+    ctx = make_ctx(_validated("error", vtype, pattern, lookup))
+    with pytest.raises(RuntimeError) as interpreted:
+        DefaultValidation().validate_interpreted(ctx, {"code": "9999"})
+    with pytest.raises(RuntimeError) as compiled:
+        get_row_plan(ctx.table_cfg).validate(ctx, {"code": "9999"})
+    assert str(compiled.value) == str(interpreted.value)
+
+
+def test_range_error_only_logged():
+    # в обоих путях ошибка range перехватывается и только логируется
+    ctx = make_ctx(_validated("error", "range", "100-500"))
+    interpreted, compiled = both_paths(ctx, {"CODE": "9999"})
+    assert compiled == interpreted == {"code": "9999"}
+
+
+def test_skip_stops_further_checks():
+    ctx = make_ctx([MappingRule(source="CODE", target="code", validation=[
+        {"type": "regex", "pattern": r"^\d+$", "on_fail": "skip"},
+        {"type": "lookup", "lookup": {"table": "codes", "key_column": "code"}, "on_fail": "error"},
+    ])])
+    plan = get_row_plan(ctx.table_cfg)
+    row = plan.validate(ctx, plan.transform({"CODE": "abc"}))
+    assert row["_skip"] is True
+    assert ctx.pg_conn.queries == 0
+
+
+def test_plan_cached_per_table_cfg():
+    ctx = make_ctx(TRANSFORM_MAPPINGS)
+    plan = get_row_plan(ctx.table_cfg)
+    assert get_row_plan(ctx.table_cfg) is plan
+    assert compile_row_plan(ctx.table_cfg) is not plan
+    assert get_row_plan(make_ctx(TRANSFORM_MAPPINGS).table_cfg) is not plan
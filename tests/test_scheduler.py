@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+from core.scheduler import DependencyQueue, TableScheduler
+
+
+def make_tables(*names):
+    return [SimpleNamespace(source_table=name.upper(), target_table=name, target_schema="public",
+                            mappings=[]) for name in names]
+
+
+def drain(queue):
+    """Порядок запуска, если каждая таблица завершается сразу после выдачи."""
+    order = []
+    while queue.pending():
+        idx = queue.pop()
+        if idx is None:
+            queue.break_cycle()
+            continue
+        order.append(idx)
+        queue.complete(idx)
+    return order
+
+
+def test_ready_largest_first_then_config_order():
+    tables = make_tables("a", "b", "c", "d")
+    queue = DependencyQueue(tables, {0: set(), 1: set(), 2: set(), 3: set()}, {0: 10, 1: 30, 2: 10, 3: 30})
+    assert drain(queue) == [1, 3, 0, 2]
+
+
+def test_dependents_wait_for_all_parents():
+    tables = make_tables("parent1", "parent2", "child")
+    queue = DependencyQueue(tables, {0: set(), 1: set(), 2: {0, 1}}, {2: 1000})
+    assert queue.dependency_count == 2
+    first, second = queue.pop(), queue.pop()
+    assert {first, second} == {0, 1}
+    assert queue.pop() is None and queue.pending()
+    queue.complete(first)
+    assert queue.pop() is None
+    queue.complete(second)
+    assert queue.pop() == 2
+    assert not queue.pending()
+
+
+def test_break_cycle_starts_first_by_config():
+    tables = make_tables("free", "a", "b", "c")
+    deps = {0: set(), 1: {3}, 2: {1}, 3: {2}}
+    queue = DependencyQueue(tables, deps, {3: 100})
+    assert drain(queue) == [0, 1, 2, 3]
+
+
+def test_break_cycle_keeps_other_dependencies():
+    tables = make_tables("a", "b", "c")
+    queue = DependencyQueue(tables, {0: {1}, 1: {0}, 2: {0, 1}}, {})
+    assert queue.pop() is None
+    queue.break_cycle()
+    assert queue.pop() == 0
+    assert queue.pop() is None
+    queue.complete(0)
+    assert queue.pop() == 1
+    queue.complete(1)
+    assert queue.pop() == 2
+
+
+def test_cancel_stops_new_tables():
+    tables = make_tables("a", "b")
+    queue = DependencyQueue(tables, {0: set(), 1: {0}}, {})
+    assert queue.pop() == 0
+    queue.cancel()
+    queue.complete(0)
+    assert queue.pop() is None
+    assert not queue.pending()
+
+
+def test_build_graph_lookup_and_same_target():
+    tables = make_tables("orders", "customers", "orders")
+    tables[0].mappings = [SimpleNamespace(lookup=SimpleNamespace(table="customers"), validation=None)]
+    tables[2].mappings = [SimpleNamespace(lookup=None, validation=[
+        SimpleNamespace(lookup=SimpleNamespace(table="customers"))])]
+    scheduler = TableScheduler(SimpleNamespace(tables=tables), workers=2)
+    assert scheduler.build_graph(None) == {0: {1}, 1: set(), 2: {0, 1}}
+
+
+def test_build_graph_fk_through_missing_table():
+    # customers → accounts (нет в запуске) → payments: CASCADE дойдёт до payments
+    tables = make_tables("payments", "customers")
+    fk = [("public", "customers", "public", "accounts"),
+          ("public", "accounts", "public", "payments"),
+          ("public", "payments", "public", "payments")]
+    pg_conn = SimpleNamespace(execute=lambda query: fk)
+    scheduler = TableScheduler(SimpleNamespace(tables=tables), workers=2)
+    assert scheduler.build_graph(pg_conn) == {0: {1}, 1: set()}